@@ -0,0 +1 @@
+"""Data pipeline behind dashboard.py: loading, repair and derived analytics columns."""
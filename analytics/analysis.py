@@ -0,0 +1,207 @@
+"""
+Pure analysis functions behind dashboard.py (no Streamlit calls).
+
+run_analysis() returns everything the page renders; the dashboard caches it
+keyed by data_version() so reruns without new data skip pandas/SciPy entirely.
+"""
+from analytics.chart_data import POINT_COLS, TREND_METRICS, chart_data, downsample
+from analytics.config import ANALYTICS_WORKERS, COPIER_MAX_COMPLEXITY, IMPROVER_MIN_COMPLEXITY
+from analytics.derive import strategy, classify_users
+from analytics.regression import fit_lines, line_endpoints
+from analytics.sessions import sessionize, step_columns
+from analytics.stats_engine import compare_groups, resampling_pool
+
+COPIER, IMPROVER = 'Copier (High Sim)', 'Improver (Low Sim)'
+CLUSTERS = ['Copier', 'Users', 'Improver']
+
+
+def data_version(data, feedback=None):
+    """Cache key for analysis results: row counts plus the latest timestamp."""
+    if data is None or data.empty:
+        return (0, None, 0)
+    latest = data['timestamp'].max() if 'timestamp' in data.columns else None
+    return (len(data), str(latest), 0 if feedback is None else len(feedback))
+
+# =========================================================================
+# === SECTIONS ============================================================
+# =========================================================================
+
+def overview(data, feedback):
+    user_avg_round_time = data.groupby('prolific_id', observed=True)['round_duration_seconds'].mean()
+    avg_total_time = None
+    if feedback is not None and not feedback.empty:
+        avg_total_time = feedback['total_time_seconds'].mean()
+    return {
+        'n_rows': len(data),
+        'n_players': data['prolific_id'].nunique(),
+        'avg_total_time': avg_total_time,
+        'user_avg_round_time': user_avg_round_time,
+    }
+
+
+def duration_summary(data):
+    has_durations = 'round_duration_seconds' in data.columns and data['round_duration_seconds'].sum() > 0
+    if not has_durations:
+        return {'has_durations': False}
+    missing = data[data['round_duration_seconds'] == 0]
+    return {
+        'has_durations': True,
+        'avg_round_time': data['round_duration_seconds'].mean(),
+        'missing_count': len(missing),
+        'missing_rows': missing[['prolific_id', 'round', 'scenario_name']],
+    }
+
+
+def hypothesis_tests(data, workers=ANALYTICS_WORKERS, pool=None):
+    """H1 (time), H2 (length, complexity), H3 (difficulty): AI used vs not, per round."""
+    return compare_groups(data, 'ai_used', ['round_duration_seconds', 'text_len', 'complexity', 'seq_score'], workers=workers, pool=pool)
+
+
+def text_metric_analysis(data, workers=ANALYTICS_WORKERS, pool=None):
+    """
+    Logged text metrics (streamlit_app/text_metrics.py): AI used vs not, and how AI users
+    edited after the reveal. None if no row carries them yet (logs from before they existed).
+    """
+    if 'word_count' not in data.columns or data['word_count'].isna().all():
+        return None
+    logged = data[data['word_count'].notna()]
+    ai_rows = logged[logged['ai_used'] == True]
+    return {
+        'n_rows': len(logged),
+        'tests': compare_groups(logged, 'ai_used', ['word_count', 'sentence_count', 'ari'], workers=workers, pool=pool),
+        'ai_rounds': len(ai_rows),
+        'median_edit_distance': ai_rows['edit_distance'].median() if len(ai_rows) else None,
+        'mean_ai_insertion_ratio': ai_rows['ai_insertion_ratio'].mean() if len(ai_rows) else None,
+        'unedited_share': (ai_rows['edit_distance'] == 0).mean() if len(ai_rows) else None,
+    }
+
+
+def strategy_analysis(data, workers=ANALYTICS_WORKERS, pool=None):
+    """Copiers vs Improvers among AI-used rows (split at the median similarity)."""
+    ai_only = data[data['ai_used'] == True].copy()
+    if ai_only.empty or 'ai_similarity' not in ai_only.columns:
+        return None
+
+    median_sim = ai_only['ai_similarity'].median()
+    ai_only['strategy'] = strategy(ai_only['ai_similarity'], median_sim)
+
+    deep_dive_agg = ai_only.groupby('prolific_id', observed=True).agg({
+        'ai_similarity': 'mean',
+        'seq_score': 'mean'
+    }).reset_index()
+
+    return {
+        'median_sim': median_sim,
+        'rows': ai_only,
+        'tests': compare_groups(ai_only, 'strategy', ['complexity', 'round_duration_seconds', 'seq_score'], COPIER, IMPROVER, workers=workers, pool=pool),
+        'deep_dive_agg': deep_dive_agg,
+        'deep_dive_fit': fit_lines(deep_dive_agg, 'ai_similarity', ['seq_score']),
+    }
+
+
+def participant_aggregates(data, copier_max_complexity=COPIER_MAX_COMPLEXITY, improver_min_complexity=IMPROVER_MIN_COMPLEXITY):
+    """Per-participant AI score (% of rounds with AI), averages, similarity and cluster."""
+    user_agg = data.groupby('prolific_id', observed=True).agg({
+        'ai_used': 'mean', # % of rounds used
+        'round_duration_seconds': 'mean',
+        'complexity': 'mean',
+        'seq_score': 'mean',
+        'text_len': 'mean'
+    }).reset_index()
+    user_agg.rename(columns={'ai_used': 'ai_score', 'round_duration_seconds': 'avg_time', 'seq_score': 'avg_difficulty'}, inplace=True)
+
+    user_sim = data[data['ai_used'] == True].groupby('prolific_id', observed=True)['ai_similarity'].mean()
+    user_agg['avg_similarity'] = user_agg['prolific_id'].map(user_sim).fillna(0).astype(float)
+
+    user_agg['cluster'] = classify_users(user_agg, copier_max_complexity, improver_min_complexity)
+    return user_agg
+
+
+def cluster_fits(user_agg):
+    """Complexity ~ AI score for every cluster at once (clusters with >1 distinct AI score), in CLUSTERS order."""
+    fits = fit_lines(user_agg, 'ai_score', ['complexity'], by='cluster')
+    fits = fits[fits['cluster'].isin(CLUSTERS)]
+    return fits.sort_values('cluster', key=lambda c: c.map(CLUSTERS.index)).reset_index(drop=True)
+
+
+def cluster_regressions(user_agg, fits=None):
+    """Per-cluster fit statistics as records (cluster, n, slope, intercept, r2, p_value, max_ai)."""
+    fits = cluster_fits(user_agg) if fits is None else fits
+    fits = fits.rename(columns={'x_max': 'max_ai'})
+    return fits[['cluster', 'n', 'slope', 'intercept', 'r2', 'p_value', 'max_ai']].to_dict('records')
+
+
+def cluster_analysis(user_agg, copier_max_complexity=COPIER_MAX_COMPLEXITY, improver_min_complexity=IMPROVER_MIN_COMPLEXITY):
+    """
+    The cluster section at the given thresholds: participants re-classified, per-cluster
+    fits, their line endpoints and the (sampled) bubble chart points.
+    Cheap (one row per participant), so the dashboard re-runs it when the thresholds change.
+    """
+    user_agg = user_agg.assign(cluster=classify_users(user_agg, copier_max_complexity, improver_min_complexity))
+    fits = cluster_fits(user_agg)
+    return {
+        'user_agg': user_agg,
+        'reg_stats': cluster_regressions(user_agg, fits),
+        'lines': line_endpoints(fits, 'ai_score', 'complexity', by='cluster'),
+        'points': downsample(user_agg[POINT_COLS]),
+        'cluster_debug': cluster_debug(user_agg),
+    }
+
+
+def path_analysis(data):
+    """Participant paths through the state machine, and wasted actions by AI usage (see analytics.sessions)."""
+    sessions = sessionize(data)
+    steps = step_columns(data)
+    steps['ai_used'] = data['ai_used']
+    by_ai = steps[steps['is_action']].groupby('ai_used').agg(
+        actions=('is_action', 'size'),
+        wasted_rate=('wasted_action', 'mean'),
+        ineffective_rate=('ineffective_action', 'mean'),
+    ).reset_index()
+    return {
+        'sessions': sessions,
+        'by_ai_used': by_ai,
+        'completion_rate': sessions['completed'].mean(),
+        'avg_rounds_over_optimal': sessions.loc[sessions['completed'], 'rounds_over_optimal'].mean(),
+    }
+
+
+def cluster_debug(user_agg):
+    """Tables behind the 'Debug: Check Cluster Classification' expander."""
+    vectors = {}
+    for cluster in CLUSTERS:
+        cd = user_agg[user_agg['cluster'] == cluster]
+        if len(cd) > 1:
+            vectors[cluster] = (cd['ai_score'].tolist(), cd['complexity'].tolist())
+    debug_cols = ['prolific_id', 'ai_score', 'avg_similarity', 'complexity', 'cluster', 'avg_time']
+    return {
+        'copier_improver': user_agg[user_agg['cluster'].isin(['Copier', 'Improver'])][['prolific_id', 'cluster', 'ai_score', 'complexity']],
+        'vectors': vectors,
+        'by_similarity': user_agg[debug_cols].sort_values('avg_similarity', ascending=False),
+    }
+
+
+def run_analysis(data, feedback, workers=ANALYTICS_WORKERS,
+                 copier_max_complexity=COPIER_MAX_COMPLEXITY, improver_min_complexity=IMPROVER_MIN_COMPLEXITY):
+    """
+    Everything the dashboard renders, computed in one go (workers: process pool for the resampling).
+    The cluster section is not included: cluster_analysis() runs on its own at the chosen thresholds.
+    """
+    with resampling_pool(workers) as pool:
+        tests = hypothesis_tests(data, workers, pool)
+        text_metrics = text_metric_analysis(data, workers, pool)
+        strategies = strategy_analysis(data, workers, pool)
+    user_agg = participant_aggregates(data, copier_max_complexity, improver_min_complexity)
+    results = {
+        'overview': overview(data, feedback),
+        'durations': duration_summary(data),
+        'tests': tests,
+        'text_metrics': text_metrics,
+        'strategy': strategies,
+        'user_agg': user_agg,
+        'trends': fit_lines(user_agg, 'ai_score', TREND_METRICS),
+        'paths': path_analysis(data),
+        'median_similarity': data.loc[data['ai_used'] == True, 'ai_similarity'].median(),
+    }
+    results['charts'] = chart_data(data, results)
+    return results
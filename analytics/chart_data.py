@@ -0,0 +1,120 @@
+"""
+Server-side pre-aggregation for the dashboard charts.
+
+Altair embeds every row of a chart's data in the Vega spec, so charts get
+summaries instead of raw rows:
+* boxplots: quartiles + whiskers per group, and a capped sample of outliers,
+* error bars: mean and 95% CI per group,
+* stacked duration bars: per-participant sums per (group, color key), capped participants,
+* scatter plots: a deterministic sample once a frame exceeds MAX_POINTS,
+* trend lines: two endpoints per fitted line (analytics.regression), never the points.
+Payload size is bounded by these constants, not by the study size.
+"""
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+
+from analytics.regression import line_endpoints
+
+MAX_POINTS = 2000           # Scatter plots: points per chart
+MAX_OUTLIERS = 200          # Boxplots: outlier points per group
+MAX_BAR_PARTICIPANTS = 150  # Stacked duration chart: participants shown
+MAX_PARTICIPANT_BARS = 500  # Above this the per-participant bar chart becomes a histogram
+HISTOGRAM_BINS = 30
+TREND_METRICS = ['complexity', 'avg_time', 'avg_difficulty']  # Participant scatter plots, each vs the AI score
+POINT_COLS = ['prolific_id', 'cluster', 'ai_score', 'complexity', 'avg_difficulty', 'avg_time', 'avg_similarity']
+WHISKER_IQR = 1.5           # Same whisker rule as Vega-Lite's mark_boxplot
+
+
+def downsample(frame, max_points=MAX_POINTS, seed=0):
+    """Deterministic random sample of at most max_points rows (frame unchanged if smaller)."""
+    if len(frame) <= max_points:
+        return frame
+    return frame.sample(max_points, random_state=seed).sort_index()
+
+
+def box_stats(data, group_col, value_col):
+    """
+    Quartiles per group, with whiskers at the furthest values within WHISKER_IQR * IQR.
+    Returns (summary frame, outlier frame); outliers are sampled down to MAX_OUTLIERS per group.
+    """
+    values = data[[group_col, value_col]].dropna()
+    summary, outliers = [], []
+    for group, x in values.groupby(group_col, sort=True, observed=True)[value_col]:
+        q1, median, q3 = np.quantile(x, [0.25, 0.5, 0.75])
+        low, high = q1 - WHISKER_IQR * (q3 - q1), q3 + WHISKER_IQR * (q3 - q1)
+        inside = x[(x >= low) & (x <= high)]
+        summary.append({
+            group_col: group, 'n': len(x),
+            'lower': inside.min(), 'q1': q1, 'median': median, 'q3': q3, 'upper': inside.max(),
+        })
+        outliers.append(downsample(values.loc[x[(x < low) | (x > high)].index], MAX_OUTLIERS))
+    summary = pd.DataFrame(summary, columns=[group_col, 'n', 'lower', 'q1', 'median', 'q3', 'upper'])
+    outliers = pd.concat(outliers, ignore_index=True) if outliers else values.iloc[0:0]
+    return summary, outliers
+
+
+def mean_ci(data, group_col, value_col, level=0.95):
+    """Mean and t-based confidence interval per group."""
+    grouped = data[[group_col, value_col]].dropna().groupby(group_col, sort=True, observed=True)[value_col]
+    out = grouped.agg(['mean', 'sem', 'count']).reset_index()
+    half = out['sem'] * stats.t.ppf(0.5 + level / 2, (out['count'] - 1).clip(lower=1))
+    out['ci_low'] = out['mean'] - half.fillna(0)
+    out['ci_high'] = out['mean'] + half.fillna(0)
+    return out
+
+
+def stacked_durations(data, max_participants=MAX_BAR_PARTICIPANTS):
+    """
+    Round durations summed per (user_group, participant, color_key).
+    Above max_participants an evenly spaced subset of participants is kept.
+    Returns (frame, total participant count).
+    """
+    sums = data.groupby(['user_group', 'prolific_id', 'color_key'], sort=False, observed=True).agg(
+        round_duration_seconds=('round_duration_seconds', 'sum'),
+        round=('round', 'min'),
+        rounds=('round', 'count'),
+        ai_used=('ai_used', 'max'),
+    ).reset_index()
+    participants = np.sort(sums['prolific_id'].astype(str).unique())
+    if len(participants) > max_participants:
+        keep = participants[np.linspace(0, len(participants) - 1, max_participants).astype(int)]
+        sums = sums[sums['prolific_id'].astype(str).isin(keep)]
+    return sums.reset_index(drop=True), len(participants)
+
+
+def participant_bars(user_avg_round_time, max_bars=MAX_PARTICIPANT_BARS, bins=HISTOGRAM_BINS):
+    """
+    Average time per round per participant as bars, or as a histogram
+    (participant counts per time bin) once there are more than max_bars participants.
+    """
+    values = user_avg_round_time.dropna()
+    if len(values) <= max_bars:
+        return {'kind': 'bars', 'data': user_avg_round_time}
+    counts, edges = np.histogram(values, bins=bins)
+    starts = pd.Index(np.round(edges[:-1], 1), name='avg time per round (s, bin start)')
+    return {'kind': 'histogram', 'data': pd.Series(counts, index=starts, name='participants')}
+
+
+def chart_data(data, results):
+    """Every chart's (bounded) data, from the rows and the run_analysis() results."""
+    strategy = results['strategy']
+    out = {
+        'participant_bars': participant_bars(results['overview']['user_avg_round_time']),
+        'stacked': stacked_durations(data),
+        'box': {col: box_stats(data, 'ai_used', col) for col in ['text_len', 'complexity', 'seq_score']},
+        'seq_ci': mean_ci(data, 'ai_used', 'seq_score'),
+        'user_points': downsample(results['user_agg'][POINT_COLS]),
+        'trend_lines': {metric: line_endpoints(results['trends'], 'ai_score', metric) for metric in TREND_METRICS},
+        'strategy_box': {},
+        'deep_dive_points': None,
+        'deep_dive_line': None,
+    }
+    if strategy is not None:
+        out['strategy_box'] = {
+            col: box_stats(strategy['rows'], 'strategy', col)
+            for col in ['complexity', 'round_duration_seconds', 'seq_score']
+        }
+        out['deep_dive_points'] = downsample(strategy['deep_dive_agg'])
+        out['deep_dive_line'] = line_endpoints(strategy['deep_dive_fit'], 'ai_similarity', 'seq_score')
+    return out
@@ -0,0 +1,42 @@
+"""
+Altair charts drawn from the pre-aggregated frames in analytics.chart_data
+(a boxplot is rule + bar + tick + outlier layers instead of mark_boxplot over raw rows,
+a trend line is two fitted endpoints instead of transform_regression over every point).
+"""
+import altair as alt
+
+
+def boxplot(summary, outliers, group_col, value_col, title=None):
+    """Boxplot from box_stats() output."""
+    x = alt.X(f'{group_col}:N', title=group_col)
+    color = alt.Color(f'{group_col}:N')
+    base = alt.Chart(summary).encode(x=x)
+    whiskers = base.mark_rule().encode(
+        y=alt.Y('lower:Q', title=value_col), y2='upper:Q'
+    )
+    box = base.mark_bar(size=30).encode(
+        y='q1:Q', y2='q3:Q', color=color,
+        tooltip=[group_col, 'n', 'lower', 'q1', 'median', 'q3', 'upper'],
+    )
+    median = base.mark_tick(color='white', size=30).encode(y='median:Q')
+    layers = [whiskers, box, median]
+    if len(outliers):
+        layers.append(alt.Chart(outliers).mark_point().encode(x=x, y=f'{value_col}:Q', color=color))
+    chart = alt.layer(*layers)
+    return chart.properties(title=title) if title else chart
+
+
+def errorbar(ci, group_col):
+    """Mean +/- CI error bars from mean_ci() output."""
+    return alt.Chart(ci).mark_errorbar().encode(
+        x=alt.X(f'{group_col}:N'), y=alt.Y('ci_low:Q', title=''), y2='ci_high:Q',
+        color=alt.Color(f'{group_col}:N'),
+    )
+
+
+def trend_line(endpoints, x, y, detail=None, **mark):
+    """Fitted line from analytics.regression.line_endpoints() output (one segment per `detail` value)."""
+    encoding = {'x': f'{x}:Q', 'y': f'{y}:Q'}
+    if detail:
+        encoding['detail'] = f'{detail}:N'
+    return alt.Chart(endpoints).mark_line(**mark).encode(**encoding)
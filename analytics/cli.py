@@ -0,0 +1,253 @@
+"""
+Headless batch analytics: the dashboard pipeline without a browser.
+
+    python -m analytics.cli --game-log game_logs_fallback.csv --feedback feedback_logs_fallback.csv --out report/
+    python -m analytics.cli --game-log export.csv --out report/ --workers 4 --no-store
+    python -m analytics.cli --snapshot latest --out report/
+
+Stages: load (CSV read in chunks, every schema version mapped and repaired, see analytics.ingest;
+or a Sheets snapshot, see analytics.snapshot) -> derive features
+(persisted feature store, or in memory with --no-store, sharded by participant
+over a process pool) -> stats (analytics.analysis.run_analysis) & clustering (cluster_analysis).
+
+Writes to --out:
+* rows.parquet, participants.parquet, tests.parquet, regressions.parquet, sessions.parquet
+* report.json (overview, tests, regressions, cluster sizes, paths, duplicates dropped, stage timings)
+* report.html (the same as static tables)
+"""
+import argparse
+import html
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analytics.analysis import cluster_analysis, data_version, run_analysis
+from analytics.config import ANALYTICS_WORKERS, COPIER_MAX_COMPLEXITY, IMPROVER_MIN_COMPLEXITY
+from analytics.derive import derive_columns
+from analytics.feature_store import FeatureStore, attach_features
+from analytics.ingest import CSV_CHUNK_ROWS, read_feedback, read_game_log
+from analytics.loader import FEEDBACK_DEDUP_COLS, GAME_DEDUP_COLS, derive_durations, drop_duplicate_records
+from analytics.schema import apply_schema
+from analytics.similarity import SimilarityCache
+from analytics.snapshot import FEEDBACK_TABLE, GAME_TABLE, list_snapshots, read_snapshot
+
+# =========================================================================
+# === PIPELINE STAGES =====================================================
+# =========================================================================
+
+def _derive_shard(rows):
+    return derive_columns(derive_durations(rows))
+
+
+def derive_in_memory(data, workers=None):
+    """
+    Derived columns without the feature store. Durations and AI/Control groups
+    only need a participant's own rows, so participants are sharded over `workers` processes.
+    """
+    if not workers or workers < 2:
+        return _derive_shard(data)
+    shard = pd.util.hash_pandas_object(data['prolific_id'], index=False).to_numpy() % workers
+    parts = [data[shard == i] for i in range(workers) if (shard == i).any()]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        derived = list(pool.map(_derive_shard, parts))
+    return pd.concat(derived).sort_values(['prolific_id', 'timestamp'])
+
+
+def derive_with_store(data):
+    """Derived columns from the persisted feature store (only new rows are derived)."""
+    cache = SimilarityCache()
+    try:
+        features = FeatureStore().update(data, similarity_cache=cache)
+    finally:
+        cache.close()
+    return attach_features(data, features).sort_values(['prolific_id', 'timestamp'])
+
+# =========================================================================
+# === OUTPUT ==============================================================
+# =========================================================================
+
+def _jsonable(value):
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, (np.bool_, bool)):
+        return bool(value)
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (np.floating, float)):
+        return None if np.isnan(value) else float(value)
+    return value
+
+
+def tests_table(analysis):
+    """All group comparisons as one flat table."""
+    rows = []
+    comparisons = [('ai_used', analysis['tests'])]
+    if analysis['text_metrics'] is not None:
+        comparisons.append(('ai_used', analysis['text_metrics']['tests']))
+    if analysis['strategy'] is not None:
+        comparisons.append(('strategy', analysis['strategy']['tests']))
+    for grouping, tests in comparisons:
+        for metric, result in tests.items():
+            if result is not None:
+                rows.append({'grouping': grouping, 'metric': metric, **result})
+    table = pd.DataFrame(rows)
+    for col in ['group1', 'group2']:
+        if col in table.columns:
+            table[col] = table[col].astype(str)
+    return table
+
+
+def build_report(analysis, clusters, data, feedback, timings, layouts=None, duplicates=None):
+    overview = analysis['overview']
+    strategy = analysis['strategy']
+    text_metrics = analysis['text_metrics']
+    return _jsonable({
+        'data_version': list(data_version(data, feedback)),
+        'overview': {
+            'n_rows': overview['n_rows'],
+            'n_players': overview['n_players'],
+            'avg_total_time': overview['avg_total_time'],
+            'avg_round_time': analysis['durations'].get('avg_round_time'),
+            'missing_duration_rounds': analysis['durations'].get('missing_count'),
+        },
+        'tests': tests_table(analysis).to_dict(orient='records'),
+        'median_similarity': analysis['median_similarity'],
+        'strategy_median_similarity': strategy['median_sim'] if strategy is not None else None,
+        'text_editing': {
+            key: text_metrics[key] for key in ['n_rows', 'ai_rounds', 'median_edit_distance', 'mean_ai_insertion_ratio', 'unedited_share']
+        } if text_metrics is not None else None,
+        'clusters': analysis['user_agg']['cluster'].value_counts().to_dict(),
+        'regressions': clusters['reg_stats'],
+        'paths': {
+            'completion_rate': analysis['paths']['completion_rate'],
+            'avg_rounds_over_optimal': analysis['paths']['avg_rounds_over_optimal'],
+            'by_ai_used': analysis['paths']['by_ai_used'].to_dict(orient='records'),
+        },
+        'csv_layouts': dict(layouts or {}),
+        'duplicates_dropped': dict(duplicates or {}),
+        'timings_seconds': timings,
+    })
+
+
+def render_html(report, tables):
+    """Static HTML: the report's headline numbers plus each table."""
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Fermentation Game Analytics</title>",
+        "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;margin-bottom:2em}"
+        "td,th{border:1px solid #ccc;padding:4px 8px;text-align:right}</style></head><body>",
+        "<h1>Fermentation Game Analytics</h1>",
+        "<ul>",
+    ]
+    for key, value in report['overview'].items():
+        parts.append(f"<li><b>{html.escape(key)}</b>: {html.escape(str(value))}</li>")
+    parts.append(f"<li><b>median_similarity</b>: {report['median_similarity']}</li></ul>")
+    for title, table in tables.items():
+        parts.append(f"<h2>{html.escape(title)}</h2>")
+        parts.append(table.to_html(index=False, float_format=lambda v: f"{v:.4f}", na_rep=""))
+    parts.append(f"<p>Timings (s): {html.escape(json.dumps(report['timings_seconds']))}</p></body></html>")
+    return "\n".join(parts)
+
+
+def write_outputs(out_dir, data, analysis, clusters, report):
+    os.makedirs(out_dir, exist_ok=True)
+    tests = tests_table(analysis)
+    regressions = pd.DataFrame(clusters['reg_stats'])
+    clusters = analysis['user_agg']['cluster'].value_counts().rename_axis('cluster').reset_index(name='participants')
+
+    data.to_parquet(os.path.join(out_dir, "rows.parquet"), index=False)
+    analysis['user_agg'].to_parquet(os.path.join(out_dir, "participants.parquet"), index=False)
+    tests.to_parquet(os.path.join(out_dir, "tests.parquet"), index=False)
+    regressions.to_parquet(os.path.join(out_dir, "regressions.parquet"), index=False)
+    analysis['paths']['sessions'].to_parquet(os.path.join(out_dir, "sessions.parquet"), index=False)
+
+    with open(os.path.join(out_dir, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    tables = {
+        'Group comparisons': tests, 'Clusters': clusters, 'Cluster regressions': regressions,
+        'Wasted actions by AI usage': analysis['paths']['by_ai_used'],
+    }
+    with open(os.path.join(out_dir, "report.html"), "w") as f:
+        f.write(render_html(report, tables))
+
+# =========================================================================
+# === MAIN ================================================================
+# =========================================================================
+
+def resolve_snapshot(snapshot):
+    """'latest' -> newest directory in SNAPSHOT_DIR; anything else is taken as a path."""
+    if snapshot != 'latest':
+        return snapshot
+    snapshots = list_snapshots()
+    if not snapshots:
+        raise SystemExit("No snapshots found (export one with python -m analytics.snapshot).")
+    return snapshots[0]
+
+
+def run(game_log, feedback_log=None, out_dir="report", workers=ANALYTICS_WORKERS, use_store=True, chunksize=CSV_CHUNK_ROWS, snapshot=None,
+        copier_max_complexity=COPIER_MAX_COMPLEXITY, improver_min_complexity=IMPROVER_MIN_COMPLEXITY):
+    """Full pipeline; returns the report dict (also written to out_dir)."""
+    timings = {}
+
+    start = time.perf_counter()
+    layouts = Counter()
+    feedback = None
+    if snapshot:
+        game_log = resolve_snapshot(snapshot)
+        data = read_snapshot(game_log, GAME_TABLE)
+        feedback = read_snapshot(game_log, FEEDBACK_TABLE)
+    else:
+        data = read_game_log(game_log, chunksize=chunksize, counts=layouts)
+        if feedback_log and os.path.exists(feedback_log):
+            feedback = read_feedback(feedback_log, chunksize=chunksize)
+    if data is None or data.empty:
+        raise SystemExit(f"No game data found in {game_log}.")
+    data, duplicate_rounds = drop_duplicate_records(data, GAME_DEDUP_COLS)
+    feedback, duplicate_feedback = drop_duplicate_records(feedback, FEEDBACK_DEDUP_COLS)
+    timings['load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    data = apply_schema(derive_with_store(data) if use_store else derive_in_memory(data, workers))
+    timings['derive'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    analysis = run_analysis(data, feedback, workers=workers,
+                            copier_max_complexity=copier_max_complexity, improver_min_complexity=improver_min_complexity)
+    clusters = cluster_analysis(analysis['user_agg'], copier_max_complexity, improver_min_complexity)
+    timings['analysis'] = time.perf_counter() - start
+
+    duplicates = {'rounds': duplicate_rounds, 'feedback': duplicate_feedback}
+    report = build_report(analysis, clusters, data, feedback, timings, layouts, duplicates)
+    write_outputs(out_dir, data, analysis, clusters, report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--game-log', default="game_logs_fallback.csv")
+    parser.add_argument('--feedback', default="feedback_logs_fallback.csv")
+    parser.add_argument('--out', default="report")
+    parser.add_argument('--workers', type=int, default=ANALYTICS_WORKERS, help="process pool size (derive shards, resampling)")
+    parser.add_argument('--no-store', action='store_true', help="derive in memory instead of using the persisted feature store")
+    parser.add_argument('--chunksize', type=int, default=CSV_CHUNK_ROWS, help="CSV rows read per chunk")
+    parser.add_argument('--snapshot', help="read a Sheets snapshot directory ('latest' for the newest) instead of the CSVs")
+    parser.add_argument('--copier-max-complexity', type=float, default=COPIER_MAX_COMPLEXITY, help="Copier cluster: avg complexity below this")
+    parser.add_argument('--improver-min-complexity', type=float, default=IMPROVER_MIN_COMPLEXITY, help="Improver cluster: avg complexity above this")
+    args = parser.parse_args()
+
+    report = run(args.game_log, args.feedback, args.out, args.workers, not args.no_store, args.chunksize, args.snapshot,
+                 args.copier_max_complexity, args.improver_min_complexity)
+    overview = report['overview']
+    print(f"{overview['n_rows']} rows, {overview['n_players']} players -> {args.out}/")
+    for stage, seconds in report['timings_seconds'].items():
+        print(f"  {stage:<10} {seconds:8.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+import os
+
+# Local working directory for everything the dashboard persists between runs
+CACHE_DIR = ".dashboard_cache"
+
+# Optional process pool for cold-cache batch work (None = single process)
+_workers = os.environ.get("FERMENT_ANALYTICS_WORKERS")
+ANALYTICS_WORKERS = int(_workers) if _workers else None
+
+# 'ratio' (difflib, exact) or 'jaccard' (word bigrams, much faster); see analytics/similarity.py
+SIMILARITY_METRIC = os.environ.get("FERMENT_SIMILARITY_METRIC", "ratio")
+
+# Bootstrap / permutation resamples per group comparison (analytics/stats_engine.py)
+STATS_RESAMPLES = int(os.environ.get("FERMENT_STATS_RESAMPLES", 10_000))
+
+# Frozen exports of the study spreadsheet, one sub-directory per export (analytics/snapshot.py)
+SNAPSHOT_DIR = os.environ.get("FERMENT_SNAPSHOT_DIR", "snapshots")
+
+# Participant clusters (analytics/derive.py classify_users): Copier below, Improver above (avg complexity)
+COPIER_MAX_COMPLEXITY = float(os.environ.get("FERMENT_COPIER_MAX_COMPLEXITY", 40))
+IMPROVER_MIN_COMPLEXITY = float(os.environ.get("FERMENT_IMPROVER_MIN_COMPLEXITY", 80))
@@ -0,0 +1,72 @@
+"""
+Processed game log shared by every dashboard session of a server process.
+
+load_data() used to be st.cache_data, which hands each session its own
+unpickled copy of the derived frame, so memory grew with viewers x rows. Now
+the processed frame is written once per (data version, filter) as an
+uncompressed Arrow IPC file (analytics.snapshot.write_table) and read back
+memory-mapped; the dashboard keeps the result in st.cache_resource, so all
+sessions read the same buffers and several server processes share the page
+cache.
+
+Shared frames are read-only: numeric columns are views of the map and raise
+on in-place writes. Never assign columns on them; derived columns belong in
+the feature store (analytics.feature_store), per-view columns on a copy.
+"""
+import glob
+import hashlib
+import os
+
+import pyarrow as pa
+
+from analytics.config import CACHE_DIR, SIMILARITY_METRIC
+from analytics.feature_store import FEATURE_VERSIONS
+from analytics.snapshot import write_table
+
+DATASET_DIR = os.path.join(CACHE_DIR, "datasets")
+KEEP_DATASETS = 8  # Files kept on disk (newest first); matches the dashboard's cache entries
+
+
+def dataset_key(version, filt, source):
+    """
+    File name stem of a load, stable across processes: data_version(), LogFilter, source
+    (snapshot path, 'sheets' or 'csv') and the feature definitions the frame was derived with.
+    """
+    parts = (version, tuple(filt), source, sorted(FEATURE_VERSIONS.items()), SIMILARITY_METRIC)
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def publish(frame, key, directory=DATASET_DIR):
+    """Write `frame` as <directory>/<key>.arrow (once; atomic) and prune old files; returns the path."""
+    path = os.path.join(directory, key + ".arrow")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        write_table(tmp, frame)
+        os.replace(tmp, path)
+    prune(directory)
+    return path
+
+
+def prune(directory=DATASET_DIR, keep=KEEP_DATASETS):
+    """Delete all but the newest `keep` files (frames still mapped stay readable on POSIX)."""
+    paths = sorted(glob.glob(os.path.join(directory, "*.arrow")), key=os.path.getmtime, reverse=True)
+    for path in paths[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            # Still mapped on Windows, or removed by another process
+            pass
+
+
+def open_dataset(path):
+    """Read-only frame over the memory-mapped file (numeric blocks zero-copy, RangeIndex)."""
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def share(frame, version, filt, source):
+    """`frame` as the shared read-only copy for this version, filter and source (empty frames pass through)."""
+    if frame is None or frame.empty:
+        return frame
+    return open_dataset(publish(frame, dataset_key(version, filt, source)))
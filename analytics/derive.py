@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from analytics.config import ANALYTICS_WORKERS, SIMILARITY_METRIC, COPIER_MAX_COMPLEXITY, IMPROVER_MIN_COMPLEXITY
+from analytics.similarity import similarity_for_pairs
+
+# Rounds > 7 share the darkest color of the gradient
+MAX_COLOR_ROUND = 7
+
+# =========================================================================
+# === DERIVED COLUMNS (vectorized, no row-wise apply) =====================
+# =========================================================================
+
+def effective_duration(round_duration, time_diff):
+    """Logged duration if present, else the gap to the previous row (heuristic: < 1 hour), else 0."""
+    return np.select(
+        [round_duration > 0.1, (time_diff > 0) & (time_diff < 3600)],
+        [round_duration, time_diff],
+        default=0.0,
+    )
+
+
+def user_group(df):
+    """'AI User' for every row of a participant who used AI at least once."""
+    ai_users = df.loc[df['ai_used'], 'prolific_id'].unique()
+    return pd.Series(
+        np.where(df['prolific_id'].isin(ai_users), 'AI User', 'Control (No AI)'),
+        index=df.index,
+    )
+
+
+def color_key(df):
+    """Gradient key 'AI_R3' / 'NoAI_R5' used by the stacked duration chart."""
+    rounds = pd.to_numeric(df['round'], errors='coerce').fillna(1).clip(upper=MAX_COLOR_ROUND).astype(int)
+    prefix = pd.Series(np.where(df['ai_used'], 'AI_R', 'NoAI_R'), index=df.index)
+    return prefix + rounds.astype(str)
+
+
+def text_len(df):
+    return df['assessment'].fillna("").astype(str).str.len()
+
+
+def complexity(df):
+    """
+    Average word length * word count (rough proxy for "information density").
+    That product is simply the number of non-whitespace characters: the logged
+    char_count (streamlit_app/text_metrics.py); only older rows without it are scanned.
+    """
+    logged = pd.to_numeric(df['char_count'], errors='coerce') if 'char_count' in df.columns else pd.Series(np.nan, index=df.index)
+    missing = logged.isna()
+    result = logged.astype(float)
+    if missing.any():
+        text = df.loc[missing, 'assessment'].fillna("").astype(str)
+        result[missing] = (text.str.len() - text.str.count(r'\s')).astype(float)
+    return result
+
+
+def ai_similarity(df, metric=SIMILARITY_METRIC, cache=None, workers=ANALYTICS_WORKERS):
+    """
+    Similarity between the assessment and the AI text, 0 where AI was not used.
+    Computed once per distinct (assessment, ai text) pair (see analytics.similarity) and mapped back.
+    """
+    result = pd.Series(0.0, index=df.index)
+    ai_text = df['ai_assessment_text']
+    mask = df['ai_used'] & ai_text.notna() & (ai_text.astype(str) != "")
+    if not mask.any():
+        return result
+
+    pairs = pd.DataFrame({
+        'user': df.loc[mask, 'assessment'].astype(str),
+        'ai': ai_text[mask].astype(str),
+    })
+    codes, uniques = pd.MultiIndex.from_frame(pairs).factorize()
+    ratios = similarity_for_pairs(list(uniques), metric=metric, cache=cache, workers=workers)
+    result[mask] = ratios[codes]
+    return result
+
+
+def derive_columns(df, similarity_cache=None):
+    """Derived-column stage applied once after loading. Returns a new frame."""
+    df = df.copy()
+    df['user_group'] = user_group(df)
+    df['color_key'] = color_key(df)
+    df['text_len'] = text_len(df)
+    df['complexity'] = complexity(df)
+    df['ai_similarity'] = ai_similarity(df, cache=similarity_cache)
+    return df
+
+
+def strategy(ai_similarity, median_sim):
+    """Copier/Improver split of AI-used rows around the median similarity."""
+    return pd.Series(
+        np.where(ai_similarity > median_sim, 'Copier (High Sim)', 'Improver (Low Sim)'),
+        index=ai_similarity.index,
+    )
+
+
+def classify_users(user_agg, copier_max_complexity=COPIER_MAX_COMPLEXITY, improver_min_complexity=IMPROVER_MIN_COMPLEXITY):
+    """
+    Copier: AI Score > 0 AND Complexity < copier_max_complexity (default 40)
+    Improver: AI Score > 0 AND Complexity > improver_min_complexity (default 80)
+    Users: Everyone else
+    """
+    used_ai = user_agg['ai_score'] > 0
+    return pd.Series(
+        np.select(
+            [used_ai & (user_agg['complexity'] < copier_max_complexity),
+             used_ai & (user_agg['complexity'] > improver_min_complexity)],
+            ['Copier', 'Improver'],
+            default='Users',
+        ),
+        index=user_agg.index,
+    )
@@ -0,0 +1,184 @@
+"""
+Persisted derived-feature store.
+
+Derived analytics columns live in Parquet parts under .dashboard_cache/features,
+keyed by a stable `row_id` hashed from the raw log row. Rows are derived once
+when they first appear; bump a version in FEATURE_VERSIONS when a definition
+changes and only that feature is recomputed.
+
+Row-local features only ever need the new rows. Participant-level features
+(time gaps, effective duration, AI/Control group) also depend on a
+participant's other rows, so they are recomputed for participants with new rows.
+update() works from the store; extend() from features the caller already holds
+(analytics.incremental), without reading the store.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from analytics import derive
+from analytics.config import CACHE_DIR
+from analytics.loader import append_cache, clear_cache, derive_durations, read_cache
+
+FEATURES_NAME = "features"
+VERSIONS_FILE = os.path.join(CACHE_DIR, "features_versions.json")
+
+# Bump a version to recompute that feature for every row on the next load
+FEATURE_VERSIONS = {
+    'text_len': 1,
+    'complexity': 1,
+    'ai_similarity': 1,
+    'color_key': 1,
+    'time_diff': 1,
+    'round_duration_seconds': 1,
+    'user_group': 1,
+}
+ROW_FEATURES = ['text_len', 'complexity', 'ai_similarity', 'color_key']
+PARTICIPANT_FEATURES = ['time_diff', 'round_duration_seconds', 'user_group']
+
+
+def row_ids(df):
+    """Stable uint64 id per raw log row (same row -> same id across loads and processes)."""
+    rounds = pd.to_numeric(df['round'], errors='coerce').astype('Int64').astype(str)
+    key = (
+        df['prolific_id'].astype(str) + '|' + df['timestamp'].astype(str) + '|'
+        + rounds + '|' + df['scenario_id'].astype(str)
+    )
+    return pd.util.hash_pandas_object(key, index=False).to_numpy()
+
+
+def _compute_row_features(rows, features, similarity_cache):
+    out = pd.DataFrame({'row_id': rows['row_id']}, index=rows.index)
+    if 'text_len' in features:
+        out['text_len'] = derive.text_len(rows)
+    if 'complexity' in features:
+        out['complexity'] = derive.complexity(rows)
+    if 'ai_similarity' in features:
+        out['ai_similarity'] = derive.ai_similarity(rows, cache=similarity_cache)
+    if 'color_key' in features:
+        out['color_key'] = derive.color_key(rows)
+    return out
+
+
+def _compute_participant_features(rows, features):
+    durations = derive_durations(rows)
+    out = pd.DataFrame({'row_id': durations['row_id']}, index=durations.index)
+    if 'time_diff' in features:
+        out['time_diff'] = durations['time_diff']
+    if 'round_duration_seconds' in features:
+        out['round_duration_seconds'] = durations['round_duration_seconds']
+    if 'user_group' in features:
+        out['user_group'] = derive.user_group(durations)
+    return out
+
+
+class FeatureStore:
+
+    def __init__(self, name=FEATURES_NAME, versions_file=VERSIONS_FILE):
+        self.name = name
+        self.versions_file = versions_file
+
+    def _stored_versions(self):
+        if os.path.exists(self.versions_file):
+            with open(self.versions_file) as f:
+                return json.load(f)
+        return {}
+
+    def _save_versions(self):
+        os.makedirs(os.path.dirname(self.versions_file) or ".", exist_ok=True)
+        with open(self.versions_file, "w") as f:
+            json.dump(FEATURE_VERSIONS, f)
+
+    def load(self, ids=None):
+        """Stored features (only the rows in `ids` if given, filtered in the Parquet scan), latest version of each row."""
+        filters = [('row_id', 'in', list(ids))] if ids is not None else None
+        stored = read_cache(self.name, filters=filters)
+        if stored is None:
+            return pd.DataFrame({'row_id': pd.Series(dtype='uint64')})
+        return stored.drop_duplicates('row_id', keep='last')
+
+    def update(self, raw, similarity_cache=None, persist=True):
+        """
+        Derive features for rows not seen before (and stale features), persist them, return all features for `raw`.
+        For a filtered slice of the log pass persist=False: participant features of new rows are then
+        derived from the slice only, so they are used for this load but not stored.
+        """
+        raw = raw.copy()
+        raw['row_id'] = row_ids(raw)
+        stored = self.load(ids=None if persist else np.unique(raw['row_id']))
+
+        stored_versions = self._stored_versions()
+        stale = {f for f, v in FEATURE_VERSIONS.items() if stored_versions.get(f) != v}
+        if stale == set(FEATURE_VERSIONS):
+            stored = stored[['row_id']].iloc[0:0]  # Nothing reusable: start over
+
+        is_new = ~raw['row_id'].isin(stored['row_id'])
+        touched = raw['prolific_id'].isin(raw.loc[is_new, 'prolific_id'])
+
+        # Row-local features: new rows, plus every row for stale features
+        fresh_row = [f for f in ROW_FEATURES if f not in stale]
+        parts = []
+        if fresh_row and is_new.any():
+            parts.append(_compute_row_features(raw[is_new], fresh_row, similarity_cache))
+        stale_row = [f for f in ROW_FEATURES if f in stale]
+        if stale_row:
+            parts.append(_compute_row_features(raw, stale_row, similarity_cache))
+
+        # Participant features: all rows of participants with new rows, plus every row for stale features
+        fresh_part = [f for f in PARTICIPANT_FEATURES if f not in stale]
+        if fresh_part and touched.any():
+            parts.append(_compute_participant_features(raw[touched], fresh_part))
+        stale_part = [f for f in PARTICIPANT_FEATURES if f in stale]
+        if stale_part:
+            parts.append(_compute_participant_features(raw, stale_part))
+
+        if parts:
+            # Merge the partial results, filling untouched features from the store
+            changed_ids = pd.Index(np.unique(np.concatenate([p['row_id'].to_numpy() for p in parts])), name='row_id')
+            previous = stored.set_index('row_id')
+            parts = [p.drop_duplicates('row_id', keep='last').set_index('row_id') for p in parts]
+            changed = pd.DataFrame(index=changed_ids)
+            for col in FEATURE_VERSIONS:
+                values = previous[col].reindex(changed_ids) if col in previous.columns else pd.Series(np.nan, index=changed_ids)
+                for part in parts:
+                    if col in part.columns:
+                        values = part[col].combine_first(values).reindex(changed_ids)
+                changed[col] = values
+            changed = changed.reset_index()
+
+            if persist:
+                if stale == set(FEATURE_VERSIONS):
+                    clear_cache(self.name)
+                append_cache(self.name, changed, key='row_id')
+                self._save_versions()
+            stored = pd.concat([stored[~stored['row_id'].isin(changed_ids)], changed], ignore_index=True)
+
+        features = raw[['row_id']].merge(stored, on='row_id', how='left')
+        features.index = raw.index
+        return features
+
+    def extend(self, rows, is_new, similarity_cache=None):
+        """
+        Features of `rows` (every row of the participants with new rows, with row_id) after the
+        new ones (is_new) were appended to a log whose features are current: update() ran on it
+        in this process. Earlier rows bring their row features, the new rows get theirs derived,
+        all rows their participant features. The result (row_id + features, index of `rows`)
+        is persisted; the store itself is not read (see analytics.incremental).
+        """
+        is_new = np.asarray(is_new, dtype=bool)
+        row = pd.concat([
+            rows.loc[~is_new, ['row_id'] + ROW_FEATURES],
+            _compute_row_features(rows[is_new], ROW_FEATURES, similarity_cache),
+        ]).reindex(rows.index)
+        participant = _compute_participant_features(rows, PARTICIPANT_FEATURES).reindex(rows.index)
+        features = pd.concat([row, participant[PARTICIPANT_FEATURES]], axis=1)[['row_id'] + list(FEATURE_VERSIONS)]
+        append_cache(self.name, features, key='row_id')
+        return features
+
+
+def attach_features(raw, features):
+    """Raw log rows + stored features (the effective duration replaces the logged one)."""
+    out = raw.drop(columns=[c for c in FEATURE_VERSIONS if c in raw.columns])
+    return pd.concat([out, features], axis=1)
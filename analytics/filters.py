@@ -0,0 +1,70 @@
+"""
+Row filters for the dashboard (date range, participants/cohort, scenarios).
+
+A LogFilter is pushed down into the data source instead of being applied to a
+fully loaded frame:
+* Parquet caches (Sheets sync, feature store): pyarrow row-group filters,
+* CSV fallback: each chunk is filtered right after it is parsed.
+Fields left as None do not filter.
+"""
+from collections import namedtuple
+
+import pandas as pd
+
+
+class LogFilter(namedtuple('LogFilter', ['start', 'end', 'participants', 'scenarios'])):
+    """start/end: timestamps (end exclusive); participants: Prolific IDs; scenarios: scenario IDs."""
+    __slots__ = ()
+
+    def __new__(cls, start=None, end=None, participants=None, scenarios=None):
+        return super().__new__(
+            cls,
+            pd.Timestamp(start) if start is not None else None,
+            pd.Timestamp(end) if end is not None else None,
+            tuple(sorted(str(p) for p in participants)) if participants else None,
+            tuple(sorted(int(s) for s in scenarios)) if scenarios else None,
+        )
+
+    @property
+    def active(self):
+        return any(value is not None for value in self)
+
+    def parquet_filters(self):
+        """Filters for pd.read_parquet / pyarrow (None when nothing is filtered)."""
+        filters = []
+        if self.start is not None:
+            filters.append(('timestamp', '>=', self.start))
+        if self.end is not None:
+            filters.append(('timestamp', '<', self.end))
+        if self.participants is not None:
+            filters.append(('prolific_id', 'in', list(self.participants)))
+        if self.scenarios is not None:
+            filters.append(('scenario_id', 'in', [float(s) for s in self.scenarios]))
+        return filters or None
+
+    def mask(self, frame):
+        """Boolean mask for a repaired game log frame."""
+        keep = pd.Series(True, index=frame.index)
+        if self.start is not None:
+            keep &= frame['timestamp'] >= self.start
+        if self.end is not None:
+            keep &= frame['timestamp'] < self.end
+        if self.participants is not None:
+            keep &= frame['prolific_id'].isin(self.participants)
+        if self.scenarios is not None:
+            keep &= frame['scenario_id'].isin(self.scenarios)
+        return keep
+
+    def apply(self, frame):
+        if frame is None or not self.active:
+            return frame
+        return frame[self.mask(frame)]
+
+    def apply_feedback(self, feedback):
+        """Feedback rows only carry the participant."""
+        if feedback is None or self.participants is None:
+            return feedback
+        return feedback[feedback['prolific_id'].isin(self.participants)]
+
+
+NO_FILTER = LogFilter()
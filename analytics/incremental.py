@@ -0,0 +1,181 @@
+"""
+Live game log kept in memory between dashboard refreshes.
+
+A refresh used to re-read every Parquet part of the synced shards (or the whole
+fallback CSV), rehash and deduplicate the full history and read the whole
+feature store. A MergedLog keeps the deduplicated, derived frame of one live
+source and, per refresh, reads only what the source gained since the last one:
+new Parquet parts (loader.read_new_parts) or the bytes appended to the CSV
+(ingest.read_game_log_tail). Only those rows are deduplicated, against the
+record hashes kept so far, and derived: row features for the new rows,
+participant features for the participants they belong to (FeatureStore.extend).
+Whatever a cursor cannot follow (a compacted or cleared cache, a replaced CSV)
+triggers a full load.
+
+A duplicate read in a later refresh loses to the row already kept, even if its
+timestamp is earlier (a full load keeps the earliest).
+"""
+import os
+import threading
+from collections import Counter
+
+import numpy as np
+
+from analytics.derive import derive_columns
+from analytics.feature_store import FeatureStore, attach_features, row_ids
+from analytics.loader import (
+    FEEDBACK_DEDUP_COLS, GAME_DEDUP_COLS,
+    derive_durations, drop_duplicate_records, read_new_parts, record_hashes,
+)
+from analytics.schema import apply_schema, concat_frames
+
+SHARE_GROWTH = 0.25  # Hand the frame to `share` again once it grew this much since the last time
+SORT_COLS = ['prolific_id', 'timestamp']
+
+# =========================================================================
+# === SOURCES =============================================================
+# =========================================================================
+
+class CacheSource:
+    """Parquet caches written by loader.sync_worksheet, one name per shard."""
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.cursors = {}
+
+    def reset(self):
+        self.cursors = {}
+
+    def read_new(self, counts):
+        frames = []
+        for name in self.names:
+            frame, self.cursors[name] = read_new_parts(name, self.cursors.get(name))
+            frames.append(frame)
+        return concat_frames(frames)
+
+
+class CsvSource:
+    """A fallback CSV the app appends to; read_tail: ingest.read_game_log_tail or read_feedback_tail."""
+
+    def __init__(self, path, read_tail):
+        self.path = path
+        self.read_tail = read_tail
+        self.offset = 0
+
+    def reset(self):
+        self.offset = 0
+
+    def read_new(self, counts):
+        if not os.path.exists(self.path):
+            if self.offset:
+                raise LookupError(f"{self.path} is gone")
+            return None
+        frame, self.offset = self.read_tail(self.path, self.offset, counts)
+        return frame
+
+# =========================================================================
+# === MERGED LOG ==========================================================
+# =========================================================================
+
+class MergedLog:
+    """
+    Deduplicated, derived game log and feedback of one live source, extended by refresh().
+    The frames handed out are never modified afterwards: each refresh builds new ones.
+    share: optional callable(frame) -> frame (e.g. a memory-mapped copy, analytics.dataset),
+    called on the first load and whenever the frame grew by SHARE_GROWTH since.
+    """
+
+    def __init__(self, games, feedback, store=None, similarity_cache=None, share=None):
+        self.games = games
+        self.feedback_source = feedback
+        self.store = store if store is not None else FeatureStore()
+        self.similarity_cache = similarity_cache
+        self.share = share
+        self.store_error = None  # Set when the feature store failed and the last refresh derived in memory
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.data = None  # Sorted by participant and time, RangeIndex
+        self.feedback = None
+        self.layouts = Counter()  # CSV rows per schema version (see analytics.ingest)
+        self.duplicates = {'rounds': 0, 'feedback': 0}
+        self._game_hashes = np.empty(0, dtype=np.uint64)
+        self._feedback_hashes = np.empty(0, dtype=np.uint64)
+        self._logged = np.empty(0)  # Logged round_duration_seconds per row of data (data holds the effective one)
+        self._shared_rows = 0
+        self.games.reset()
+        self.feedback_source.reset()
+
+    def refresh(self):
+        """Take in what the sources gained since the last refresh; returns (data, feedback)."""
+        with self._lock:
+            self.store_error = None
+            try:
+                try:
+                    new_games = self.games.read_new(self.layouts)
+                    new_feedback = self.feedback_source.read_new(Counter())
+                except LookupError as e:
+                    print(f"Incremental Load: {e}, loading everything again")
+                    self._clear()
+                    new_games = self.games.read_new(self.layouts)
+                    new_feedback = self.feedback_source.read_new(Counter())
+
+                self._add_feedback(new_feedback)
+                grew = self._add_games(new_games)
+            except Exception:
+                # The cursors already moved past rows that were not merged: start over next time
+                self._clear()
+                raise
+            if grew and self.share is not None and len(self.data) >= self._shared_rows * (1 + SHARE_GROWTH):
+                self.data = self.share(self.data)
+                self._shared_rows = len(self.data)
+            return self.data, self.feedback
+
+    def _add_feedback(self, new):
+        new, dropped = drop_duplicate_records(new, FEEDBACK_DEDUP_COLS, seen=self._feedback_hashes)
+        self.duplicates['feedback'] += dropped
+        if new is None or new.empty:
+            return
+        self._feedback_hashes = np.concatenate([self._feedback_hashes, record_hashes(new, FEEDBACK_DEDUP_COLS)])
+        self.feedback = concat_frames([self.feedback, new])
+
+    def _add_games(self, new):
+        """Merge new raw rows into data; True if any were kept."""
+        new, dropped = drop_duplicate_records(new, GAME_DEDUP_COLS, seen=self._game_hashes)
+        self.duplicates['rounds'] += dropped
+        if new is None or new.empty:
+            return False
+        new = new.reset_index(drop=True)
+        self._game_hashes = np.concatenate([self._game_hashes, record_hashes(new, GAME_DEDUP_COLS)])
+        new['row_id'] = row_ids(new)
+
+        if self.data is None:
+            rows, is_new, kept, kept_logged = new, np.ones(len(new), dtype=bool), None, np.empty(0)
+        else:
+            # Participant features of the earlier rows of these participants change too
+            touched = self.data['prolific_id'].isin(new['prolific_id'].unique()).to_numpy()
+            earlier = self.data[touched].assign(round_duration_seconds=self._logged[touched])
+            rows = concat_frames([earlier, new])
+            is_new = np.arange(len(rows)) >= len(earlier)
+            kept, kept_logged = self.data[~touched], self._logged[~touched]
+
+        derived = apply_schema(self._derive(rows, is_new))
+        merged = concat_frames([kept, derived])
+        order = merged.sort_values(SORT_COLS, kind='stable').index.to_numpy()
+        self.data = merged.take(order).reset_index(drop=True)
+        self._logged = np.concatenate([kept_logged, rows['round_duration_seconds'].to_numpy(dtype=float)])[order]
+        return True
+
+    def _derive(self, rows, is_new):
+        """Derived frame of `rows` (same index), from the feature store if it is available."""
+        try:
+            if is_new.all():
+                features = self.store.update(rows.drop(columns=['row_id']), similarity_cache=self.similarity_cache)
+            else:
+                features = self.store.extend(rows, is_new, similarity_cache=self.similarity_cache)
+            return attach_features(rows.drop(columns=['row_id']), features)
+        except Exception as e:
+            # Feature store unavailable: derive in memory for this refresh
+            self.store_error = str(e)
+            return derive_columns(derive_durations(rows), similarity_cache=self.similarity_cache).reindex(rows.index)
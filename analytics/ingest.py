@@ -0,0 +1,183 @@
+"""
+Schema-versioned, streaming ingestion of the local fallback CSVs.
+
+The fallback CSVs are appended by data_manager.log_data / log_feedback in
+record order (timestamp last), and fields were added over time without
+rewriting the header, so one file mixes layouts:
+
+    game logs   13 fields  v1: ... user_assessment_final, timestamp
+                14 fields  v2: ... user_assessment_final, tutorial_duration_seconds, timestamp
+                15 fields  v3: ... tutorial_duration_seconds, round_duration_seconds, timestamp
+                16 fields  v4: ... round_duration_seconds, idempotency_key, timestamp
+                23 fields  v5: ... round_duration_seconds, <7 text metrics>, idempotency_key, timestamp
+    feedback     4 fields  v1: prolific_id, total_time_seconds, feedback_text, timestamp
+                 5 fields  v2: prolific_id, total_time_seconds, tutorial_duration_seconds, feedback_text, timestamp
+                 6 fields  v3: ... feedback_text, idempotency_key, timestamp
+
+Each row's layout is detected from the file header plus the row's field count:
+rows as wide as the header use the header's column names (any column order,
+e.g. a Sheets export with timestamp first); other widths use the known
+version of that width. Rows matching no layout are kept, mapped onto the
+header by position, and counted as 'unmapped'. No row is dropped.
+
+Files are parsed with the csv module in chunks of `chunksize` rows; each chunk
+is mapped onto GAME_LOG_COLS / FEEDBACK_LOG_COLS, repaired and filtered before
+the next one is read, so memory is bounded by the selected rows.
+read_game_log_tail / read_feedback_tail only parse the rows appended after a
+byte offset returned by their previous call (analytics.incremental).
+"""
+import csv
+import io
+import os
+from collections import Counter
+
+import pandas as pd
+
+from analytics.loader import repair_feedback, repair_game_log
+from analytics.schema import GAME_LOG_COLS, FEEDBACK_LOG_COLS, concat_frames
+
+CSV_CHUNK_ROWS = 50_000
+
+_GAME_V1 = [
+    'prolific_id', 'round', 'batch_num', 'scenario_id', 'scenario_name',
+    'assessment', 'action', 'seq_score', 'ai_used', 'text_changed',
+    'ai_assessment_text', 'user_assessment_final',
+]
+_TEXT_METRICS = [
+    'pre_ai_assessment', 'edit_distance', 'ai_insertion_ratio',
+    'word_count', 'sentence_count', 'char_count', 'ari',
+]
+GAME_LOG_VERSIONS = {
+    'v1': _GAME_V1 + ['timestamp'],
+    'v2': _GAME_V1 + ['tutorial_duration_seconds', 'timestamp'],
+    'v3': _GAME_V1 + ['tutorial_duration_seconds', 'round_duration_seconds', 'timestamp'],
+    'v4': _GAME_V1 + ['tutorial_duration_seconds', 'round_duration_seconds', 'idempotency_key', 'timestamp'],
+    'v5': _GAME_V1 + ['tutorial_duration_seconds', 'round_duration_seconds'] + _TEXT_METRICS + ['idempotency_key', 'timestamp'],
+}
+FEEDBACK_VERSIONS = {
+    'v1': ['prolific_id', 'total_time_seconds', 'feedback_text', 'timestamp'],
+    'v2': ['prolific_id', 'total_time_seconds', 'tutorial_duration_seconds', 'feedback_text', 'timestamp'],
+    'v3': ['prolific_id', 'total_time_seconds', 'tutorial_duration_seconds', 'feedback_text', 'idempotency_key', 'timestamp'],
+}
+
+# =========================================================================
+# === LAYOUT DETECTION ====================================================
+# =========================================================================
+
+def detect_layouts(header, versions):
+    """
+    {field count: (layout name, columns)} for a file with this header.
+    The header names the layout of its own width; the other widths come from `versions`.
+    """
+    layouts = {len(cols): (name, cols) for name, cols in versions.items()}
+    header_name = next((name for name, cols in versions.items() if cols == header), 'header')
+    layouts[len(header)] = (header_name, header)
+    return layouts
+
+
+def _rows_to_frame(rows, layouts, header, canonical, counts):
+    """Map one chunk of raw rows (lists of strings) onto the canonical columns, in file order."""
+    by_width = {}
+    for pos, row in enumerate(rows):
+        by_width.setdefault(len(row), []).append(pos)
+
+    frames = []
+    for width, positions in by_width.items():
+        group = [rows[pos] for pos in positions]
+        if width in layouts:
+            name, cols = layouts[width]
+        else:
+            # Unknown layout: keep the row, positionally on the header (padded / truncated)
+            name, cols = 'unmapped', header
+            group = [(row + [""] * len(header))[:len(header)] for row in group]
+        counts[name] += len(group)
+        frames.append(pd.DataFrame(group, columns=cols, index=positions).reindex(columns=canonical))
+    return pd.concat(frames).sort_index().reset_index(drop=True)
+
+
+def iter_csv(path, versions, canonical, chunksize=CSV_CHUNK_ROWS, counts=None):
+    """
+    Yield raw (string) frames with the canonical columns, `chunksize` CSV rows at a time.
+    counts: optional Counter, incremented per layout name.
+    """
+    counts = counts if counts is not None else Counter()
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return
+        layouts = detect_layouts(header, versions)
+        rows = []
+        for row in reader:
+            if not row or all(cell == "" for cell in row):
+                continue  # Blank line, not a record
+            rows.append(row)
+            if len(rows) >= chunksize:
+                yield _rows_to_frame(rows, layouts, header, canonical, counts)
+                rows = []
+        if rows:
+            yield _rows_to_frame(rows, layouts, header, canonical, counts)
+
+def csv_tail(path, offset, versions, canonical, chunksize=CSV_CHUNK_ROWS, counts=None):
+    """
+    Raw frames of the rows appended to `path` after byte `offset` (0: every row), and the
+    offset after the last whole line read: a row still being written is left for the next call.
+    Raises LookupError if the file is now shorter than `offset` (replaced): read it again from 0.
+    """
+    counts = counts if counts is not None else Counter()
+    with open(path, 'rb') as f:
+        header_line = f.readline()
+        size = os.fstat(f.fileno()).st_size
+        if size < offset:
+            raise LookupError(f"{path} is shorter than the {offset} bytes read before")
+        start = max(offset, len(header_line))
+        f.seek(start)
+        data = f.read(size - start)
+    data = data[:data.rfind(b'\n') + 1]
+    header = next(csv.reader([header_line.decode('utf-8-sig')]), None)
+    if not header or not data:
+        return [], start + len(data)
+
+    layouts = detect_layouts(header, versions)
+    rows = [row for row in csv.reader(io.StringIO(data.decode('utf-8'), newline='')) if row and any(cell != "" for cell in row)]
+    frames = [_rows_to_frame(rows[i:i + chunksize], layouts, header, canonical, counts) for i in range(0, len(rows), chunksize)]
+    return frames, start + len(data)
+
+# =========================================================================
+# === READERS =============================================================
+# =========================================================================
+
+def read_game_log(path, filt=None, chunksize=CSV_CHUNK_ROWS, counts=None):
+    """Repaired game log rows of every layout in `path`, filtered chunk by chunk (LogFilter). None if empty."""
+    chunks = []
+    for chunk in iter_csv(path, GAME_LOG_VERSIONS, GAME_LOG_COLS, chunksize, counts):
+        chunk = repair_game_log(chunk)
+        chunks.append(filt.apply(chunk) if filt is not None else chunk)
+    return concat_frames(chunks)
+
+
+def read_feedback(path, chunksize=CSV_CHUNK_ROWS, counts=None):
+    chunks = [repair_feedback(chunk) for chunk in iter_csv(path, FEEDBACK_VERSIONS, FEEDBACK_LOG_COLS, chunksize, counts)]
+    return concat_frames(chunks)
+
+
+def read_game_log_tail(path, offset, counts=None):
+    """(repaired game log rows appended after byte `offset` or None, new offset); see csv_tail."""
+    frames, end = csv_tail(path, offset, GAME_LOG_VERSIONS, GAME_LOG_COLS, counts=counts)
+    return concat_frames([repair_game_log(frame) for frame in frames]), end
+
+
+def read_feedback_tail(path, offset, counts=None):
+    frames, end = csv_tail(path, offset, FEEDBACK_VERSIONS, FEEDBACK_LOG_COLS, counts=counts)
+    return concat_frames([repair_feedback(frame) for frame in frames]), end
+
+
+def read_game_log_columns(path, columns, chunksize=CSV_CHUNK_ROWS):
+    """Only `columns` (raw strings) of every game log row, e.g. for the dashboard's filter options."""
+    chunks = [chunk[columns] for chunk in iter_csv(path, GAME_LOG_VERSIONS, GAME_LOG_COLS, chunksize)]
+    return concat_frames(chunks)
+
+
+def describe_counts(counts):
+    """'v1: 12, v2: 2, v3: 4' (empty string for no rows)."""
+    return ", ".join(f"{name}: {n}" for name, n in sorted(counts.items()))
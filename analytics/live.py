@@ -0,0 +1,150 @@
+"""
+Incremental live-study metrics from the write journal (streamlit_app/data_manager.py
+appends one JSON line per write attempt to JOURNAL_FILE).
+
+JournalTail remembers its byte offset and only parses lines appended since the
+last poll; LiveStats folds each new entry into sliding-window counters (deques
+of timestamps, expired from the left), so a tick costs O(new entries), not
+O(study size).
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+
+JOURNAL_FILE = os.environ.get("FERMENT_LOG_JOURNAL", "log_journal.jsonl")
+ACTIVE_WINDOW_SECONDS = 5 * 60  # A participant is active if they logged a round in this window
+RATE_WINDOW_SECONDS = 60
+FAILURE_WINDOW_SECONDS = 15 * 60
+RECENT_COMPLETIONS = 20
+COMPLETED_SCENARIO_ID = 1  # log_data writes a final '1: All Good' row when a game is won
+
+
+class JournalTail:
+    """Reads whole lines appended to a file since the previous read (restarts if the file shrinks)."""
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        self.offset = 0
+        self.partial = b""
+        self.bad_lines = 0
+
+    def read_new(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return []
+        if size < self.offset:
+            # Truncated or replaced: start over
+            self.offset, self.partial = 0, b""
+        if size == self.offset:
+            return []
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read(size - self.offset)
+        self.offset += len(chunk)
+
+        lines = (self.partial + chunk).split(b"\n")
+        self.partial = lines.pop()  # Incomplete last line (empty if the chunk ended with a newline)
+        entries = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                self.bad_lines += 1
+        return entries
+
+
+class LiveStats:
+    """Sliding-window study metrics, updated entry by entry."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.activity = deque()          # (ts, prolific_id) per logged round, oldest first
+        self.active = Counter()          # prolific_id -> rounds inside the active window
+        self.rounds = deque()            # ts of rounds inside the rate window
+        self.writes = deque()            # (ts, sheets_ok) inside the failure window
+        self.window_failures = 0
+        self.completions = deque(maxlen=RECENT_COMPLETIONS)
+        self.totals = Counter()          # entries, rounds, feedback, sheets_failures, completions
+        self.last_entry_ts = None
+
+    def add(self, entry, now):
+        """Count one journal entry; windows only take entries still inside them (the journal may hold old lines)."""
+        ts = float(entry.get('ts') or now)
+        ok = bool(entry.get('sheets_ok'))
+        self.totals['entries'] += 1
+        self.totals['sheets_failures'] += not ok
+        if ts >= now - FAILURE_WINDOW_SECONDS:
+            self.writes.append((ts, ok))
+            self.window_failures += not ok
+        self.last_entry_ts = max(ts, self.last_entry_ts or ts)
+
+        if entry.get('retry'):
+            # Sheets retry of a record already logged (see data_manager.claim_key): counted once
+            return
+        if entry.get('kind') == 'feedback':
+            self.totals['feedback'] += 1
+            return
+        pid = str(entry.get('prolific_id', ''))
+        self.totals['rounds'] += 1
+        if ts >= now - ACTIVE_WINDOW_SECONDS:
+            self.activity.append((ts, pid))
+            self.active[pid] += 1
+        if ts >= now - RATE_WINDOW_SECONDS:
+            self.rounds.append(ts)
+        if str(entry.get('scenario_id')) == str(COMPLETED_SCENARIO_ID):
+            self.totals['completions'] += 1
+            self.completions.appendleft({'time': time.strftime('%H:%M:%S', time.localtime(ts)), 'prolific_id': pid, 'rounds': entry.get('round')})
+
+    def expire(self, now):
+        """Drop entries that left their windows (each entry is dropped once: amortized O(1))."""
+        while self.activity and self.activity[0][0] < now - ACTIVE_WINDOW_SECONDS:
+            _, pid = self.activity.popleft()
+            self.active[pid] -= 1
+            if self.active[pid] <= 0:
+                del self.active[pid]
+        while self.rounds and self.rounds[0] < now - RATE_WINDOW_SECONDS:
+            self.rounds.popleft()
+        while self.writes and self.writes[0][0] < now - FAILURE_WINDOW_SECONDS:
+            _, ok = self.writes.popleft()
+            self.window_failures -= not ok
+
+    def update(self, entries, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            for entry in entries:
+                self.add(entry, now)
+            self.expire(now)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'active_participants': len(self.active),
+                'rounds_per_minute': len(self.rounds) * 60 / RATE_WINDOW_SECONDS,
+                'sheets_failure_rate': self.window_failures / len(self.writes) if self.writes else None,
+                'recent_completions': list(self.completions),
+                'totals': dict(self.totals),
+                'last_entry_ts': self.last_entry_ts,
+            }
+
+
+class LiveMonitor:
+    """A JournalTail feeding a LiveStats; poll() is safe to call from several sessions."""
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.tail = JournalTail(path)
+        self.stats = LiveStats()
+        self.poll_lock = threading.Lock()
+
+    def poll(self, now=None):
+        with self.poll_lock:
+            entries = self.tail.read_new()
+            self.stats.update(entries, now)
+        snapshot = self.stats.snapshot()
+        snapshot['new_entries'] = len(entries)
+        snapshot['bad_lines'] = self.tail.bad_lines
+        return snapshot
@@ -0,0 +1,269 @@
+import glob
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from analytics.config import CACHE_DIR
+from analytics.derive import effective_duration
+from analytics.schema import (
+    GAME_LOG_COLS, FEEDBACK_LOG_COLS,
+    GAME_NUMERIC_COLS, GAME_BOOL_COLS, FEEDBACK_NUMERIC_COLS,
+    apply_schema, concat_frames,
+)
+
+# Local cache of everything already fetched from Sheets (one Parquet part per refresh)
+STATE_FILE = os.path.join(CACHE_DIR, "sheets_state.json")
+MAX_CACHE_PARTS = 50  # Compact into a single part above this
+_state_lock = threading.RLock()  # Shards sync on parallel threads; they share STATE_FILE
+
+BOOL_MAP = {'True': True, 'False': False, 'true': True, 'false': False, 'TRUE': True, 'FALSE': False}
+
+# =========================================================================
+# === REPAIR (row-local, safe to run on new rows only) & DERIVE ===========
+# =========================================================================
+
+def repair_game_log(data):
+    """Ensure all expected columns exist with consistent types, whatever the source."""
+    data = data.copy()
+    for col in GAME_LOG_COLS:
+        if col not in data.columns:
+            if col in ['round_duration_seconds', 'tutorial_duration_seconds']:
+                data[col] = 0.0
+            elif col == 'ai_used':
+                data[col] = False
+            else:
+                data[col] = ""
+
+    # Ensure boolean columns are proper booleans (handle string 'True'/'False')
+    for col in GAME_BOOL_COLS:
+        # Convert to string first to handle mixed types, then map
+        data[col] = data[col].astype(str).map(BOOL_MAP).fillna(False).astype(bool)
+
+    # Numeric conversion
+    for col in GAME_NUMERIC_COLS:
+        data[col] = pd.to_numeric(data[col], errors='coerce')
+    data['round_duration_seconds'] = data['round_duration_seconds'].fillna(0)
+    data['tutorial_duration_seconds'] = data['tutorial_duration_seconds'].fillna(0)
+
+    # Text columns: keep IDs as strings ('0001' must not become 1)
+    for col in GAME_LOG_COLS:
+        if col not in GAME_NUMERIC_COLS and col not in GAME_BOOL_COLS and col != 'timestamp':
+            data[col] = data[col].fillna("").astype(str)
+
+    data['timestamp'] = pd.to_datetime(data['timestamp'], errors='coerce')
+    return apply_schema(data)
+
+
+def derive_durations(data):
+    """
+    Backfill round durations for historical data from consecutive timestamps.
+    Needs all rows of each participant it is given.
+    """
+    data = data.sort_values(['prolific_id', 'timestamp'])
+
+    # Calculate time difference between consecutive rows for same user
+    data['time_diff'] = data.groupby('prolific_id', observed=True)['timestamp'].diff().dt.total_seconds().fillna(0)
+
+    # Create effective plotting column
+    data['round_duration_seconds'] = effective_duration(data['round_duration_seconds'], data['time_diff'])
+    return data
+
+
+def repair_feedback(feedback):
+    """Repair Feedback Columns."""
+    feedback = feedback.copy()
+    for col in FEEDBACK_LOG_COLS:
+        if col not in feedback.columns:
+            feedback[col] = 0 if 'seconds' in col else ""
+    for col in FEEDBACK_NUMERIC_COLS:
+        feedback[col] = pd.to_numeric(feedback[col], errors='coerce').fillna(0)
+    for col in ['timestamp', 'prolific_id', 'feedback_text', 'idempotency_key']:
+        feedback[col] = feedback[col].fillna("").astype(str)
+    return feedback
+
+# =========================================================================
+# === DEDUPLICATION =======================================================
+# =========================================================================
+# The app drops repeated writes of one record (double clicks, reruns, replays)
+# by idempotency key before they reach a sink; this catches what still got in,
+# e.g. rows logged before keys existed, which are compared on these columns.
+
+GAME_DEDUP_COLS = ['prolific_id', 'round', 'scenario_id', 'action', 'assessment']
+FEEDBACK_DEDUP_COLS = ['prolific_id', 'feedback_text']
+
+
+def record_hashes(frame, fallback_cols):
+    """uint64 per row: hash of the idempotency key, or of `fallback_cols` for rows without one."""
+    keys = frame['idempotency_key'].astype(str) if 'idempotency_key' in frame.columns else pd.Series("", index=frame.index)
+    return np.where(
+        (keys != "").to_numpy(),
+        pd.util.hash_pandas_object(keys, index=False).to_numpy(),
+        pd.util.hash_pandas_object(frame[fallback_cols], index=False).to_numpy(),
+    )
+
+
+def drop_duplicate_records(frame, fallback_cols, seen=None):
+    """
+    Keep the earliest row (by timestamp) per idempotency key; rows without a key
+    are compared on `fallback_cols`. Returns (frame, number of rows dropped).
+    seen: record_hashes() of rows kept before (e.g. by an earlier refresh); rows matching them are dropped too.
+    """
+    if frame is None or frame.empty:
+        return frame, 0
+    hashed = record_hashes(frame, fallback_cols)
+    order = np.argsort(frame['timestamp'].to_numpy(), kind='stable')
+    repeated = pd.Series(hashed[order]).duplicated().to_numpy()
+    if seen is not None and len(seen):
+        repeated = repeated | np.isin(hashed[order], seen)
+    if not repeated.any():
+        return frame, 0
+    keep = np.ones(len(frame), dtype=bool)
+    keep[order[repeated]] = False
+    return frame[keep], int(repeated.sum())
+
+# =========================================================================
+# === INCREMENTAL SHEETS SYNC =============================================
+# =========================================================================
+
+def _load_state():
+    if os.path.exists(STATE_FILE):
+        try:
+            with open(STATE_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Sheets Cache State Error: {e}")
+    return {}
+
+
+def _save_state(state):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, STATE_FILE)
+
+
+def _cache_path(name):
+    return os.path.join(CACHE_DIR, name)
+
+
+def _cache_parts(name):
+    return sorted(glob.glob(os.path.join(_cache_path(name), "part-*.parquet")))
+
+
+def read_cache(name, filters=None, columns=None):
+    """
+    Everything cached so far under `name`, parts in write order (None if nothing cached yet).
+    filters/columns are pushed down into the Parquet scan (see analytics.filters.LogFilter).
+    """
+    parts = _cache_parts(name)
+    if not parts:
+        return None
+    return concat_frames([pd.read_parquet(part, filters=filters, columns=columns) for part in parts])
+
+
+def read_new_parts(name, after=None):
+    """
+    Rows of the parts of `name` written after `after`, and the cursor to pass next time.
+    after: cursor from an earlier call (None: read every part). Raises LookupError when
+    that part is gone or was rewritten (compacted, or the cache was cleared): read everything again.
+    """
+    parts = _cache_parts(name)
+    if after is not None:
+        try:
+            stat = os.stat(os.path.join(_cache_path(name), after[0]))
+        except OSError:
+            raise LookupError(f"cache part {after[0]} of '{name}' is gone")
+        if stat.st_mtime_ns != after[1]:
+            raise LookupError(f"cache part {after[0]} of '{name}' was rewritten")
+        parts = [part for part in parts if os.path.basename(part) > after[0]]
+    if not parts:
+        return None, after
+    cursor = (os.path.basename(parts[-1]), os.stat(parts[-1]).st_mtime_ns)
+    return concat_frames([pd.read_parquet(part) for part in parts]), cursor
+
+
+def append_cache(name, frame, key=None):
+    """
+    Append `frame` as a new Parquet part. With `key`, later parts supersede earlier
+    rows with the same key (upserts); compaction keeps only the latest version.
+    """
+    path = _cache_path(name)
+    os.makedirs(path, exist_ok=True)
+    parts = _cache_parts(name)
+    next_idx = int(os.path.basename(parts[-1])[5:10]) + 1 if parts else 0
+    frame.to_parquet(os.path.join(path, f"part-{next_idx:05d}.parquet"), index=False)
+
+    if len(parts) + 1 > MAX_CACHE_PARTS:
+        # Compaction: one rewrite every MAX_CACHE_PARTS refreshes keeps reads cheap
+        merged = read_cache(name)
+        if key is not None:
+            merged = merged.drop_duplicates(key, keep='last')
+        merged.to_parquet(os.path.join(path, f"part-{next_idx + 1:05d}.parquet"), index=False)
+        for part in parts + [os.path.join(path, f"part-{next_idx:05d}.parquet")]:
+            os.remove(part)
+
+
+def clear_cache(name):
+    for part in _cache_parts(name):
+        os.remove(part)
+    with _state_lock:
+        state = _load_state()
+        state.pop(name, None)
+        _save_state(state)
+
+
+def _col_letter(n):
+    letters = ""
+    while n > 0:
+        n, rem = divmod(n - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _rows_to_frame(header, rows):
+    """Value grids come back with trailing empty cells trimmed: pad to header width."""
+    width = len(header)
+    padded = [(row + [""] * width)[:width] for row in rows if any(cell != "" for cell in row)]
+    return pd.DataFrame(padded, columns=header)
+
+
+def sync_worksheet(ws, name, repair):
+    """
+    Fetch only the rows appended since the last sync (plus the header) in a single
+    values request, repair them and append them to the local Parquet cache.
+    Returns the number of sheet rows cached so far; read them with read_cache(name).
+    Delete CACHE_DIR to force a full reload.
+    Safe to run for different names on parallel threads (one per shard).
+    """
+    with _state_lock:
+        entry = _load_state().get(name, {'rows_fetched': 0, 'header': None})
+    last_col = _col_letter(max(ws.col_count, 1))
+
+    start = entry['rows_fetched'] + 2  # Row 1 is the header
+    header_rows, new_rows = ws.batch_get(["1:1", f"A{start}:{last_col}"])
+    header = header_rows[0] if header_rows else []
+
+    if entry['header'] is not None and header != entry['header']:
+        # Sheet was reset or its header changed: drop the local copy and start over
+        print(f"Sheets Cache: header of '{name}' changed, reloading from scratch")
+        clear_cache(name)
+        entry = {'rows_fetched': 0, 'header': None}
+        new_rows = ws.get(f"A2:{last_col}")
+
+    if header and new_rows:
+        frame = repair(_rows_to_frame(header, new_rows))
+        if not frame.empty:
+            append_cache(name, frame)
+        entry['rows_fetched'] += len(new_rows)
+
+    entry['header'] = header
+    with _state_lock:
+        # Re-read: other names may have been synced while this one was fetching
+        state = _load_state()
+        state[name] = entry
+        _save_state(state)
+    return entry['rows_fetched']
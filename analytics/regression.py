@@ -0,0 +1,77 @@
+"""
+Least-squares trend lines for the dashboard's scatter plots, fitted server-side.
+
+fit_lines() fits y ~ x for every (group, y column) pair in one pass: the frame
+is melted to long form and two groupbys give each pair's means and centered
+sums of squares, so there is no Python loop over clusters or metrics. Slope,
+intercept, r and the two-sided p-value of the slope (t test, n - 2 degrees of
+freedom) match scipy.stats.linregress.
+
+Charts then draw each line from its two endpoints (line_endpoints) instead of
+re-fitting every point in the browser with transform_regression.
+"""
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+
+FIT_COLS = ['n', 'slope', 'intercept', 'r2', 'p_value', 'x_min', 'x_max']
+
+
+def fit_lines(frame, x, ys, by=None, min_points=2):
+    """
+    One row per (by value, metric) with FIT_COLS; pairs with fewer than min_points
+    points or a constant x are left out. NaNs are dropped per metric.
+    """
+    # Internal column names that no caller's metric, x or group column can clash with
+    id_vars = ['__x'] + (['__by'] if by else [])
+    keys = (['__by'] if by else []) + ['__metric']
+    out_keys = ([by] if by else []) + ['metric']
+    long = frame[[x] + ([by] if by else []) + ys].set_axis(
+        ['__x'] + (['__by'] if by else []) + list(ys), axis=1,
+    ).melt(id_vars=id_vars, value_vars=ys, var_name='__metric', value_name='__y').dropna(subset=['__x', '__y'])
+    if long.empty:
+        return pd.DataFrame(columns=out_keys + FIT_COLS)
+
+    long['__x'] = long['__x'].astype(float)
+    long['__y'] = long['__y'].astype(float)
+    grouped = long.groupby(keys, sort=False, observed=True)
+    # Centered sums (no cancellation from raw sums of squares)
+    dx = long['__x'] - grouped['__x'].transform('mean')
+    dy = long['__y'] - grouped['__y'].transform('mean')
+    long = long.assign(__dxx=dx * dx, __dyy=dy * dy, __dxy=dx * dy)
+    fits = long.groupby(keys, sort=False, observed=True).agg(
+        n=('__y', 'size'), x_mean=('__x', 'mean'), y_mean=('__y', 'mean'),
+        sxx=('__dxx', 'sum'), syy=('__dyy', 'sum'), sxy=('__dxy', 'sum'),
+        x_min=('__x', 'min'), x_max=('__x', 'max'), y_first=('__y', 'first'), y_last=('__y', 'last'),
+    ).reset_index()
+    fits = fits[(fits['n'] >= min_points) & (fits['x_max'] > fits['x_min'])].reset_index(drop=True)
+    if fits.empty:
+        return pd.DataFrame(columns=out_keys + FIT_COLS)
+
+    n, sxx, syy, sxy = fits['n'].to_numpy(), fits['sxx'].to_numpy(), fits['syy'].to_numpy(), fits['sxy'].to_numpy()
+    fits['slope'] = sxy / sxx
+    fits['intercept'] = fits['y_mean'] - fits['slope'] * fits['x_mean']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.where(syy > 0, np.clip(sxy / np.sqrt(sxx * syy), -1.0, 1.0), 0.0)
+        dof = n - 2
+        t = r * np.sqrt(dof / ((1.0 - r) * (1.0 + r) + 1e-20))
+        p = 2 * stats.t.sf(np.abs(t), np.maximum(dof, 1))
+    # Two points: a perfect fit, p is 0 (1 if both y are equal), as in linregress
+    two = n == 2
+    p[two] = np.where(fits.loc[two, 'y_first'] == fits.loc[two, 'y_last'], 1.0, 0.0)
+    fits['r2'] = r ** 2
+    fits['p_value'] = p
+    fits = fits.rename(columns={'__metric': 'metric', **({'__by': by} if by else {})})
+    return fits[out_keys + FIT_COLS]
+
+
+def line_endpoints(fits, x, metric, by=None):
+    """The fitted line of `metric` as two points per group, at the group's x range, with columns [by], x, metric."""
+    lines = fits[fits['metric'] == metric]
+    ends = pd.concat([
+        pd.DataFrame({x: lines['x_min'], metric: lines['intercept'] + lines['slope'] * lines['x_min']}),
+        pd.DataFrame({x: lines['x_max'], metric: lines['intercept'] + lines['slope'] * lines['x_max']}),
+    ])
+    if by:
+        ends.insert(0, by, pd.concat([lines[by], lines[by]]))
+    return ends.sort_index(kind='stable').reset_index(drop=True)
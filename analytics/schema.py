@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+# Log Columns (Current Schema)
+GAME_LOG_COLS = [
+    'timestamp', 'prolific_id', 'round', 'batch_num', 
+    'scenario_id', 'scenario_name', 
+    'assessment', 'action', 'seq_score',
+    'ai_used', 'text_changed', 
+    'ai_assessment_text', 'user_assessment_final',
+    'tutorial_duration_seconds',
+    'round_duration_seconds',
+    # Logged text metrics (streamlit_app/text_metrics.py); missing (NaN) on rows logged before them
+    'pre_ai_assessment', 'edit_distance', 'ai_insertion_ratio',
+    'word_count', 'sentence_count', 'char_count', 'ari',
+    'idempotency_key'  # prolific_id|round|scenario_id|page|session, see data_manager.idempotency_key
+]
+
+FEEDBACK_LOG_COLS = [
+    'timestamp', 'prolific_id', 'total_time_seconds', 
+    'tutorial_duration_seconds', 'feedback_text',
+    'idempotency_key'
+]
+
+# Column groups used by the repair step
+TEXT_METRIC_NUMERIC_COLS = ['edit_distance', 'ai_insertion_ratio', 'word_count', 'sentence_count', 'char_count', 'ari']
+GAME_NUMERIC_COLS = ['round', 'batch_num', 'scenario_id', 'seq_score', 'tutorial_duration_seconds', 'round_duration_seconds'] + TEXT_METRIC_NUMERIC_COLS
+GAME_BOOL_COLS = ['ai_used', 'text_changed']
+FEEDBACK_NUMERIC_COLS = ['total_time_seconds', 'tutorial_duration_seconds']
+
+# =========================================================================
+# === TYPED IN-MEMORY LAYOUT ==============================================
+# =========================================================================
+# Applied at ingest (repair) and again after derivation. Repeated strings become
+# categoricals (the ~15 distinct AI texts are stored once, not once per row),
+# small counters become nullable small ints, free text Arrow-backed strings.
+# Flags (ai_used, text_changed) stay numpy bool: 1 byte, never missing after repair.
+
+ARROW_STRING = pd.StringDtype("pyarrow")
+
+GAME_LOG_DTYPES = {
+    'prolific_id': 'category',
+    'scenario_name': 'category',
+    'action': 'category',
+    'ai_assessment_text': 'category',
+    'assessment': ARROW_STRING,
+    'user_assessment_final': ARROW_STRING,
+    'pre_ai_assessment': ARROW_STRING,
+    'idempotency_key': ARROW_STRING,
+    'round': 'Int16',
+    'batch_num': 'Int16',
+    'scenario_id': 'Int8',
+    'seq_score': 'Int8',
+    'edit_distance': 'Int32',
+    'word_count': 'Int32',
+    'sentence_count': 'Int16',
+    'char_count': 'Int32',
+    # Derived columns
+    'user_group': 'category',
+    'color_key': 'category',
+}
+
+
+def _cast(series, dtype):
+    if pd.api.types.is_integer_dtype(pd.api.types.pandas_dtype(dtype)) and not pd.api.types.is_integer_dtype(series.dtype):
+        values = pd.to_numeric(series, errors='coerce')
+        if (values.dropna() % 1 != 0).any():
+            return values  # Not integral (unexpected data): keep it as float rather than truncate
+        return values.astype(dtype)
+    return series.astype(dtype)
+
+
+def apply_schema(frame, dtypes=GAME_LOG_DTYPES):
+    """Cast the columns present in `frame` to the declared compact dtypes (in place, returns frame)."""
+    for col, dtype in dtypes.items():
+        if col in frame.columns and frame[col].dtype != dtype:
+            frame[col] = _cast(frame[col], dtype)
+    return frame
+
+
+def concat_frames(frames):
+    """
+    pd.concat that keeps categoricals categorical: plain concat falls back to
+    object dtype whenever the parts' categories differ.
+    """
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        return None
+    for col in frames[0].columns:
+        if all(col in f.columns and isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames):
+            categories = pd.Index(sorted(set().union(*(f[col].cat.categories for f in frames))))
+            # New frames: the inputs may be shared (e.g. frames handed out by analytics.incremental)
+            frames = [f.assign(**{col: f[col].cat.set_categories(categories)}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def legacy_layout(frame):
+    """The same frame in the pre-schema layout: object strings, float64 counters."""
+    out = frame.copy()
+    for col in out.columns:
+        dtype = out[col].dtype
+        if isinstance(dtype, (pd.CategoricalDtype, pd.StringDtype)) or dtype == object:
+            out[col] = out[col].astype(object)
+        elif pd.api.types.is_extension_array_dtype(dtype) and pd.api.types.is_numeric_dtype(dtype):
+            out[col] = out[col].astype(float)
+    return out
+
+
+def memory_report(frame):
+    """Per-column memory of `frame` vs its legacy layout (deep, bytes), largest savings first."""
+    before = legacy_layout(frame).memory_usage(deep=True, index=False)
+    after = frame.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'legacy_dtype': legacy_layout(frame.head(0)).dtypes.astype(str),
+        'dtype': frame.dtypes.astype(str),
+        'legacy_bytes': before,
+        'bytes': after,
+    })
+    report['saved_pct'] = np.where(report['legacy_bytes'] > 0, 100 * (1 - report['bytes'] / report['legacy_bytes']), 0.0)
+    report = report.sort_values('legacy_bytes', ascending=False)
+    total = pd.DataFrame({
+        'legacy_dtype': [''], 'dtype': [''],
+        'legacy_bytes': [before.sum()], 'bytes': [after.sum()],
+        'saved_pct': [100 * (1 - after.sum() / before.sum()) if before.sum() else 0.0],
+    }, index=['TOTAL'])
+    return pd.concat([report, total])
@@ -0,0 +1,186 @@
+"""
+Sessionization: each participant's path through the scenario state machine.
+
+The transition table is built once from streamlit_app.game_logic
+(GameState.determine_next_state over every scenario x action), and the optimal
+number of actions from every scenario to '1: All Good' by BFS over it. That is
+not always the number of causes: from 16 (all four causes) fixing C1 first has
+no effect because there is no C2+C3+C4 scenario.
+
+Per log row (array lookups, no Python loop over rows):
+* next_scenario_id: state the action leads to,
+* wasted_action: the action fixes a cause the scenario did not have,
+* ineffective_action: the cause was present but the game stays in the same scenario.
+Per session (groupby, sorted by round): start scenario, scenario and action
+sequences, action/wasted counts, whether they finished, and rounds_over_optimal =
+actions taken + optimal actions still needed from where they stopped - optimal
+actions from the start.
+
+A participant who restarts the game with the same Prolific ID gets one session
+per game: the app's session id is the last part of each row's idempotency key;
+rows without one start a new session where the round counter goes back.
+"""
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from analytics.schema import ARROW_STRING
+from streamlit_app.game_logic import ACTIONS, SCENARIO_DATA, GameState
+
+SOLVED_ID = 1
+SESSION_TOKEN = r'^(?:[^|]*\|){4,}([^|]*)$'  # Last part of a key with at least five parts
+ACTION_KEYS = list(ACTIONS)
+ACTION_BY_TEXT = {a['text']: i for i, a in enumerate(ACTIONS.values())}
+ACTION_CODES = np.array([a['fixes'] for a in ACTIONS.values()])  # 'C1'..'C4'
+CAUSE_BITS = {cause: 1 << i for i, cause in enumerate(sorted(set(ACTION_CODES)))}
+
+# =========================================================================
+# === STATE MACHINE TABLES ================================================
+# =========================================================================
+
+def transition_table():
+    """next_state[scenario_id, action_index] (scenario ids index directly; unknown ids map to themselves)."""
+    size = max(SCENARIO_DATA) + 1
+    table = np.tile(np.arange(size)[:, None], (1, len(ACTION_KEYS)))
+    game = GameState(mode='GAME')
+    for sid in SCENARIO_DATA:
+        for a, key in enumerate(ACTION_KEYS):
+            table[sid, a] = game.determine_next_state(sid, key)
+    return table
+
+
+def optimal_distances(table):
+    """Fewest actions from each scenario to SOLVED_ID (BFS on the reversed graph; -1 if unreachable)."""
+    previous = {sid: set() for sid in range(len(table))}
+    for sid in SCENARIO_DATA:
+        for nxt in table[sid]:
+            if nxt != sid:
+                previous[nxt].add(sid)
+    dist = np.full(len(table), -1)
+    dist[SOLVED_ID] = 0
+    queue = deque([SOLVED_ID])
+    while queue:
+        sid = queue.popleft()
+        for prev in previous[sid]:
+            if dist[prev] < 0:
+                dist[prev] = dist[sid] + 1
+                queue.append(prev)
+    return dist
+
+
+def cause_masks():
+    """Bitmask of each scenario's causes, and of the cause each action fixes."""
+    scenario = np.zeros(max(SCENARIO_DATA) + 1, dtype=np.int64)
+    for sid, data in SCENARIO_DATA.items():
+        for cause in data['causes']:
+            scenario[sid] |= CAUSE_BITS[cause]
+    action = np.array([CAUSE_BITS[ACTIONS[key]['fixes']] for key in ACTION_KEYS])
+    return scenario, action
+
+
+NEXT_STATE = transition_table()
+OPTIMAL_DISTANCE = optimal_distances(NEXT_STATE)
+SCENARIO_CAUSES, ACTION_FIXES = cause_masks()
+
+# =========================================================================
+# === SESSIONIZATION ======================================================
+# =========================================================================
+
+def step_columns(data):
+    """Row-level path columns (index preserved, row order irrelevant)."""
+    sid = pd.to_numeric(data['scenario_id'], errors='coerce').fillna(-1).astype(int).to_numpy()
+    known = (sid >= 0) & (sid < len(NEXT_STATE))
+    safe_sid = np.where(known, sid, 0)
+    action = data['action'].astype(str).map(ACTION_BY_TEXT).fillna(-1).astype(int).to_numpy()
+    is_action = (action >= 0) & known
+    safe_action = np.where(is_action, action, 0)
+
+    next_sid = np.where(is_action, NEXT_STATE[safe_sid, safe_action], sid)
+    fixes_present = (SCENARIO_CAUSES[safe_sid] & ACTION_FIXES[safe_action]) != 0
+    return pd.DataFrame({
+        'scenario_id': sid,
+        'action_code': np.where(is_action, ACTION_CODES[safe_action], ""),
+        'is_action': is_action,
+        'next_scenario_id': next_sid,
+        'wasted_action': is_action & ~fixes_present,
+        'ineffective_action': is_action & fixes_present & (next_sid == sid),
+        'optimal_remaining': np.where(known, OPTIMAL_DISTANCE[safe_sid], -1),
+    }, index=data.index)
+
+
+def _join_runs(keys, values, sep):
+    """sep.join(values) per run of equal consecutive keys (rows already grouped), indexed by key."""
+    keys = keys.to_numpy()
+    if not len(keys):
+        return pd.Series(dtype=str)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)]
+    values = values.tolist()
+    return pd.Series([sep.join(values[s:e]) for s, e in zip(starts, ends)], index=keys[starts])
+
+
+def session_keys(rows):
+    """
+    (group number, session number) of each row; rows sorted by participant, then time.
+    Group numbers follow first appearance; session numbers count 1, 2, ... per participant.
+    Session: the last part of the idempotency key (prolific_id|round|scenario_id|page|session_id),
+    else a new one wherever the round counter does not go up.
+    """
+    if 'idempotency_key' in rows.columns:
+        # One Arrow regex over the column (the .str split / rpartition methods are several times slower)
+        keys = rows['idempotency_key'].astype(str).astype(ARROW_STRING)
+        token = keys.str.extract(SESSION_TOKEN, expand=False).fillna("").to_numpy(dtype=object)
+    else:
+        token = np.full(len(rows), "", dtype=object)
+    rounds = pd.to_numeric(rows['round'], errors='coerce')
+    restart = rounds.groupby(rows['prolific_id'], observed=True).diff().le(0)
+    restarts = restart.groupby(rows['prolific_id'], observed=True).cumsum().fillna(0).astype(int).to_numpy()
+    # Integer labels: keyed sessions >= 0, round-counter sessions < 0
+    label = np.where(token != "", pd.factorize(token)[0], -1 - restarts)
+
+    labels = pd.DataFrame({'prolific_id': rows['prolific_id'].to_numpy(), 'label': label})
+    group = labels.groupby(['prolific_id', 'label'], sort=False, observed=True).ngroup().to_numpy()
+    number = pd.Series(group).groupby(labels['prolific_id'], observed=True).rank(method='dense').astype(int).to_numpy()
+    return group, number
+
+
+def sessionize(data):
+    """One row per session (see session_keys; rows ordered by round): path, action counts, distance from the optimal path."""
+    time_order = ['prolific_id'] + (['timestamp'] if 'timestamp' in data.columns else [])
+    cols = list(dict.fromkeys(time_order + ['round', 'scenario_id', 'action'] + (['idempotency_key'] if 'idempotency_key' in data.columns else [])))
+    rows = data[cols].sort_values(time_order, kind='stable')
+    group, number = session_keys(rows)
+    rows = rows.assign(session_key=group, session=number)
+    rows = rows.sort_values(['session_key', 'round'] + time_order[1:], kind='stable')
+    steps = step_columns(rows)
+    steps['session_key'] = rows['session_key']
+
+    sessions = steps.groupby('session_key').agg(
+        start_scenario_id=('scenario_id', 'first'),
+        optimal_actions=('optimal_remaining', 'first'),
+        actions=('is_action', 'sum'),
+        wasted_actions=('wasted_action', 'sum'),
+        ineffective_actions=('ineffective_action', 'sum'),
+    )
+    acted = steps[steps['is_action']]
+    # State after the last action; no action logged: the participant is still where they started
+    end_sid = acted.groupby('session_key')['next_scenario_id'].last()
+    sessions['end_scenario_id'] = end_sid.reindex(sessions.index).fillna(sessions['start_scenario_id']).astype(int)
+    # Paths as strings: one join per session over the already grouped rows
+    sessions['scenario_path'] = _join_runs(steps['session_key'], steps['scenario_id'].astype(str), '→').reindex(sessions.index)
+    sessions['action_path'] = _join_runs(acted['session_key'], acted['action_code'], ' ').reindex(sessions.index).fillna("")
+
+    end_sid = sessions['end_scenario_id'].to_numpy()
+    known_end = (end_sid >= 0) & (end_sid < len(OPTIMAL_DISTANCE))
+    remaining = np.where(known_end, OPTIMAL_DISTANCE[np.clip(end_sid, 0, len(OPTIMAL_DISTANCE) - 1)], -1)
+    sessions['completed'] = end_sid == SOLVED_ID
+    sessions['rounds_over_optimal'] = np.where(
+        (sessions['optimal_actions'] >= 0) & (remaining >= 0),
+        sessions['actions'] + remaining - sessions['optimal_actions'],
+        np.nan,
+    )
+    first = rows.drop_duplicates('session_key').set_index('session_key')
+    sessions.insert(0, 'prolific_id', first['prolific_id'].reindex(sessions.index))
+    sessions.insert(1, 'session', first['session'].reindex(sessions.index))
+    return sessions.reset_index(drop=True)
@@ -0,0 +1,174 @@
+"""
+Similarity between a participant's assessment and the AI text.
+
+Metrics:
+* 'ratio' (default): difflib.SequenceMatcher(None, user, ai).ratio(), exactly.
+  SequenceMatcher only indexes its second sequence, and there are only a handful of
+  distinct AI texts, so one matcher is built per AI text and reused for every
+  assessment compared against it (set_seq1). Same algorithm, same result, without
+  re-indexing the AI text for every row. If the optional `cdifflib` package
+  (C port of SequenceMatcher, identical results) is installed it is used instead.
+* 'jaccard': Jaccard index of lower-cased word bigram sets (unigrams for one-word
+  texts). Linear time, order-insensitive beyond adjacent word pairs; useful as a
+  cheap "how much of the wording overlaps" alternative. Not comparable to 'ratio'.
+
+Results are cached in SQLite keyed by a content hash of (metric, user text, AI text),
+so reruns only compute pairs never seen before.
+"""
+import hashlib
+import os
+import sqlite3
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from analytics.config import CACHE_DIR, ANALYTICS_WORKERS, SIMILARITY_METRIC
+
+try:
+    from cdifflib import CSequenceMatcher as SequenceMatcher
+except ImportError:
+    from difflib import SequenceMatcher
+
+SIMILARITY_DB = os.path.join(CACHE_DIR, "similarity.sqlite")
+METRICS = ('ratio', 'jaccard')
+PARALLEL_MIN_PAIRS = 2000  # Below this a process pool costs more than it saves
+NGRAM_SIZE = 2
+SQLITE_MAX_VARS = 900
+
+# =========================================================================
+# === METRICS =============================================================
+# =========================================================================
+
+def _ratio_batch(ai_text, user_texts):
+    """Exact SequenceMatcher ratios of many texts against one AI text."""
+    matcher = SequenceMatcher(None, "", ai_text)
+    out = []
+    for text in user_texts:
+        matcher.set_seq1(text)
+        out.append(matcher.ratio())
+    return out
+
+
+def _ngrams(text):
+    tokens = text.lower().split()
+    if len(tokens) < NGRAM_SIZE:
+        return set(tokens)
+    return set(zip(*(tokens[i:] for i in range(NGRAM_SIZE))))
+
+
+def ngram_jaccard(user_text, ai_text):
+    a, b = _ngrams(user_text), _ngrams(ai_text)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _jaccard_batch(ai_text, user_texts):
+    ai_grams = _ngrams(ai_text)
+    out = []
+    for text in user_texts:
+        grams = _ngrams(text)
+        union = len(grams | ai_grams)
+        out.append(len(grams & ai_grams) / union if union else 1.0)
+    return out
+
+
+BATCH_FUNCS = {'ratio': _ratio_batch, 'jaccard': _jaccard_batch}
+
+# =========================================================================
+# === PERSISTENT CACHE ====================================================
+# =========================================================================
+
+def pair_key(metric, user_text, ai_text):
+    h = hashlib.blake2b(digest_size=16)
+    for part in (metric, user_text, ai_text):
+        h.update(part.encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+
+class SimilarityCache:
+    """Content-hash -> similarity value, persisted in SQLite."""
+
+    def __init__(self, path=SIMILARITY_DB):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS similarity (key TEXT PRIMARY KEY, value REAL NOT NULL)")
+
+    def get_many(self, keys):
+        found = {}
+        for i in range(0, len(keys), SQLITE_MAX_VARS):
+            chunk = keys[i:i + SQLITE_MAX_VARS]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self.conn.execute(
+                f"SELECT key, value FROM similarity WHERE key IN ({placeholders})", chunk
+            ))
+        return found
+
+    def put_many(self, items):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO similarity (key, value) VALUES (?, ?)", items)
+
+    def close(self):
+        self.conn.close()
+
+# =========================================================================
+# === BATCH ENGINE ========================================================
+# =========================================================================
+
+def _compute(metric, pairs, workers):
+    """Compute similarities for (user, ai) pairs, grouped by AI text."""
+    by_ai = defaultdict(list)
+    for idx, (user_text, ai_text) in enumerate(pairs):
+        by_ai[ai_text].append(idx)
+
+    batch = BATCH_FUNCS[metric]
+    # One task per (AI text, slice of assessments) keeps the per-AI-text matcher reuse
+    tasks = []
+    chunk = max(1, len(pairs) // (4 * (workers or 1)))
+    for ai_text, idxs in by_ai.items():
+        for i in range(0, len(idxs), chunk):
+            tasks.append((ai_text, idxs[i:i + chunk]))
+
+    values = np.empty(len(pairs), dtype=float)
+    if workers and workers > 1 and len(pairs) >= PARALLEL_MIN_PAIRS:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                (idxs, pool.submit(batch, ai_text, [pairs[i][0] for i in idxs]))
+                for ai_text, idxs in tasks
+            ]
+            for idxs, future in futures:
+                values[idxs] = future.result()
+    else:
+        for ai_text, idxs in tasks:
+            values[idxs] = batch(ai_text, [pairs[i][0] for i in idxs])
+    return values
+
+
+def similarity_for_pairs(pairs, metric=SIMILARITY_METRIC, cache=None, workers=ANALYTICS_WORKERS):
+    """
+    Similarity for a list of distinct (user_text, ai_text) pairs.
+    cache: SimilarityCache (None disables persistence). workers: process pool size for cold pairs.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown similarity metric '{metric}', expected one of {METRICS}")
+    values = np.zeros(len(pairs), dtype=float)
+    if not len(pairs):
+        return values
+
+    keys = [pair_key(metric, u, a) for u, a in pairs]
+    found = cache.get_many(keys) if cache is not None else {}
+    missing = [i for i, k in enumerate(keys) if k not in found]
+    for i, k in enumerate(keys):
+        if k in found:
+            values[i] = found[k]
+
+    if missing:
+        computed = _compute(metric, [pairs[i] for i in missing], workers)
+        values[missing] = computed
+        if cache is not None:
+            cache.put_many([(keys[i], float(v)) for i, v in zip(missing, computed)])
+    return values
@@ -0,0 +1,182 @@
+"""
+Frozen local copies of the study spreadsheet, readable without the Sheets API.
+
+export_snapshot(spreadsheet) fetches every worksheet in one values:batchGet
+request (one per spreadsheet when the logs are sharded over several, see
+streamlit_app/sharding.py; shard worksheets are merged into one table). It
+transposes each value grid straight into columns (no per-row dicts), repairs
+and types them (analytics.loader / analytics.schema), and writes them as
+uncompressed Arrow IPC files:
+
+    snapshots/20260301-120000/sheet1.arrow      first worksheet + game log shards
+                             feedback.arrow    'Feedback' worksheet + feedback shards
+                             <title>.arrow     any other worksheet, as strings
+                             manifest.json     source, export time, rows per table
+
+Readers memory-map the files. Columns are used in place from the page cache
+(no parsing), so re-reading a closed study costs almost nothing and every
+process shares the same pages. A snapshot directory only appears once all
+of its files are written.
+
+    python -m analytics.snapshot --credentials credentials.json   # export
+    python -m analytics.snapshot --list
+"""
+import argparse
+import datetime
+import glob
+import json
+import os
+import re
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from analytics.config import SNAPSHOT_DIR
+from analytics.loader import repair_feedback, repair_game_log
+from analytics.schema import concat_frames
+from streamlit_app.sharding import FEEDBACK_WORKSHEET, SHEET_SHARDS, feedback_worksheets, game_worksheets
+
+GAME_TABLE = "sheet1"
+FEEDBACK_TABLE = "feedback"
+REPAIRS = {GAME_TABLE: repair_game_log, FEEDBACK_TABLE: repair_feedback}
+MANIFEST = "manifest.json"
+
+# =========================================================================
+# === EXPORT ==============================================================
+# =========================================================================
+
+def table_name(index, title):
+    """File name of a worksheet: the first one and game log shards hold the game logs, 'Feedback' and its shards the feedback."""
+    if index == 0 or title in game_worksheets():
+        return GAME_TABLE
+    if title == FEEDBACK_WORKSHEET or title in feedback_worksheets():
+        return FEEDBACK_TABLE
+    return re.sub(r'[^a-z0-9_-]+', '_', title.lower()).strip('_') or f"sheet{index + 1}"
+
+
+def fetch_worksheets(spreadsheet):
+    """[(table name, value grid)] of every worksheet, in a single values:batchGet request."""
+    worksheets = spreadsheet.worksheets()
+    ranges = ["'{}'".format(ws.title.replace("'", "''")) for ws in worksheets]  # Whole sheet, A1 notation
+    response = spreadsheet.values_batch_get(ranges)
+    return [
+        (table_name(i, ws.title), value_range.get('values', []))
+        for i, (ws, value_range) in enumerate(zip(worksheets, response.get('valueRanges', [])))
+    ]
+
+
+def grid_to_frame(values):
+    """Header row + rows of strings -> one column per header cell (the API trims trailing blank cells)."""
+    if not values:
+        return pd.DataFrame()
+    header, rows = values[0], [row for row in values[1:] if any(cell != "" for cell in row)]
+    width = len(header)
+    columns = zip(*[(row + [""] * width)[:width] for row in rows]) if rows else [()] * width
+    return pd.DataFrame({name: pd.Series(column, dtype=object) for name, column in zip(header, columns)})
+
+
+def write_table(path, frame):
+    """One uncompressed Arrow IPC file (the pandas dtypes travel in the schema metadata)."""
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def export_snapshot(spreadsheets, out_dir=SNAPSHOT_DIR):
+    """
+    Write every worksheet of `spreadsheets` (one spreadsheet, or the list of shards)
+    as a new timestamped snapshot; returns its directory.
+    """
+    if not isinstance(spreadsheets, (list, tuple)):
+        spreadsheets = [spreadsheets]
+    frames = {}
+    for spreadsheet in spreadsheets:
+        for table, values in fetch_worksheets(spreadsheet):
+            frames.setdefault(table, []).append(grid_to_frame(values))
+    created = datetime.datetime.now()
+    path = os.path.join(out_dir, created.strftime("%Y%m%d-%H%M%S"))
+    tmp = path + ".tmp"
+    os.makedirs(tmp)
+
+    tables = {}
+    for table, parts in frames.items():
+        repair = REPAIRS.get(table)
+        if repair is not None:
+            parts = [repair(part) for part in parts]
+        frame = concat_frames(parts) if len(parts) > 1 else parts[0]
+        write_table(os.path.join(tmp, table + ".arrow"), frame)
+        tables[table] = len(frame)
+
+    manifest = {
+        'spreadsheet': ", ".join(getattr(spreadsheet, 'title', "") for spreadsheet in spreadsheets),
+        'created': created.isoformat(timespec='seconds'),
+        'tables': tables,
+    }
+    with open(os.path.join(tmp, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+    return path
+
+# =========================================================================
+# === READ ================================================================
+# =========================================================================
+
+def list_snapshots(out_dir=SNAPSHOT_DIR):
+    """Complete snapshot directories, newest first."""
+    return sorted((os.path.dirname(p) for p in glob.glob(os.path.join(out_dir, "*", MANIFEST))), reverse=True)
+
+
+def read_manifest(snapshot):
+    with open(os.path.join(snapshot, MANIFEST)) as f:
+        return json.load(f)
+
+
+def read_snapshot_table(snapshot, table, filters=None, columns=None):
+    """
+    Arrow table backed by the memory-mapped file (None if the snapshot has no such table).
+    filters: pyarrow-style [(column, op, value)] as LogFilter.parquet_filters() returns.
+    """
+    path = os.path.join(snapshot, table + ".arrow")
+    if not os.path.exists(path):
+        return None
+    # No copy: the buffers point into the map, which stays open as long as they do
+    data = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    if columns is not None:
+        data = data.select(columns)
+    if filters:
+        data = data.filter(pq.filters_to_expression(filters))
+    return data
+
+
+def read_snapshot(snapshot, table, filters=None, columns=None):
+    """The same as a pandas frame with the exported dtypes (numeric blocks stay zero-copy)."""
+    data = read_snapshot_table(snapshot, table, filters, columns)
+    if data is None:
+        return None
+    return data.to_pandas(split_blocks=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--credentials', default="credentials.json", help="service account key file")
+    parser.add_argument('--sheet', action='append', help="spreadsheet title (repeatable; default: every spreadsheet in SHEET_SHARDS)")
+    parser.add_argument('--out', default=SNAPSHOT_DIR)
+    parser.add_argument('--list', action='store_true', help="list existing snapshots instead of exporting")
+    args = parser.parse_args()
+
+    if args.list:
+        for snapshot in list_snapshots(args.out):
+            manifest = read_manifest(snapshot)
+            print(f"{snapshot}  {manifest['created']}  " + ", ".join(f"{t}: {n}" for t, n in manifest['tables'].items()))
+        return
+
+    import gspread
+    client = gspread.service_account(filename=args.credentials)
+    titles = args.sheet or list(dict.fromkeys(shard.spreadsheet for shard in SHEET_SHARDS))
+    path = export_snapshot([client.open(title) for title in titles], args.out)
+    print(f"Snapshot written: {path} ({read_manifest(path)['tables']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Group comparisons for the dashboard hypotheses.
+
+For every (grouping, value column) pair:
+* Welch t-test from group moments,
+* bootstrap percentile CI of the difference in means,
+* two-sided permutation-test p-value for the difference in means.
+
+Each grouping is split once; all of its value columns are resampled together as
+NumPy index matrices (one bootstrap draw / one label permutation serves every
+column), chunked so no chunk holds more than CHUNK_ELEMENTS values, optionally
+split across a process pool. Resamples come in fixed blocks of RESAMPLE_BLOCK,
+each with its own seed, so the results only depend on the seed, not on the
+number of workers.
+With the small N of a single study the Welch p-value alone is fragile; the
+bootstrap CI and permutation p do not assume normality.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import repeat
+
+import numpy as np
+import scipy.stats as stats
+
+from analytics.config import ANALYTICS_WORKERS, STATS_RESAMPLES
+
+CHUNK_ELEMENTS = 4_000_000  # ~32 MB of float64 per resampling matrix
+RESAMPLE_BLOCK = 1000  # Resamples per seed (the unit of work of the process pool)
+CI_LEVEL = 0.95
+
+
+def _welch(n1, m1, v1, n2, m2, v2):
+    """Welch t-test from moments (same result as stats.ttest_ind(..., equal_var=False))."""
+    se1, se2 = v1 / n1, v2 / n2
+    se = np.sqrt(se1 + se2)
+    if se == 0:
+        return np.nan, np.nan
+    t_stat = (m1 - m2) / se
+    dof = (se1 + se2) ** 2 / (se1 ** 2 / (n1 - 1) + se2 ** 2 / (n2 - 1))
+    return t_stat, 2 * stats.t.sf(abs(t_stat), dof)
+
+
+def _resample(x1, x2, n_resamples, seed):
+    """
+    Bootstrap mean differences and permutation 'hits' for value matrices
+    x1 (n1 x C) and x2 (n2 x C). Every resample is shared by all C columns.
+    """
+    rng = np.random.default_rng(seed)
+    n1, n2 = len(x1), len(x2)
+    pooled = np.concatenate([x1, x2])
+    total = pooled.sum(axis=0)
+    observed = np.abs(x1.mean(axis=0) - x2.mean(axis=0))
+    boot = np.empty((n_resamples, pooled.shape[1]))
+    hits = np.zeros(pooled.shape[1], dtype=np.int64)
+
+    rows = max(1, CHUNK_ELEMENTS // ((n1 + n2) * pooled.shape[1]))
+    for start in range(0, n_resamples, rows):
+        b = min(rows, n_resamples - start)
+        # Bootstrap: resample each group with replacement
+        boot[start:start + b] = x1[rng.integers(0, n1, (b, n1))].mean(axis=1) - x2[rng.integers(0, n2, (b, n2))].mean(axis=1)
+        # Permutation: each row draws which n1 pooled values form group 1
+        group1 = np.argpartition(rng.random((b, n1 + n2)), n1, axis=1)[:, :n1]
+        sum1 = pooled[group1].sum(axis=1)
+        diffs = sum1 / n1 - (total - sum1) / n2
+        hits += np.count_nonzero(np.abs(diffs) >= observed - 1e-12, axis=0)
+    return boot, hits
+
+
+def resampling_pool(workers=ANALYTICS_WORKERS):
+    """Context manager: a process pool for resampling_tests, or None when `workers` < 2."""
+    if workers and workers > 1:
+        return ProcessPoolExecutor(max_workers=workers)
+    return nullcontext()
+
+
+def resampling_tests(x1, x2, n_resamples=STATS_RESAMPLES, seed=0, pool=None, ci=CI_LEVEL):
+    """
+    Bootstrap CI of mean(x1) - mean(x2) and permutation p-value, per column.
+    x1, x2: (n, C) matrices without NaNs. Returns one result dict per column.
+    pool: executor from resampling_pool() to spread the blocks over (same results without).
+    """
+    sizes = [min(RESAMPLE_BLOCK, n_resamples - start) for start in range(0, n_resamples, RESAMPLE_BLOCK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if pool is not None and len(sizes) > 1:
+        results = list(pool.map(_resample, repeat(x1), repeat(x2), sizes, seeds))
+    else:
+        results = [_resample(x1, x2, size, block_seed) for size, block_seed in zip(sizes, seeds)]
+    boot = np.concatenate([r[0] for r in results])
+    hits = sum(r[1] for r in results)
+
+    alpha = 1 - ci
+    ci_low, ci_high = np.quantile(boot, [alpha / 2, 1 - alpha / 2], axis=0)
+    return [
+        {
+            'ci_low': ci_low[c], 'ci_high': ci_high[c],
+            'perm_p': (hits[c] + 1) / (n_resamples + 1),
+            'n_resamples': n_resamples,
+        }
+        for c in range(boot.shape[1])
+    ]
+
+
+def _moments(x1, x2, group1_val, group2_val):
+    m1, m2 = x1.mean(), x2.mean()
+    t_stat, p_val = _welch(len(x1), m1, x1.var(ddof=1), len(x2), m2, x2.var(ddof=1))
+    return {
+        'group1': group1_val, 'group2': group2_val,
+        'n1': len(x1), 'n2': len(x2),
+        'mean1': m1, 'mean2': m2, 'diff': m1 - m2,
+        't': t_stat, 'p': p_val,
+    }
+
+
+def compare_groups(data, group_col, value_cols, group1_val=True, group2_val=False,
+                   n_resamples=STATS_RESAMPLES, seed=0, workers=ANALYTICS_WORKERS, pool=None):
+    """
+    Compare group1 vs group2 on every column in value_cols.
+    Columns without missing values share one set of resamples; columns with
+    NaNs drop them and are resampled on their own.
+    pool: executor from resampling_pool() (else one of `workers` processes is made for this call).
+    Returns {value_col: result dict, or None if a group has < 2 values}.
+    """
+    if pool is None:
+        with resampling_pool(workers) as own_pool:
+            return _compare_groups(data, group_col, value_cols, group1_val, group2_val, n_resamples, seed, own_pool)
+    return _compare_groups(data, group_col, value_cols, group1_val, group2_val, n_resamples, seed, pool)
+
+
+def _compare_groups(data, group_col, value_cols, group1_val, group2_val, n_resamples, seed, pool):
+    positions = data.groupby(group_col, sort=False).indices
+    idx1 = positions.get(group1_val, np.array([], dtype=int))
+    idx2 = positions.get(group2_val, np.array([], dtype=int))
+    values = data[value_cols].to_numpy(dtype=float, na_value=np.nan)
+    v1, v2 = values[idx1], values[idx2]
+
+    results = {col: None for col in value_cols}
+    complete = [c for c in range(len(value_cols)) if not (np.isnan(v1[:, c]).any() or np.isnan(v2[:, c]).any())]
+    if complete and len(v1) >= 2 and len(v2) >= 2:
+        batched = resampling_tests(v1[:, complete], v2[:, complete], n_resamples=n_resamples, seed=seed, pool=pool)
+        for c, resampled in zip(complete, batched):
+            results[value_cols[c]] = {**_moments(v1[:, c], v2[:, c], group1_val, group2_val), **resampled}
+
+    for c in range(len(value_cols)):
+        if c in complete:
+            continue
+        x1 = v1[:, c][~np.isnan(v1[:, c])]
+        x2 = v2[:, c][~np.isnan(v2[:, c])]
+        if len(x1) < 2 or len(x2) < 2:
+            continue
+        resampled = resampling_tests(x1[:, None], x2[:, None], n_resamples=n_resamples, seed=seed + 1 + c, pool=pool)[0]
+        results[value_cols[c]] = {**_moments(x1, x2, group1_val, group2_val), **resampled}
+    return results
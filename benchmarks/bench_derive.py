@@ -0,0 +1,130 @@
+"""
+Benchmark: row-wise apply() derivations (pre-vectorization dashboard code) vs analytics.derive.
+
+    python benchmarks/bench_derive.py --sizes 10000 100000 1000000
+
+The legacy row-wise passes are copied verbatim from the old dashboard.py so the
+comparison stays meaningful after the dashboard moved on.
+"""
+import argparse
+import difflib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import derive  # noqa: E402
+from streamlit_app.game_logic import AI_ASSESSMENTS  # noqa: E402
+
+PHRASES = [
+    "SG too high", "temperature looks high", "pH is dropping", "CO2 is very low",
+    "yeast seems unhealthy", "possible infection", "oxygen leak?", "all good",
+    "fermentation stuck", "sanitation problem", "fix the temp controller first",
+]
+
+# =========================================================================
+# === SYNTHETIC DATA ======================================================
+# =========================================================================
+
+def make_frame(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    n_participants = max(1, n_rows // 7)
+    scenario_ids = np.array(list(AI_ASSESSMENTS))
+    n_words = rng.integers(1, 4, n_rows)
+    phrase_idx = rng.integers(0, len(PHRASES), (n_rows, 3))
+    assessments = [
+        ". ".join(PHRASES[j] for j in phrase_idx[i, :n_words[i]]) for i in range(n_rows)
+    ]
+    scenario = rng.choice(scenario_ids, n_rows)
+    return pd.DataFrame({
+        'prolific_id': (rng.integers(0, n_participants, n_rows)).astype(str),
+        'round': rng.integers(1, 10, n_rows),
+        'scenario_id': scenario,
+        'assessment': assessments,
+        'ai_used': rng.random(n_rows) < 0.4,
+        'ai_assessment_text': [AI_ASSESSMENTS[s] for s in scenario],
+        'round_duration_seconds': np.where(rng.random(n_rows) < 0.7, rng.exponential(40, n_rows), 0.0),
+        'time_diff': rng.exponential(60, n_rows),
+    })
+
+# =========================================================================
+# === LEGACY (ROW-WISE) IMPLEMENTATION ====================================
+# =========================================================================
+
+def legacy_derive(df):
+    df = df.copy()
+
+    def get_valid_duration(row):
+        if row['round_duration_seconds'] > 0.1:
+            return row['round_duration_seconds']
+        if 0 < row['time_diff'] < 3600:
+            return row['time_diff']
+        return 0.0
+
+    df['round_duration_seconds'] = df.apply(get_valid_duration, axis=1)
+
+    ai_users = df[df['ai_used'] == True]['prolific_id'].unique()
+    df['user_group'] = df['prolific_id'].apply(lambda x: 'AI User' if x in ai_users else 'Control (No AI)')
+
+    def get_color_key(row):
+        r = min(int(row['round']), 7)
+        return f"{'AI' if row['ai_used'] else 'NoAI'}_R{r}"
+
+    df['color_key'] = df.apply(get_color_key, axis=1)
+    df['text_len'] = df['assessment'].fillna("").astype(str).apply(len)
+
+    def calc_complexity(text):
+        if not isinstance(text, str) or not text.strip(): return 0
+        words = text.split()
+        if not words: return 0
+        avg_word_len = sum(len(w) for w in words) / len(words)
+        return avg_word_len * len(words)
+
+    df['complexity'] = df['assessment'].apply(calc_complexity)
+
+    def calc_similarity(row):
+        if not row['ai_used'] or pd.isna(row['ai_assessment_text']): return 0.0
+        return difflib.SequenceMatcher(None, str(row['assessment']), str(row['ai_assessment_text'])).ratio()
+
+    df['ai_similarity'] = df.apply(calc_similarity, axis=1)
+    return df
+
+
+def vectorized_derive(df):
+    df = df.copy()
+    df['round_duration_seconds'] = derive.effective_duration(df['round_duration_seconds'], df['time_diff'])
+    return derive.derive_columns(df)
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - start, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--legacy-max-rows', type=int, default=1_000_000,
+                        help="Skip the (slow) legacy run above this many rows")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy (s)':>12} {'vectorized (s)':>15} {'speedup':>9}")
+    for n in args.sizes:
+        frame = make_frame(n)
+        t_new, new = _timed(vectorized_derive, frame)
+        if n <= args.legacy_max_rows:
+            t_old, old = _timed(legacy_derive, frame)
+            for col in ['round_duration_seconds', 'user_group', 'color_key', 'text_len', 'complexity', 'ai_similarity']:
+                assert np.allclose(old[col], new[col]) if old[col].dtype.kind == 'f' else (old[col] == new[col]).all(), col
+            print(f"{n:>10} {t_old:>12.2f} {t_new:>15.3f} {t_old / t_new:>8.1f}x")
+        else:
+            print(f"{n:>10} {'skipped':>12} {t_new:>15.3f} {'-':>9}")
+
+
+if __name__ == '__main__':
+    main()
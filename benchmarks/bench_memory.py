@@ -0,0 +1,33 @@
+"""
+Benchmark: in-memory size of the derived log frame, typed schema vs the previous all-object layout.
+
+    python benchmarks/bench_memory.py --rows 10000 100000
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.derive import derive_columns  # noqa: E402
+from analytics.schema import apply_schema, memory_report  # noqa: E402
+from benchmarks.bench_derive import make_frame  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--columns', action='store_true', help="print the per-column report for the largest size")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'legacy MB':>10} {'typed MB':>9} {'saved':>6}")
+    for n in args.rows:
+        report = memory_report(apply_schema(derive_columns(make_frame(n))))
+        total = report.loc['TOTAL']
+        print(f"{n:>8} {total['legacy_bytes'] / 1e6:>10.1f} {total['bytes'] / 1e6:>9.1f} {total['saved_pct']:>5.0f}%")
+    if args.columns:
+        print(report.to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: per-row difflib similarity vs analytics.similarity (cold, cold + process pool, warm cache).
+
+    python benchmarks/bench_similarity.py --rows 100000 --workers 4
+"""
+import argparse
+import difflib
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.similarity import SimilarityCache, similarity_for_pairs  # noqa: E402
+from benchmarks.bench_derive import make_frame  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--legacy-sample', type=int, default=10_000,
+                        help="Rows timed for the per-row baseline (extrapolated to --rows)")
+    args = parser.parse_args()
+
+    frame = make_frame(args.rows)
+    # Every assessment distinct: worst case for the cache, like free-text answers
+    users = [f"{text} ({i})" for i, text in enumerate(frame['assessment'])]
+    pairs = list(zip(users, frame['ai_assessment_text']))
+
+    sample = pairs[:args.legacy_sample]
+    start = time.perf_counter()
+    legacy = [difflib.SequenceMatcher(None, u, a).ratio() for u, a in sample]
+    t_legacy = (time.perf_counter() - start) * len(pairs) / len(sample)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SimilarityCache(os.path.join(tmp, "similarity.sqlite"))
+        timings = {}
+        start = time.perf_counter()
+        serial = similarity_for_pairs(pairs, workers=None)
+        timings['cold, 1 process'] = time.perf_counter() - start
+        start = time.perf_counter()
+        similarity_for_pairs(pairs, cache=cache, workers=args.workers)
+        timings[f'cold, {args.workers} processes + cache write'] = time.perf_counter() - start
+        start = time.perf_counter()
+        warm = similarity_for_pairs(pairs, cache=cache)
+        timings['warm cache'] = time.perf_counter() - start
+        start = time.perf_counter()
+        similarity_for_pairs(pairs, metric='jaccard', workers=None)
+        timings['jaccard (alternative metric), cold'] = time.perf_counter() - start
+        cache.close()
+
+    assert np.array_equal(serial[:len(legacy)], legacy), "ratio must match difflib exactly"
+    assert np.array_equal(serial, warm)
+
+    print(f"{len(pairs)} pairs")
+    print(f"  {'per-row difflib (extrapolated)':<40} {t_legacy:8.2f} s")
+    for label, seconds in timings.items():
+        print(f"  {label:<40} {seconds:8.2f} s  ({t_legacy / seconds:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
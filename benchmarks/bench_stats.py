@@ -0,0 +1,51 @@
+"""
+Benchmark: every group comparison the dashboard runs (Welch + bootstrap CI + permutation p).
+
+    python benchmarks/bench_stats.py --rows 500 2000 --resamples 10000 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.analysis import COPIER, IMPROVER  # noqa: E402
+from analytics.derive import derive_columns, strategy  # noqa: E402
+from analytics.stats_engine import compare_groups  # noqa: E402
+from benchmarks.bench_derive import make_frame  # noqa: E402
+
+
+def run_dashboard_comparisons(frame, n_resamples, workers):
+    """Same comparisons as analytics.analysis.hypothesis_tests + strategy_analysis."""
+    tests = compare_groups(frame, 'ai_used', ['round_duration_seconds', 'text_len', 'complexity', 'seq_score'],
+                           n_resamples=n_resamples, workers=workers)
+    ai_only = frame[frame['ai_used']].copy()
+    ai_only['strategy'] = strategy(ai_only['ai_similarity'], ai_only['ai_similarity'].median())
+    tests.update({
+        f"strategy/{col}": result for col, result in compare_groups(
+            ai_only, 'strategy', ['complexity', 'round_duration_seconds', 'seq_score'], COPIER, IMPROVER,
+            n_resamples=n_resamples, workers=workers).items()
+    })
+    return tests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[500, 2000])
+    parser.add_argument('--resamples', type=int, default=10_000)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'comparisons':>12} {'seconds':>9}")
+    for n in args.rows:
+        frame = derive_columns(make_frame(n))
+        frame['seq_score'] = frame['round'] % 7 + 1
+        start = time.perf_counter()
+        tests = run_dashboard_comparisons(frame, args.resamples, args.workers)
+        elapsed = time.perf_counter() - start
+        print(f"{n:>8} {len(tests):>12} {elapsed:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
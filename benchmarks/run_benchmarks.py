@@ -0,0 +1,398 @@
+"""
+Benchmark suite: the game's and the dashboard's hot paths on synthetic logs, with
+regression thresholds checked before a study launch.
+
+    python benchmarks/run_benchmarks.py                        # 10k rows, checks benchmarks/thresholds.json
+    python benchmarks/run_benchmarks.py --rows 1000000 --participants 150000 --only load sessionize
+    python benchmarks/run_benchmarks.py --baseline benchmarks/results/<earlier>.json
+    python benchmarks/run_benchmarks.py --write-thresholds     # after an intended change
+
+Each case is set up untimed, then timed --repeat times (best and median kept).
+Results go to benchmarks/results/<timestamp>-<rows>.json. The exit status is 1
+when a case is slower than its threshold (thresholds are only checked at the
+row count they were written for) or than --tolerance x the --baseline median.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "streamlit_app"))  # The app's modules import each other by bare name
+
+from analytics.config import SIMILARITY_METRIC  # noqa: E402
+from analytics.dataset import open_dataset, publish  # noqa: E402
+from analytics.derive import derive_columns  # noqa: E402
+from analytics.ingest import read_game_log  # noqa: E402
+from analytics.loader import derive_durations  # noqa: E402
+from analytics.schema import apply_schema  # noqa: E402
+from analytics.sessions import ACTION_KEYS, sessionize  # noqa: E402
+from analytics.similarity import SimilarityCache, similarity_for_pairs  # noqa: E402
+from benchmarks.bench_stats import run_dashboard_comparisons  # noqa: E402
+from benchmarks.synthetic import make_game_log, write_fallback_csvs  # noqa: E402
+from streamlit_app.game_logic import SCENARIO_DATA, GameState  # noqa: E402
+
+THRESHOLDS_FILE = os.path.join(ROOT, "benchmarks", "thresholds.json")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+THRESHOLD_HEADROOM = 2.0  # --write-thresholds: allowed seconds = median x this...
+THRESHOLD_FLOOR = 0.05    # ...plus at least this much, so millisecond cases are not tripped by timer noise
+LOG_DATA_CALLS = 200
+CHART_CALLS = 100
+
+# =========================================================================
+# === FAKE SHEETS BACKEND =================================================
+# =========================================================================
+
+class FakeWorksheet:
+    """The gspread Worksheet calls data_manager makes, kept in memory (optional latency per call)."""
+
+    def __init__(self, latency=0.0, spreadsheet=None, title="Sheet1"):
+        self.rows = []
+        self.latency = latency
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.col_count = 26
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_all_values(self):
+        self._wait()
+        return self.rows
+
+    def row_values(self, row):
+        self._wait()
+        return self.rows[row - 1] if len(self.rows) >= row else []
+
+    def append_row(self, row):
+        self._wait()
+        self.rows.append(list(row))
+
+    def append_rows(self, rows):
+        self._wait()
+        self.rows.extend(list(row) for row in rows)
+
+
+class FakeSpreadsheet:
+    def __init__(self, latency=0.0):
+        self.title = "bench"
+        self.latency = latency
+        self.sheet1 = FakeWorksheet(latency, self)
+        self.worksheets = {}
+
+    def worksheet(self, title):
+        return self.worksheets.setdefault(title, FakeWorksheet(self.latency, self, title))
+
+# =========================================================================
+# === CASES ===============================================================
+# =========================================================================
+# Each case takes the shared context and returns (callable to time, calls per run).
+
+def case_next_state(ctx):
+    """GameState.determine_next_state over every scenario x action, one call per log row."""
+    game = GameState(mode='GAME')
+    pairs = [(sid, key) for sid in SCENARIO_DATA for key in ACTION_KEYS]
+    calls = ctx['rows']
+    sequence = (pairs * (calls // len(pairs) + 1))[:calls]
+
+    def run():
+        for sid, key in sequence:
+            game.determine_next_state(sid, key)
+    return run, calls
+
+
+def case_seed_history(ctx):
+    """GameState.seed_sensor_history for every scenario, one call per log row."""
+    game = GameState(mode='GAME')
+    ids = list(SCENARIO_DATA)
+    calls = ctx['rows']
+    sequence = (ids * (calls // len(ids) + 1))[:calls]
+
+    def run():
+        for sid in sequence:
+            game.seed_sensor_history(sid)
+    return run, calls
+
+
+def case_sensor_chart(ctx):
+    """ui_components.render_sensor_chart figure building (no rendering), all four sensors."""
+    from ui_components import render_sensor_chart
+    game = GameState(mode='GAME')
+    game.seed_sensor_history(6)
+    for _ in range(5):
+        game.current_scenario_id = 6
+        game.update_sensor_history()
+    sensors = list(game.sensor_history)
+
+    def run():
+        for i in range(CHART_CALLS):
+            sensor = sensors[i % len(sensors)]
+            render_sensor_chart(sensor, game.sensor_history[sensor])
+    return run, CHART_CALLS
+
+
+def _log_data_case(ctx, sheets, bulk=False):
+    import data_manager
+    frame = ctx['game_log'].head(LOG_DATA_CALLS)
+    records = [
+        {col: value for col, value in row.items() if col not in ('timestamp', 'idempotency_key')}
+        for row in frame.to_dict('records')
+    ]
+    workdir = tempfile.mkdtemp(dir=ctx['tmp'])
+    runs = iter(range(1_000_000))
+
+    def run():
+        # Fresh files per run: the fallback CSV and the journal start empty, like a new study
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        saved = data_manager.connect_to_gsheet, data_manager.JOURNAL_FILE, os.getcwd()
+        if data_manager._dedup_conn is not None:
+            data_manager._dedup_conn.close()
+        data_manager._dedup_conn = None  # Reopen the key index in this run's directory
+        data_manager._checked_headers.clear()  # New (empty) fake sheet: write its header again
+        backend = FakeSpreadsheet(ctx['sheets_latency']) if sheets else None
+        data_manager.connect_to_gsheet = lambda sheet_name=None: backend.sheet1 if backend else None
+        data_manager.JOURNAL_FILE = os.path.join(workdir, "log_journal.jsonl")
+        os.chdir(workdir)  # LOCAL_LOG_FILE and DEDUP_DB are relative to the working directory
+        # New idempotency keys per run (the key LRU is process-wide)
+        session_id = f"bench-{'bulk' if bulk else 'sheets' if sheets else 'fallback'}-{next(runs)}"
+        try:
+            if bulk:
+                data_manager.log_data_bulk([dict(record) for record in records], session_id=session_id)
+            else:
+                for record in records:
+                    data_manager.log_data(dict(record), session_id=session_id)
+        finally:
+            data_manager.connect_to_gsheet, data_manager.JOURNAL_FILE = saved[:2]
+            os.chdir(saved[2])
+    return run, len(records)
+
+
+def case_log_data_sheets(ctx):
+    """data_manager.log_data with a (fake) Sheets connection: sheet append + journal + local CSV."""
+    return _log_data_case(ctx, sheets=True)
+
+
+def case_log_data_fallback(ctx):
+    """data_manager.log_data without Sheets: journal + local fallback CSV only."""
+    return _log_data_case(ctx, sheets=False)
+
+
+def case_log_data_bulk(ctx):
+    """data_manager.log_data_bulk (v01 imports): the same records in one append_rows + one CSV write."""
+    return _log_data_case(ctx, sheets=True, bulk=True)
+
+
+def case_load(ctx):
+    """The dashboard's load path on the fallback CSV: chunked read + repair, durations, derived columns, schema."""
+    def run():
+        data = read_game_log(ctx['csv'])
+        apply_schema(derive_columns(derive_durations(data)))
+    return run, ctx['rows']
+
+
+def _similarity_pairs(ctx):
+    data = ctx['game_log']
+    used = data[data['ai_used']]
+    return list(dict.fromkeys(zip(used['assessment'].astype(str), used['ai_assessment_text'].astype(str))))
+
+
+def case_similarity_cold(ctx):
+    """analytics.similarity on every distinct (assessment, AI text) pair, no cache."""
+    pairs = _similarity_pairs(ctx)
+    return (lambda: similarity_for_pairs(pairs, SIMILARITY_METRIC, cache=None, workers=ctx['workers'])), len(pairs)
+
+
+def case_similarity_warm(ctx):
+    """The same pairs served from a filled SQLite similarity cache."""
+    pairs = _similarity_pairs(ctx)
+    cache = SimilarityCache(os.path.join(ctx['tmp'], "similarity.sqlite"))
+    similarity_for_pairs(pairs, SIMILARITY_METRIC, cache=cache, workers=ctx['workers'])
+    return (lambda: similarity_for_pairs(pairs, SIMILARITY_METRIC, cache=cache)), len(pairs)
+
+
+def case_stats(ctx):
+    """Every group comparison the dashboard runs (Welch + bootstrap CI + permutation p)."""
+    frame = ctx['derived']
+    return (lambda: run_dashboard_comparisons(frame, ctx['resamples'], ctx['workers'])), len(frame)
+
+
+def case_sessionize(ctx):
+    """analytics.sessions.sessionize: per-participant paths and optimal-path scores."""
+    frame = ctx['derived']
+    return (lambda: sessionize(frame)), len(frame)
+
+
+def case_dataset_open(ctx):
+    """What a dashboard session pays for the shared processed frame: open the memory-mapped Arrow file."""
+    path = publish(ctx['derived'], "bench", directory=os.path.join(ctx['tmp'], "datasets"))
+    return (lambda: open_dataset(path)), len(ctx['derived'])
+
+
+CASES = {
+    'game.determine_next_state': case_next_state,
+    'game.seed_sensor_history': case_seed_history,
+    'ui.render_sensor_chart': case_sensor_chart,
+    'log_data.sheets': case_log_data_sheets,
+    'log_data.fallback': case_log_data_fallback,
+    'log_data.bulk': case_log_data_bulk,
+    'load': case_load,
+    'dataset.open': case_dataset_open,
+    'similarity.cold': case_similarity_cold,
+    'similarity.warm': case_similarity_warm,
+    'stats': case_stats,
+    'sessionize': case_sessionize,
+}
+
+# =========================================================================
+# === RUNNER ==============================================================
+# =========================================================================
+
+def time_case(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'commit': commit,
+    }
+
+
+def load_json(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+
+def check(results, params, thresholds, baseline, tolerance):
+    """List of (case, median, limit, source) for every case over its limit."""
+    failures = []
+    if thresholds and thresholds.get('params', {}).get('rows') == params['rows']:
+        for name, limit in thresholds['max_seconds'].items():
+            if name in results and results[name]['median_s'] > limit:
+                failures.append((name, results[name]['median_s'], limit, 'threshold'))
+    elif thresholds:
+        print(f"Note: thresholds are for {thresholds.get('params', {}).get('rows')} rows, not checked at {params['rows']}.")
+    if baseline and baseline.get('params', {}).get('rows') == params['rows']:
+        for name, previous in baseline['cases'].items():
+            if name in results and results[name]['median_s'] > previous['median_s'] * tolerance:
+                failures.append((name, results[name]['median_s'], previous['median_s'] * tolerance, 'baseline'))
+    elif baseline:
+        print("Note: baseline was run at a different scale, not compared.")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--participants', type=int, default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='+', default=None, help="case names or prefixes (e.g. log_data)")
+    parser.add_argument('--resamples', type=int, default=2000, help="bootstrap / permutation resamples for 'stats'")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--sheets-latency', type=float, default=0.0, help="seconds per fake Sheets call")
+    parser.add_argument('--thresholds', default=THRESHOLDS_FILE)
+    parser.add_argument('--baseline', default=None, help="earlier results JSON to compare medians with")
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    parser.add_argument('--write-thresholds', action='store_true',
+                        help=f"store max(median x {THRESHOLD_HEADROOM}, median + {THRESHOLD_FLOOR}s) of this run as the new thresholds")
+    parser.add_argument('--out', default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    names = [n for n in CASES if not args.only or any(n == o or n.startswith(o + '.') for o in args.only)]
+    params = {
+        'rows': args.rows, 'participants': args.participants, 'repeat': args.repeat,
+        'resamples': args.resamples, 'workers': args.workers, 'sheets_latency': args.sheets_latency,
+        'similarity_metric': SIMILARITY_METRIC,
+    }
+
+    tmp = tempfile.mkdtemp(prefix="ferment-bench-")
+    try:
+        start = time.perf_counter()
+        csv_path, _ = write_fallback_csvs(tmp, args.rows, args.participants)
+        game_log = make_game_log(args.rows, args.participants)
+        ctx = dict(params, tmp=tmp, csv=csv_path, game_log=game_log)
+        if any(n in ('stats', 'sessionize', 'dataset.open') for n in names):
+            ctx['derived'] = apply_schema(derive_columns(derive_durations(read_game_log(csv_path))))
+        print(f"Synthetic log: {args.rows} rows, {game_log['prolific_id'].nunique()} participants "
+              f"({time.perf_counter() - start:.1f}s)\n")
+
+        results = {}
+        print(f"{'case':<28} {'calls':>9} {'best (s)':>10} {'median (s)':>11} {'per call (us)':>14}")
+        for name in names:
+            fn, calls = CASES[name](ctx)
+            times = time_case(fn, args.repeat)
+            median = statistics.median(times)
+            results[name] = {
+                'calls': calls,
+                'best_s': round(min(times), 6),
+                'median_s': round(median, 6),
+                'per_call_us': round(median / calls * 1e6, 3) if calls else None,
+            }
+            print(f"{name:<28} {calls:>9} {min(times):>10.4f} {median:>11.4f} {results[name]['per_call_us'] or 0:>14.2f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    thresholds = load_json(args.thresholds)
+    failures = check(results, params, thresholds, load_json(args.baseline), args.tolerance)
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'params': params,
+        'cases': results,
+        'regressions': [{'case': c, 'median_s': m, 'limit_s': round(l, 6), 'source': s} for c, m, l, s in failures],
+    }
+    os.makedirs(args.out, exist_ok=True)
+    out_path = os.path.join(args.out, f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{args.rows}.json")
+    with open(out_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults: {out_path}")
+
+    if args.write_thresholds:
+        limits = dict((thresholds or {}).get('max_seconds', {})) if (thresholds or {}).get('params', {}).get('rows') == args.rows else {}
+        limits.update({
+            name: round(max(r['median_s'] * THRESHOLD_HEADROOM, r['median_s'] + THRESHOLD_FLOOR), 4)
+            for name, r in results.items()
+        })
+        with open(args.thresholds, 'w') as f:
+            json.dump({'params': params, 'environment': report['environment'], 'max_seconds': limits}, f, indent=2)
+        print(f"Thresholds written: {args.thresholds}")
+        return
+
+    for case, median, limit, source in failures:
+        print(f"REGRESSION {case}: {median:.4f}s > {limit:.4f}s ({source})")
+    if failures:
+        sys.exit(1)
+    print("No regressions.")
+
+
+if __name__ == '__main__':
+    main()
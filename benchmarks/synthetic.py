@@ -0,0 +1,275 @@
+"""
+Synthetic study logs with the app's GAME_LOG_COLS / FEEDBACK_LOG_COLS, at any scale.
+
+    python benchmarks/synthetic.py --rows 1000000 --participants 150000 --out /tmp/bench
+
+Every participant plays the real state machine from STARTING_SCENARIO_ID: each
+logged round is either a fix that moves them one step closer to '1: All Good'
+or an action that leaves the scenario unchanged (wasted / ineffective), so
+sessionization and the path metrics see consistent paths. Completed sessions
+end with the app's 'Simulation Complete' row; the rest are abandoned mid-game.
+Row and participant counts are exact: a participant's session length is drawn
+first and the path is fitted to it.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.ingest import FEEDBACK_VERSIONS, GAME_LOG_VERSIONS  # noqa: E402
+from analytics.schema import GAME_LOG_COLS, FEEDBACK_LOG_COLS  # noqa: E402
+from analytics.sessions import ACTION_KEYS, NEXT_STATE, OPTIMAL_DISTANCE, SOLVED_ID  # noqa: E402
+from streamlit_app.game_logic import ACTIONS, AI_ASSESSMENTS, SCENARIO_DATA, STARTING_SCENARIO_ID  # noqa: E402
+
+ROWS_PER_PARTICIPANT = 6
+COMPLETION_RATE = 0.8        # Sessions long enough to finish that do finish
+AI_USER_SHARE = 0.5          # Participants who open the AI panel at all...
+AI_ROUND_SHARE = 0.7         # ...and in how many of their rounds
+LEGACY_DURATION_SHARE = 0.1  # Rows logged before round_duration_seconds existed (0)
+STUDY_DAYS = 14
+STUDY_START = pd.Timestamp("2026-02-01 09:00")
+
+PHRASES = [
+    "SG too high", "temperature looks high", "pH is dropping", "CO2 is very low",
+    "yeast seems unhealthy", "possible infection", "oxygen leak?", "all good",
+    "fermentation stuck", "sanitation problem", "fix the temp controller first",
+]
+
+# =========================================================================
+# === PATHS ===============================================================
+# =========================================================================
+
+def _action_tables():
+    """
+    Per scenario, the action indexes that move one step closer to SOLVED_ID and the
+    ones that leave the scenario unchanged (padded rows + counts, for vectorized picks).
+    """
+    size = len(NEXT_STATE)
+    progress = np.zeros((size, len(ACTION_KEYS)), dtype=int)
+    stay = np.zeros((size, len(ACTION_KEYS)), dtype=int)
+    n_progress = np.zeros(size, dtype=int)
+    n_stay = np.zeros(size, dtype=int)
+    for sid in SCENARIO_DATA:
+        for a in range(len(ACTION_KEYS)):
+            nxt = NEXT_STATE[sid, a]
+            if nxt == sid:
+                stay[sid, n_stay[sid]] = a
+                n_stay[sid] += 1
+            elif OPTIMAL_DISTANCE[nxt] == OPTIMAL_DISTANCE[sid] - 1:
+                progress[sid, n_progress[sid]] = a
+                n_progress[sid] += 1
+    return progress, n_progress, stay, n_stay
+
+
+PROGRESS_ACTIONS, N_PROGRESS, STAY_ACTIONS, N_STAY = _action_tables()
+
+
+def _phrase_pool():
+    """Every assessment of 1-3 phrases, in the order _assessments indexes them."""
+    pool = list(PHRASES)
+    pool += [f"{a}. {b}" for a in PHRASES for b in PHRASES]
+    pool += [f"{a}. {b}. {c}" for a in PHRASES for b in PHRASES for c in PHRASES]
+    return np.array(pool, dtype=object)
+
+
+PHRASE_POOL = _phrase_pool()
+
+
+def _assessments(n_rows, rng):
+    """Free-text assessments of 1-3 phrases (uniform length, uniform phrases)."""
+    k = len(PHRASES)
+    n_words = rng.integers(1, 4, n_rows)
+    idx = rng.integers(0, k, (n_rows, 3))
+    code = np.select(
+        [n_words == 1, n_words == 2],
+        [idx[:, 0], k + idx[:, 0] * k + idx[:, 1]],
+        k + k * k + (idx[:, 0] * k + idx[:, 1]) * k + idx[:, 2],
+    )
+    return PHRASE_POOL[code]
+
+
+def _paths(lengths, completes, rng, start=STARTING_SCENARIO_ID):
+    """
+    (scenario_ids, action indexes; -1 on completion rows) for every row, sessions back to back.
+    Completed sessions take exactly OPTIMAL_DISTANCE[start] progress steps, the last one
+    solving the game; abandoned ones progress at random but never take the solving step.
+    Vectorized over participants, one loop iteration per round.
+    """
+    n_rows = int(lengths.sum())
+    participant = np.repeat(np.arange(len(lengths)), lengths)
+    first_row = np.r_[0, np.cumsum(lengths)[:-1]]
+    step = np.arange(n_rows) - first_row[participant]
+    n_actions = lengths - completes
+    last_action = step == n_actions[participant] - 1
+    done = completes[participant]
+
+    # Completed: the last action plus (needed - 1) random earlier actions make progress
+    needed = OPTIMAL_DISTANCE[start]
+    key = np.where(done & (step < n_actions[participant] - 1), rng.random(n_rows), 2.0)
+    order = np.lexsort((key, participant))
+    rank = np.empty(n_rows, dtype=int)
+    rank[order] = np.arange(n_rows) - first_row[participant[order]]
+    progress = np.where(done, last_action | ((rank < needed - 1) & (key < 2.0)), rng.random(n_rows) < 0.3)
+
+    scenario_ids = np.full(n_rows, SOLVED_ID)
+    action_idx = np.full(n_rows, -1)
+    state = np.full(len(lengths), start)
+    for k in range(int(n_actions.max(initial=0))):
+        players = np.flatnonzero(n_actions > k)
+        rows = first_row[players] + k
+        sid = state[players]
+        move = progress[rows] & ((OPTIMAL_DISTANCE[sid] > 1) | completes[players])
+        pick = rng.random(len(players))
+        action = np.where(
+            move,
+            PROGRESS_ACTIONS[sid, (pick * N_PROGRESS[sid]).astype(int)],
+            STAY_ACTIONS[sid, (pick * N_STAY[sid]).astype(int)],
+        )
+        scenario_ids[rows] = sid
+        action_idx[rows] = action
+        state[players] = NEXT_STATE[sid, action]
+    return scenario_ids, action_idx
+
+# =========================================================================
+# === GENERATORS ==========================================================
+# =========================================================================
+
+def make_game_log(n_rows, n_participants=None, seed=0):
+    """A game log frame of exactly `n_rows` rows over `n_participants` participants (GAME_LOG_COLS)."""
+    rng = np.random.default_rng(seed)
+    n_participants = n_participants or max(1, n_rows // ROWS_PER_PARTICIPANT)
+    n_participants = min(n_participants, n_rows)
+    # Session lengths: at least one row each, the rest spread multinomially
+    lengths = 1 + rng.multinomial(n_rows - n_participants, np.full(n_participants, 1 / n_participants))
+    min_completed = OPTIMAL_DISTANCE[STARTING_SCENARIO_ID] + 1
+    completes = (lengths >= min_completed) & (rng.random(n_participants) < COMPLETION_RATE)
+
+    scenario_ids, action_idx = _paths(lengths, completes, rng)
+    completion = action_idx < 0
+
+    participant = np.repeat(np.arange(n_participants), lengths)
+    first_row = np.r_[0, np.cumsum(lengths)[:-1]]
+    rounds = np.arange(n_rows) - first_row[participant] + 1
+
+    ai_user = rng.random(n_participants) < AI_USER_SHARE
+    ai_used = ai_user[participant] & (rng.random(n_rows) < AI_ROUND_SHARE) & ~completion
+    text_changed = ai_used & (rng.random(n_rows) < 0.5)
+
+    ai_text = np.array([AI_ASSESSMENTS.get(s, "") for s in range(max(SCENARIO_DATA) + 1)], dtype=object)[scenario_ids]
+    assessment = _assessments(n_rows, rng)
+    pre_ai = np.where(ai_used, assessment, "")  # The participant's own text, before the AI reveal
+    # AI users either copy the AI text or extend it
+    copied = ai_used & ~text_changed
+    assessment[copied] = ai_text[copied]
+    extended = np.flatnonzero(text_changed)
+    assessment[extended] = [f"{ai_text[i]} {assessment[i]}" for i in extended]
+    assessment[completion] = "Simulation Complete"
+    final = assessment.copy()
+    final[completion] = "COMPLETED"
+
+    action_text = np.array([ACTIONS[key]['text'] for key in ACTION_KEYS] + ["None"], dtype=object)[action_idx]
+    names = np.array([SCENARIO_DATA.get(s, {'name': ""})['name'] for s in range(max(SCENARIO_DATA) + 1)], dtype=object)
+
+    durations = np.round(rng.exponential(40, n_rows) + 5, 2)
+    starts = STUDY_START + pd.to_timedelta(rng.random(n_participants) * STUDY_DAYS * 86400, unit='s')
+    elapsed = pd.Series(durations).groupby(participant).cumsum().to_numpy()
+    timestamps = (starts[participant] + pd.to_timedelta(elapsed, unit='s')).to_numpy()
+    durations[rng.random(n_rows) < LEGACY_DURATION_SHARE] = 0.0
+
+    frame = pd.DataFrame({
+        'timestamp': np.datetime_as_string(timestamps, unit='us'),  # datetime.isoformat(), as log_data writes
+        'prolific_id': np.char.zfill(participant.astype(str), 6),
+        'round': rounds,
+        'batch_num': np.minimum(rounds + 2, 8),  # 3 seeded readings, one more per round, capped at 8
+        'scenario_id': scenario_ids,
+        'scenario_name': names[scenario_ids],
+        'assessment': assessment,
+        'action': action_text,
+        'seq_score': np.where(completion, 0, rng.integers(1, 8, n_rows)),
+        'ai_used': ai_used,
+        'text_changed': text_changed,
+        'ai_assessment_text': ai_text,
+        'user_assessment_final': final,
+        'tutorial_duration_seconds': np.round(rng.exponential(90, n_participants) + 20, 2)[participant],
+        'round_duration_seconds': durations,
+    })
+    # data_manager.idempotency_key (one session per participant)
+    frame['idempotency_key'] = (
+        frame['prolific_id'] + '|' + frame['round'].astype(str) + '|' + frame['scenario_id'].astype(str)
+        + '|GAME|' + frame['prolific_id']
+    )
+    frame = frame.assign(**_text_metrics(frame['assessment'], pd.Series(pre_ai), pd.Series(ai_text), ai_used, text_changed))
+    return frame[GAME_LOG_COLS]
+
+
+def _text_metrics(final, pre_ai, ai_text, ai_used, extended):
+    """
+    streamlit_app.text_metrics columns, vectorized. The edit columns follow from how the
+    texts were built: copied rows replaced the own text by the AI text, extended rows
+    put the AI text in front of it.
+    """
+    n_words = final.str.split().str.len().to_numpy()
+    n_sentences = np.maximum(final.str.count(r'[.!?]+(?=\s|$)').to_numpy(), 1) * (n_words > 0)
+    letters = final.str.count(r'[^\W_]').to_numpy()
+    ai_words = ai_text.str.split().str.len().to_numpy()
+    pre_words = pre_ai.str.split().str.len().to_numpy()
+    copied = ai_used & ~extended
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ari = np.where(n_words > 0, 4.71 * letters / n_words + 0.5 * n_words / np.maximum(n_sentences, 1) - 21.43, 0.0)
+        inserted = np.where(copied | extended, ai_words / np.maximum(n_words, 1), 0.0)
+    return {
+        'pre_ai_assessment': pre_ai.to_numpy(),
+        'edit_distance': np.select([copied, extended], [np.maximum(pre_words, ai_words), ai_words], 0),
+        'ai_insertion_ratio': np.round(np.minimum(inserted, 1.0), 4),
+        'word_count': n_words,
+        'sentence_count': n_sentences,
+        'char_count': (final.str.len() - final.str.count(r'\s')).to_numpy(),
+        'ari': np.round(ari, 2),
+    }
+
+
+def make_feedback(game_log, seed=0):
+    """One feedback row per participant who finished (FEEDBACK_LOG_COLS)."""
+    rng = np.random.default_rng(seed)
+    done = game_log[game_log['user_assessment_final'] == "COMPLETED"]
+    total = game_log.groupby('prolific_id')['round_duration_seconds'].sum()
+    feedback = pd.DataFrame({
+        'timestamp': done['timestamp'].to_numpy(),
+        'prolific_id': done['prolific_id'].to_numpy(),
+        'total_time_seconds': np.round(total.reindex(done['prolific_id']).to_numpy() + rng.exponential(30, len(done)), 2),
+        'tutorial_duration_seconds': done['tutorial_duration_seconds'].to_numpy(),
+        'feedback_text': rng.choice(["", "Fun game", "The AI hints helped", "Too many rounds"], len(done)),
+    })
+    feedback['idempotency_key'] = feedback['prolific_id'] + '|||END|' + feedback['prolific_id']
+    return feedback[FEEDBACK_LOG_COLS]
+
+
+def write_fallback_csvs(out_dir, n_rows, n_participants=None, seed=0):
+    """Write both frames in the fallback CSV layout data_manager appends (timestamp last). Returns the paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    game_log = make_game_log(n_rows, n_participants, seed)
+    game_path = os.path.join(out_dir, "game_logs_fallback.csv")
+    feedback_path = os.path.join(out_dir, "feedback_logs_fallback.csv")
+    game_log[GAME_LOG_VERSIONS['v5']].to_csv(game_path, index=False)
+    make_feedback(game_log, seed)[FEEDBACK_VERSIONS['v3']].to_csv(feedback_path, index=False)
+    return game_path, feedback_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--participants', type=int, default=None,
+                        help=f"default: rows / {ROWS_PER_PARTICIPANT}")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=".")
+    args = parser.parse_args()
+    for path in write_fallback_csvs(args.out, args.rows, args.participants, args.seed):
+        print(path)
+
+
+if __name__ == '__main__':
+    main()
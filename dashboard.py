@@ -1,11 +1,31 @@
+from streamlit_app import startup_profile  # First: times the imports below when FERMENT_PROFILE_STARTUP=1
 import streamlit as st
 import pandas as pd
 import altair as alt
-import scipy.stats as stats
-import gspread
-from google.oauth2.service_account import Credentials
 import os
-import difflib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from analytics.loader import (
+    repair_game_log, derive_durations, repair_feedback, sync_worksheet, read_cache,
+    drop_duplicate_records, GAME_DEDUP_COLS, FEEDBACK_DEDUP_COLS,
+)
+from analytics.ingest import (
+    read_game_log, read_feedback, read_game_log_columns, read_game_log_tail, read_feedback_tail, describe_counts,
+)
+from analytics.filters import LogFilter, NO_FILTER
+from analytics.schema import apply_schema, memory_report
+from analytics.derive import derive_columns
+from analytics.analysis import data_version, run_analysis, cluster_analysis
+from analytics.charts import boxplot, errorbar, trend_line
+from analytics.config import COPIER_MAX_COMPLEXITY, IMPROVER_MIN_COMPLEXITY
+from analytics.feature_store import FeatureStore, attach_features
+from analytics.incremental import CacheSource, CsvSource, MergedLog
+from analytics.similarity import SimilarityCache
+from analytics.snapshot import GAME_TABLE, FEEDBACK_TABLE, export_snapshot, list_snapshots, read_manifest, read_snapshot
+from analytics.schema import concat_frames
+from analytics.dataset import KEEP_DATASETS, share
+from streamlit_app.sharding import SHEET_NAME, SHEET_SHARDS, shard_for
 
 st.set_page_config(page_title="Fermentation Game Analytics", layout="wide")
 
@@ -21,38 +41,24 @@ st.info("""
 DATA_FILE = "game_logs_fallback.csv"
 FEEDBACK_FILE = "feedback_logs_fallback.csv"
 
-# Log Columns (Current Schema)
-GAME_LOG_COLS = [
-    'timestamp', 'prolific_id', 'round', 'batch_num', 
-    'scenario_id', 'scenario_name', 
-    'assessment', 'action', 'seq_score',
-    'ai_used', 'text_changed', 
-    'ai_assessment_text', 'user_assessment_final',
-    'tutorial_duration_seconds',
-    'round_duration_seconds'
-]
-
-FEEDBACK_LOG_COLS = [
-    'timestamp', 'prolific_id', 'total_time_seconds', 
-    'tutorial_duration_seconds', 'feedback_text'
-]
-
 # Constants
 SCOPE = [
     "https://www.googleapis.com/auth/spreadsheets",
     "https://www.googleapis.com/auth/drive"
 ]
-SHEET_NAME = "Beacon_v02"
 
-def connect_to_gsheet():
-    """Connect to Google Sheets using st.secrets (Cloud) or credentials.json (Local)."""
+def connect_to_gsheet(sheet_name=SHEET_NAME):
+    """Connect to spreadsheet `sheet_name` using st.secrets (Cloud) or credentials.json (Local)."""
+    import gspread  # Deferred: only needed when a sync actually runs
+    from google.oauth2.service_account import Credentials
+
     try:
         if "gcp_service_account" in st.secrets:
             # Create credentials from the secrets dict
             creds_dict = dict(st.secrets["gcp_service_account"])
             creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPE)
             client = gspread.authorize(creds)
-            return client.open(SHEET_NAME)
+            return client.open(sheet_name)
     except Exception as e:
         pass
 
@@ -61,204 +67,412 @@ def connect_to_gsheet():
         try:
             creds = Credentials.from_service_account_file("credentials.json", scopes=SCOPE)
             client = gspread.authorize(creds)
-            return client.open(SHEET_NAME)
+            return client.open(sheet_name)
         except Exception:
             pass
     return None
 
+@st.cache_resource
+def get_similarity_cache():
+    """Persistent (assessment, AI text) -> similarity cache shared by all sessions."""
+    return SimilarityCache()
+
+def sync_shard(shard):
+    """
+    Sync one shard's game log and feedback worksheets into their own cache names.
+    Runs on a worker thread: no st.* calls, errors are returned for the script thread to show.
+    Returns (game log rows, feedback rows, error): rows cached so far.
+    """
+    sh = connect_to_gsheet(shard.spreadsheet)
+    if not sh:
+        return 0, 0, None
+    # Game Logs (sheet1, or the shard's worksheet)
+    try:
+        game_ws = sh.sheet1 if shard.worksheet is None else sh.worksheet(shard.worksheet)
+        rows = sync_worksheet(game_ws, shard.cache_name("sheet1"), repair_game_log)
+    except Exception as e:
+        return 0, 0, e
+
+    # Feedback Logs (Worksheet 'Feedback', or the shard's)
+    feedback_rows = 0
+    try:
+        feedback_rows = sync_worksheet(sh.worksheet(shard.feedback_worksheet), shard.cache_name("feedback"), repair_feedback)
+    except Exception:
+        # Feedback sheet may just not exist yet
+        pass
+    return rows, feedback_rows, None
+
+def local_version():
+    """(path, mtime, size) of the fallback CSVs: changes whenever the app appends to them."""
+    version = []
+    for path in (DATA_FILE, FEEDBACK_FILE):
+        try:
+            stat = os.stat(path)
+            version.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            version.append((path, None, None))
+    return tuple(version)
+
 @st.cache_data(ttl=60) # Cache for 60 seconds to allow near-real-time updates
-def load_data():
-    data = None
-    feedback = None
-    
-    # --- TRY GOOGLE SHEETS FIRST ---
+def sync_sheets():
+    """
+    Pull rows appended to the Sheets since the last sync into the local Parquet cache,
+    every shard (see streamlit_app/sharding.py) at once on a thread pool.
+    Returns (use_sheets, sync_version): use_sheets is True if the game logs are read from
+    that cache, False for the CSV fallback; sync_version changes whenever either source has
+    new rows. The loaders below are keyed on it, so this TTL is the only refresh interval.
+    """
+    # --- TRY GOOGLE SHEETS FIRST (INCREMENTAL: ONLY ROWS ADDED SINCE LAST SYNC) ---
+    rows = 0
+    synced = ()
     try:
-        sh = connect_to_gsheet()
-        if sh:
-            # Load Game Logs (Sheet1)
+        with ThreadPoolExecutor(max_workers=len(SHEET_SHARDS)) as pool:
+            results = list(pool.map(sync_shard, SHEET_SHARDS))
+        for shard, (shard_rows, feedback_rows, error) in zip(SHEET_SHARDS, results):
+            rows += shard_rows
+            if error is not None:
+                st.warning(f"Could not load Game Logs from GSheet ({shard.label}): {error}")
+        synced = tuple(result[:2] for result in results)
+    except Exception as e:
+         st.error(f"GSheet Connection failed: {e}")
+    return rows > 0, (synced, local_version())
+
+def read_shards(table, filt=NO_FILTER, columns=None):
+    """Fan-in of the synced shards' caches of `table` (only shards holding the filtered participants)."""
+    shards = SHEET_SHARDS
+    if filt.participants is not None:
+        wanted = {shard_for(pid) for pid in filt.participants}
+        shards = [shard for shard in SHEET_SHARDS if shard in wanted]
+    filters = filt.parquet_filters() if table == "sheet1" else None
+    return concat_frames([read_cache(shard.cache_name(table), filters=filters, columns=columns) for shard in shards])
+
+# --- DATA SOURCE: live (Sheets sync, else local CSV) or a frozen snapshot ---
+def data_source():
+    """Snapshot directory picked in the sidebar (None: live data)."""
+    st.sidebar.header("Data Source")
+    snapshots = list_snapshots()
+    labels = ["Live (Google Sheets, else local CSV)"] + [f"Snapshot {os.path.basename(s)}" for s in snapshots]
+    choice = st.sidebar.selectbox("Read from", range(len(labels)), format_func=labels.__getitem__)
+    if st.sidebar.button("Export Sheets snapshot", help="All worksheets in one request, saved locally (analytics.snapshot)"):
+        titles = list(dict.fromkeys(shard.spreadsheet for shard in SHEET_SHARDS))
+        spreadsheets = [connect_to_gsheet(title) for title in titles]
+        if None in spreadsheets:
+            st.sidebar.error("No Google Sheets connection.")
+        else:
             try:
-                ws = sh.sheet1
-                records = ws.get_all_records()
-                if records:
-                    data = pd.DataFrame(records)
+                st.sidebar.success(f"Snapshot written: {export_snapshot(spreadsheets)}")
             except Exception as e:
-                st.warning(f"Could not load Game Logs from GSheet: {e}")
+                st.sidebar.error(f"Snapshot export failed: {e}")
+    return snapshots[choice - 1] if choice else None
 
-            # Load Feedback Logs (Worksheet 'Feedback')
-            try:
-                ws_feedback = sh.worksheet("Feedback")
-                records_fb = ws_feedback.get_all_records()
-                if records_fb:
-                    feedback = pd.DataFrame(records_fb)
-            except Exception as e:
-                # Limit warning if feedback sheet just doesn't exist yet
-                pass
-    except Exception as e:
-         st.error(f"GSheet Connection failed: {e}")
+@st.cache_data(max_entries=KEEP_DATASETS)
+def load_filter_options(use_sheets, sync_version, snapshot=None):
+    """
+    Participants, scenarios and date bounds for the sidebar (reads only those columns).
+    Cached per sync_version (see sync_sheets), not for a TTL of its own.
+    """
+    cols = ['timestamp', 'prolific_id', 'scenario_id', 'scenario_name']
+    if snapshot:
+        keys = read_snapshot(snapshot, GAME_TABLE, columns=cols)
+        if keys is None:
+            return None
+    elif use_sheets:
+        keys = read_shards("sheet1", columns=cols)
+    elif os.path.exists(DATA_FILE):
+        keys = read_game_log_columns(DATA_FILE, cols)
+        keys['timestamp'] = pd.to_datetime(keys['timestamp'], errors='coerce')
+        keys['scenario_id'] = pd.to_numeric(keys['scenario_id'], errors='coerce')
+        keys['prolific_id'] = keys['prolific_id'].fillna("").astype(str)
+    else:
+        return None
+    scenarios = keys.dropna(subset=['scenario_id']).drop_duplicates('scenario_id').sort_values('scenario_id')
+    return {
+        'participants': sorted(keys['prolific_id'].unique()),
+        'scenarios': dict(zip(scenarios['scenario_id'].astype(int), scenarios['scenario_name'])),
+        'first': keys['timestamp'].min(),
+        'last': keys['timestamp'].max(),
+    }
+
+@st.cache_resource(max_entries=KEEP_DATASETS)
+def load_data(filt, use_sheets, sync_version, snapshot=None):
+    """
+    Only the rows selected by `filt` (a LogFilter) are read and derived.
+    One result per process, shared by every session: the frames are read-only (see analytics.dataset).
+    Cached per sync_version (see sync_sheets): new rows show up on the first rerun after the sync.
+    """
+    data = None
+    feedback = None
+    layouts = Counter()  # CSV rows per detected schema version (see analytics.ingest)
+    source = snapshot or "sheets"
+
+    if snapshot:
+        # Frozen export: memory-mapped Arrow files, same predicates, no API calls
+        data = read_snapshot(snapshot, GAME_TABLE, filters=filt.parquet_filters())
+        feedback = filt.apply_feedback(read_snapshot(snapshot, FEEDBACK_TABLE))
+    elif use_sheets:
+        # Predicates pushed into the Parquet scans of the synced shards
+        data = read_shards("sheet1", filt)
+        feedback = filt.apply_feedback(read_shards("feedback", filt))
 
     # --- FALLBACK TO LOCAL CSV IF GSHEET FAILED OR EMPTY ---
-    if data is None or data.empty:
+    if (data is None or data.empty) and not snapshot:
         if os.path.exists(DATA_FILE):
             try:
-                data = pd.read_csv(DATA_FILE, on_bad_lines='warn')
-            except Exception:
-                pass
+                # Every schema version mapped onto GAME_LOG_COLS, filtered chunk by chunk while reading
+                data = read_game_log(DATA_FILE, filt, counts=layouts)
+                source = "csv"
+            except Exception as e:
+                st.error(f"Error processing game data: {e}")
 
-    if feedback is None or feedback.empty:
-        if os.path.exists(FEEDBACK_FILE):
-             try:
-                 feedback = pd.read_csv(FEEDBACK_FILE, on_bad_lines='warn')
-             except Exception:
-                 pass
-    
-    # --- PROCESSING & REPAIR (APPLY TO WHATEVER SOURCE WE GOT) ---
+    # --- DUPLICATE RECORDS (one row per idempotency key, before any derivation) ---
+    data, duplicate_rounds = drop_duplicate_records(data, GAME_DEDUP_COLS)
+
+    # --- DERIVED FEATURES (computed once per row, persisted in the feature store) ---
     if data is not None and not data.empty:
         try:
-            # STANDARD COLUMN REPAIR
-            # Ensure all expected columns exist, filling missing ones with defaults
-            for col in GAME_LOG_COLS:
-                if col not in data.columns:
-                    if col in ['round_duration_seconds', 'tutorial_duration_seconds']:
-                        data[col] = 0.0
-                    elif col == 'ai_used':
-                        data[col] = False
-                    else:
-                        data[col] = ""
-
-            # Ensure boolean columns are proper booleans (handle string 'True'/'False')
-            if 'ai_used' in data.columns:
-                # Convert to string first to handle mixed types, then map
-                data['ai_used'] = data['ai_used'].astype(str).map({'True': True, 'False': False, 'true': True, 'false': False}).fillna(False)
-            
-            # Numeric conversion
-            if 'round_duration_seconds' in data.columns:
-                 data['round_duration_seconds'] = pd.to_numeric(data['round_duration_seconds'], errors='coerce').fillna(0)
-
-            # --- BACKFILL DURATION FOR HISTORICAL DATA ---
-            if 'timestamp' in data.columns:
-                data['timestamp'] = pd.to_datetime(data['timestamp'], errors='coerce')
-                data = data.sort_values(['prolific_id', 'timestamp'])
-                
-                # Calculate time difference between consecutive rows for same user
-                data['time_diff'] = data.groupby('prolific_id')['timestamp'].diff().dt.total_seconds().fillna(0)
-                
-                # Create effective plotting column
-                def get_valid_duration(row):
-                    if row['round_duration_seconds'] > 0.1:
-                        return row['round_duration_seconds']
-                    if 0 < row['time_diff'] < 3600: # heuristic: < 1 hour
-                        return row['time_diff']
-                    return 0.0
-                
-                data['round_duration_seconds'] = data.apply(get_valid_duration, axis=1)
-
+            # A filtered slice only reads its own rows from the store and does not write back
+            features = FeatureStore().update(data, similarity_cache=get_similarity_cache(), persist=not filt.active)
+            data = attach_features(data, features).sort_values(['prolific_id', 'timestamp'])
         except Exception as e:
-            st.error(f"Error processing game data: {e}")
+            # Feature store unavailable: derive in memory for this load
+            st.warning(f"Feature store unavailable, deriving in memory: {e}")
+            data = derive_columns(derive_durations(data), similarity_cache=get_similarity_cache())
+        data = apply_schema(data)  # Compact dtypes for the derived columns too (see analytics.schema)
+
+    if (feedback is None or feedback.empty) and not snapshot:
+        if os.path.exists(FEEDBACK_FILE):
+             try:
+                 feedback = filt.apply_feedback(read_feedback(FEEDBACK_FILE))
+             except Exception as e:
+                 st.error(f"Error processing feedback data: {e}")
+    feedback, duplicate_feedback = drop_duplicate_records(feedback, FEEDBACK_DEDUP_COLS)
+
+    version = data_version(data, feedback)
+    data = share_or_keep(data, version, filt, source)
+
+    duplicates = {'rounds': duplicate_rounds, 'feedback': duplicate_feedback}
+    return data, feedback, version, dict(layouts), duplicates
 
-    if feedback is not None and not feedback.empty:
+def share_or_keep(data, version, filt, source):
+    """The shared memory-mapped copy of `data` (analytics.dataset), or `data` itself if that fails."""
+    try:
+        # Memory-mapped Arrow copy: every session reads the same buffers
+        return share(data, version, filt, source)
+    except OSError as e:
+        st.warning(f"Shared dataset cache unavailable, keeping this load in memory: {e}")
+        return data
+
+@st.cache_resource
+def get_merged_log(source):
+    """Live log of 'sheets' (the synced shards) or 'csv', kept between refreshes (see analytics.incremental)."""
+    if source == "sheets":
+        games = CacheSource(shard.cache_name("sheet1") for shard in SHEET_SHARDS)
+        feedback = CacheSource(shard.cache_name("feedback") for shard in SHEET_SHARDS)
+    else:
+        games = CsvSource(DATA_FILE, read_game_log_tail)
+        feedback = CsvSource(FEEDBACK_FILE, read_feedback_tail)
+    return MergedLog(
+        games, feedback, similarity_cache=get_similarity_cache(),
+        share=lambda data: share_or_keep(data, data_version(data), NO_FILTER, source),
+    )
+
+@st.cache_resource(max_entries=1)
+def load_live(use_sheets, sync_version):
+    """
+    load_data for the unfiltered live view: only the rows synced since the last refresh are
+    read, deduplicated and derived, and merged into the frame kept by get_merged_log.
+    One entry: older versions are not kept alive (the live frame is not always memory-mapped).
+    """
+    source = "sheets" if use_sheets else "csv"
+    data, feedback = None, None
+    try:
+        merged = get_merged_log(source)
+        data, feedback = merged.refresh()
+        if (data is None or data.empty) and use_sheets:
+            # --- FALLBACK TO LOCAL CSV IF GSHEET EMPTY ---
+            source = "csv"
+            merged = get_merged_log(source)
+            data, feedback = merged.refresh()
+    except Exception as e:
+        st.error(f"Error processing game data: {e}")
+        return None, None, data_version(None), {}, {'rounds': 0, 'feedback': 0}
+    if merged.store_error:
+        st.warning(f"Feature store unavailable, deriving in memory: {merged.store_error}")
+
+    duplicates = dict(merged.duplicates)
+    if (feedback is None or feedback.empty) and source == "sheets" and os.path.exists(FEEDBACK_FILE):
         try:
-             # Repair Feedback Columns
-             for col in FEEDBACK_LOG_COLS:
-                 if col not in feedback.columns:
-                     feedback[col] = 0 if 'seconds' in col else ""
+            feedback, duplicates['feedback'] = drop_duplicate_records(read_feedback(FEEDBACK_FILE), FEEDBACK_DEDUP_COLS)
         except Exception as e:
             st.error(f"Error processing feedback data: {e}")
-            
-    return data, feedback
+    return data, feedback, data_version(data, feedback), dict(merged.layouts), duplicates
 
-df, df_feedback = load_data()
+@st.cache_resource(max_entries=4)
+def get_analysis(version, filt, _data, _feedback):
+    """
+    All statistics & aggregations, computed once per data version and filter.
+    Reruns without new data (widgets, expanders) only read these results.
+    """
+    return run_analysis(_data, _feedback)
+
+@st.cache_resource(max_entries=16)
+def get_clusters(version, filt, copier_max, improver_min, _user_agg):
+    """Cluster section at the sidebar thresholds; only this part is recomputed when they change."""
+    return cluster_analysis(_user_agg, copier_max, improver_min)
+
+# --- SIDEBAR FILTERS (pushed down into the data source) ---
+def sidebar_filter(options):
+    st.sidebar.header("Filters")
+    if options is None:
+        return NO_FILTER
+    start = end = None
+    if pd.notna(options['first']) and pd.notna(options['last']):
+        first, last = options['first'].date(), options['last'].date()
+        picked = st.sidebar.date_input("Date range", value=(first, last), min_value=first, max_value=last)
+        if isinstance(picked, (tuple, list)) and len(picked) == 2 and tuple(picked) != (first, last):
+            start, end = pd.Timestamp(picked[0]), pd.Timestamp(picked[1]) + pd.Timedelta(days=1)
+
+    participants = set(st.sidebar.multiselect("Participants", options['participants']))
+    cohort = st.sidebar.text_area("Cohort (Prolific IDs, comma or newline separated)")
+    participants |= {p.strip() for p in cohort.replace(",", "\n").splitlines() if p.strip()}
+
+    scenario_names = options['scenarios']
+    scenarios = st.sidebar.multiselect(
+        "Scenarios", list(scenario_names), format_func=lambda s: f"{s}: {scenario_names[s]}"
+    )
+    return LogFilter(start, end, participants or None, scenarios or None)
+
+def sidebar_thresholds():
+    """Avg complexity thresholds of the Copier / Improver clusters."""
+    st.sidebar.header("Cluster Thresholds")
+    copier_max = st.sidebar.number_input("Copier: avg complexity below", min_value=0.0, value=float(COPIER_MAX_COMPLEXITY), step=5.0)
+    improver_min = st.sidebar.number_input("Improver: avg complexity above", min_value=0.0, value=float(IMPROVER_MIN_COMPLEXITY), step=5.0)
+    if improver_min < copier_max:
+        st.sidebar.warning("The Improver threshold is below the Copier threshold; Copier takes precedence.")
+    return copier_max, improver_min
+
+snapshot = data_source()
+use_sheets, sync_version = sync_sheets() if snapshot is None else (False, None)
+log_filter = sidebar_filter(load_filter_options(use_sheets, sync_version, snapshot))
+copier_max, improver_min = sidebar_thresholds()
+if snapshot is None and not log_filter.active:
+    df, df_feedback, version, csv_layouts, duplicates = load_live(use_sheets, sync_version)
+else:
+    df, df_feedback, version, csv_layouts, duplicates = load_data(log_filter, use_sheets, sync_version, snapshot)
 
 if df is None or df.empty:
-    st.warning(f"No game data found in {DATA_FILE}.")
+    if log_filter.active:
+        st.warning("No game data matches the selected filters.")
+    elif snapshot:
+        st.warning(f"No game data in snapshot {snapshot}.")
+    else:
+        st.warning(f"No game data found in {DATA_FILE}.")
+    startup_profile.mark_rendered('dashboard')
     st.stop()
 
 # --- PREPROCESSING ---
+# Derived columns (user_group, color_key, text_len, complexity, ai_similarity, effective
+# round_duration_seconds) come precomputed from the feature store, see load_data()
+
 # Filter out rows that might be test/tutorial if needed, or focused on actual rounds
 # round_prob = df[df['scenario_id'] != 1] # Exclude final success state for some analysis
 
-# --- OVERVIEW ---
-st.header("1. Overview")
-col1, col2, col3 = st.columns(3)
-col1.metric("Total Log Entries", len(df))
-col1.metric("Unique Players", df['prolific_id'].nunique())
+analysis = get_analysis(version, log_filter, df, df_feedback)
+charts = analysis['charts']  # Pre-aggregated, size-bounded chart data (see analytics.chart_data)
+clusters = get_clusters(version, log_filter, copier_max, improver_min, analysis['user_agg'])
 
-if df_feedback is not None and not df_feedback.empty:
-    avg_total_time = df_feedback['total_time_seconds'].mean()
-    col2.metric("Avg Total Duration (s)", f"{avg_total_time:.2f}")
+RAW_PAGE_SIZES = [50, 100, 500, 1000]
 
-# Calculate Avg Time per Round per Participant (from Game Logs)
-user_avg_round_time = df.groupby('prolific_id')['round_duration_seconds'].mean()
-avg_of_avgs = user_avg_round_time.mean()
-# col3.metric("Global Avg Time/Round", f"{avg_of_avgs:.2f}")
+def show_paginated(frame, key):
+    """Show one page of a (possibly large) frame instead of sending every row to the browser."""
+    col_size, col_page = st.columns(2)
+    page_size = col_size.selectbox("Rows per page", RAW_PAGE_SIZES, index=1, key=f"{key}_size")
+    n_pages = max(1, -(-len(frame) // page_size))
+    page = col_page.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1, step=1, key=f"{key}_page")
+    start = (page - 1) * page_size
+    st.caption(f"Rows {start + 1 if len(frame) else 0}-{min(start + page_size, len(frame))} of {len(frame)}")
+    st.dataframe(frame.iloc[start:start + page_size])
 
+# --- OVERVIEW ---
+st.header("1. Overview")
+overview = analysis['overview']
+col1, col2, col3 = st.columns(3)
+col1.metric("Total Log Entries", overview['n_rows'])
+col1.metric("Unique Players", overview['n_players'])
+
+if overview['avg_total_time'] is not None:
+    col2.metric("Avg Total Duration (s)", f"{overview['avg_total_time']:.2f}")
+
+if snapshot:
+    manifest = read_manifest(snapshot)
+    st.caption(f"Reading snapshot `{snapshot}` of '{manifest['spreadsheet'] or 'Google Sheets'}', exported {manifest['created']} (no Sheets requests).")
+if csv_layouts:
+    st.caption(f"Local CSV rows by schema version: {describe_counts(csv_layouts)}")
+    if csv_layouts.get('unmapped'):
+        st.warning(f"⚠️ {csv_layouts['unmapped']} CSV rows match no known log layout; they were mapped onto the header by position.")
+if duplicates['rounds'] or duplicates['feedback']:
+    st.caption(
+        f"Dropped {duplicates['rounds']} duplicate round rows and {duplicates['feedback']} duplicate feedback rows "
+        "(same idempotency key, or same participant, round, scenario, action and text for rows logged before keys)."
+    )
+
+# Avg Time per Round per Participant (from Game Logs)
 st.subheader("Distribution of Average Time per Round (per Participant)")
-st.bar_chart(user_avg_round_time)
-
+participant_bars = charts['participant_bars']
+if participant_bars['kind'] == 'histogram':
+    st.caption("Many participants: showing the number of participants per average-time bin.")
+st.bar_chart(participant_bars['data'])
 
-# ... (Imports and Config remain same)
 
 # --- HELPER: STATS ---
-def calculate_ttest(data, group_col, value_col, group1_val=True, group2_val=False):
+def format_ttest(result):
     """
-    Calculates T-Test for two independent groups.
-    Returns formatted string with T-stat, p-value, and significance.
+    Formats a group comparison (see analytics.stats_engine.compare_groups).
+    Returns formatted string with T-stat, p-value, significance, bootstrap CI and permutation p.
     """
-    g1 = data[data[group_col] == group1_val][value_col].dropna()
-    g2 = data[data[group_col] == group2_val][value_col].dropna()
-    
-    if len(g1) < 2 or len(g2) < 2:
+    if result is None:
         return "Insufficient data for T-Test"
     
-    t_stat, p_val = stats.ttest_ind(g1, g2, equal_var=False)
-    sig = "Significant (**p < 0.05**)" if p_val < 0.05 else "Not Significant"
-    
-    g1_mean = g1.mean()
-    g2_mean = g2.mean()
-    
-    return f"**T-Test**: {group1_val} (Mean={g1_mean:.2f}) vs {group2_val} (Mean={g2_mean:.2f}) -> t={t_stat:.2f}, p={p_val:.4f} ({sig})"
+    sig = "Significant (**p < 0.05**)" if result['p'] < 0.05 else "Not Significant"
+    return (
+        f"**T-Test**: {result['group1']} (Mean={result['mean1']:.2f}) vs {result['group2']} (Mean={result['mean2']:.2f}) "
+        f"-> t={result['t']:.2f}, p={result['p']:.4f} ({sig})  \n"
+        f"Diff={result['diff']:.2f}, 95% Bootstrap CI [{result['ci_low']:.2f}, {result['ci_high']:.2f}], "
+        f"Permutation p={result['perm_p']:.4f} ({result['n_resamples']} resamples)"
+    )
 
-# ... (Load Data remains same)
+tests = analysis['tests']
 
 # --- HYPOTHESIS 1: COORDINATION COST (TIME) ---
 st.header("H1: Coordination Cost (Time)")
 st.markdown("**Hypothesis:** Higher AI usage increases task duration.")
 
 # 1. Round Duration Analysis (Granular)
-if 'round_duration_seconds' in df.columns and df['round_duration_seconds'].sum() > 0:
+durations = analysis['durations']
+if durations['has_durations']:
     st.subheader("Round Duration vs AI Usage")
     
     # 1. Average Time per Round (Metric)
-    avg_round_time = df['round_duration_seconds'].mean()
-    st.metric("Global Avg Time per Round", f"{avg_round_time:.2f} s")
+    st.metric("Global Avg Time per Round", f"{durations['avg_round_time']:.2f} s")
     
     st.caption("Note: '0' duration bars indicate missing timestamp data in older logs.")
 
     # DIAGNOSTICS: Check for missing durations
-    missing_duration_count = df[df['round_duration_seconds'] == 0].shape[0]
+    missing_duration_count = durations['missing_count']
     if missing_duration_count > 0:
         st.warning(f"⚠️ Data Quality Warning: {missing_duration_count} rounds have 0.0s duration. This means the logs are missing timestamps (common in older data versions).")
         st.markdown("These rounds exist in the database but **appear as invisible (height 0)** in the Time Breakdown graph below.")
         with st.expander("Show Affected Rounds (Missing Duration)"):
-            st.dataframe(df[df['round_duration_seconds'] == 0][['prolific_id', 'round', 'scenario_name']])
+            show_paginated(durations['missing_rows'], "missing_rows")
 
     # 2. Stacked Bar Chart with Gradient Colors
     st.subheader("Participant Time Breakdown (Red=No AI, Blue=AI)")
     
-    # Classify users
-    ai_users = df[df['ai_used'] == True]['prolific_id'].unique()
-    df['user_group'] = df['prolific_id'].apply(lambda x: 'AI User' if x in ai_users else 'Control (No AI)')
-    
-    # Create Color Key for Gradients
+    # Color Key for Gradients ('color_key', derived column)
     # Red Gradient (No AI): Light -> Dark (Rounds 1-7)
     # Blue Gradient (AI): Light -> Dark (Rounds 1-7)
     # We clamp rounds > 7 to use the 7th color
     
-    def get_color_key(row):
-        r = min(int(row['round']), 7)
-        return f"{'AI' if row['ai_used'] else 'NoAI'}_R{r}"
-
-    df['color_key'] = df.apply(get_color_key, axis=1)
-    
     # Define Domain (Categories)
     domain = [
         'NoAI_R1', 'NoAI_R2', 'NoAI_R3', 'NoAI_R4', 'NoAI_R5', 'NoAI_R6', 'NoAI_R7',
@@ -275,12 +489,17 @@ if 'round_duration_seconds' in df.columns and df['round_duration_seconds'].sum()
     
     color_scale = alt.Scale(domain=domain, range=range_colors)
     
-    chart_stack_split = alt.Chart(df).mark_bar().encode(
+    # One bar segment per (participant, color key) with the summed duration
+    stacked, n_participants = charts['stacked']
+    if stacked['prolific_id'].nunique() < n_participants:
+        st.caption(f"Showing {stacked['prolific_id'].nunique()} of {n_participants} participants (evenly spaced by ID).")
+
+    chart_stack_split = alt.Chart(stacked).mark_bar().encode(
         x=alt.X('prolific_id:N', title='Participant'),
         y=alt.Y('round_duration_seconds:Q', title='Duration (s) [Log Scale]', scale=alt.Scale(type='symlog')),
         color=alt.Color('color_key:N', scale=color_scale, title="State (AI_Round)"),
         column=alt.Column('user_group:N', title="Group"),
-        tooltip=['prolific_id', 'round', 'round_duration_seconds', 'ai_used'],
+        tooltip=['prolific_id', 'round', 'rounds', 'round_duration_seconds', 'ai_used'],
         order=alt.Order('round')
     ).properties(title="Time Breakdown by Group & AI Usage (Gradient by Round)")
     
@@ -295,78 +514,69 @@ else:
 st.header("H2: Delegation Effect (Answer Length)")
 st.markdown("**Hypothesis:** Higher AI usage reduces answer length.")
 
-# Calculate text length
-df['text_len'] = df['assessment'].fillna("").astype(str).apply(len)
+# Text length ('text_len', derived column)
 
 # Stats
-st.markdown(calculate_ttest(df, 'ai_used', 'text_len'))
-
-# Calculate Complexity (ARI Proxy: 4.71*(chars/words) + 0.5*(words/sentences) - 21.43)
-# Simplified here: just avg word length + len
-def calc_complexity(text):
-    if not isinstance(text, str) or not text.strip(): return 0
-    words = text.split()
-    if not words: return 0
-    avg_word_len = sum(len(w) for w in words) / len(words)
-    return avg_word_len * len(words) # Rough proxy for "information density"
-
-df['complexity'] = df['assessment'].apply(calc_complexity)
+st.markdown(format_ttest(tests['text_len']))
 
-# Calculate Similarity to AI
-def calc_similarity(row):
-    # Only relevant if AI was used and text exists
-    if not row['ai_used'] or pd.isna(row['ai_assessment_text']): return 0.0
-    user_text = str(row['assessment'])
-    ai_text = str(row['ai_assessment_text'])
-    return difflib.SequenceMatcher(None, user_text, ai_text).ratio()
-
-df['ai_similarity'] = df.apply(calc_similarity, axis=1)
+# Complexity ('complexity', derived column): avg word length * word count
+# Similarity to AI ('ai_similarity', derived column): SequenceMatcher ratio, 0 if AI not used
 
 # Stats for Length
 st.markdown("#### Answer Length (Chars)")
-st.markdown(calculate_ttest(df, 'ai_used', 'text_len'))
+st.markdown(format_ttest(tests['text_len']))
 
 # Viz Length
-chart_h2_len = alt.Chart(df).mark_boxplot().encode(
-    x='ai_used:N', y='text_len:Q', color='ai_used:N'
-).properties(title="Length")
+chart_h2_len = boxplot(*charts['box']['text_len'], 'ai_used', 'text_len', title="Length")
 
 # Stats for Complexity
 st.markdown("#### Complexity (Word Length * Word Count)")
-st.markdown(calculate_ttest(df, 'ai_used', 'complexity'))
+st.markdown(format_ttest(tests['complexity']))
 
 # Viz Complexity
-chart_h2_comp = alt.Chart(df).mark_boxplot().encode(
-    x='ai_used:N', y='complexity:Q', color='ai_used:N'
-).properties(title="Complexity")
+chart_h2_comp = boxplot(*charts['box']['complexity'], 'ai_used', 'complexity', title="Complexity")
 
 col_h2_1, col_h2_2 = st.columns(2)
 col_h2_1.altair_chart(chart_h2_len, use_container_width=True)
 col_h2_2.altair_chart(chart_h2_comp, use_container_width=True)
 
+# Logged text metrics ('word_count', 'ari', 'edit_distance', ... computed at log time, see streamlit_app/text_metrics.py)
+text_results = analysis['text_metrics']
+if text_results is not None:
+    st.markdown(f"#### Logged Text Metrics ({text_results['n_rows']} rounds logged with them)")
+    st.caption("Word Count")
+    st.markdown(format_ttest(text_results['tests']['word_count']))
+    st.caption("Sentence Count")
+    st.markdown(format_ttest(text_results['tests']['sentence_count']))
+    st.caption("Readability (Automated Readability Index, ~ US grade level)")
+    st.markdown(format_ttest(text_results['tests']['ari']))
+    if text_results['ai_rounds']:
+        col_tm1, col_tm2, col_tm3 = st.columns(3)
+        col_tm1.metric("Median Edit Distance After AI (words)", f"{text_results['median_edit_distance']:.0f}")
+        col_tm2.metric("Avg Share of Final Text Inserted From AI", f"{text_results['mean_ai_insertion_ratio']:.0%}")
+        col_tm3.metric("AI Rounds Submitted Unedited", f"{text_results['unedited_share']:.0%}")
+
 # --- HYPOTHESIS 3: EFFICIENCY ILLUSION (DIFFICULTY) ---
 st.header("H3: Efficiency Illusion (Difficulty)")
 st.markdown("**Hypothesis:** Higher AI usage lowers perceived difficulty.")
 
 # Stats
-st.markdown(calculate_ttest(df, 'ai_used', 'seq_score'))
+st.markdown(format_ttest(tests['seq_score']))
 
 # Viz
-base_h3 = alt.Chart(df).encode(x='ai_used:N', color='ai_used:N')
-box_h3 = base_h3.mark_boxplot().encode(y='seq_score:Q')
-err_h3 = base_h3.mark_errorbar(extent='ci').encode(y='seq_score:Q')
+box_h3 = boxplot(*charts['box']['seq_score'], 'ai_used', 'seq_score')
+err_h3 = errorbar(charts['seq_ci'], 'ai_used')
 
 chart_h3 = (box_h3 + err_h3).properties(title="Perceived Difficulty (Mean + 95% CI)")
 st.altair_chart(chart_h3, use_container_width=True)
 
 # SIMILARITY ANALYSIS: Copiers vs Improvers
 st.subheader("Deep Dive: Copiers vs Improvers (Among AI Users)")
-ai_only_df = df[df['ai_used'] == True].copy()
+strategy_results = analysis['strategy']
 
-if not ai_only_df.empty and 'ai_similarity' in ai_only_df.columns:
-    # 1. Define Split (Median)
-    median_sim = ai_only_df['ai_similarity'].median()
-    ai_only_df['strategy'] = ai_only_df['ai_similarity'].apply(lambda x: 'Copier (High Sim)' if x > median_sim else 'Improver (Low Sim)')
+if strategy_results is not None:
+    # 1. Split at the Median Similarity
+    median_sim = strategy_results['median_sim']
     
     st.markdown(f"**Median Similarity**: {median_sim:.2f}")
     
@@ -377,29 +587,26 @@ if not ai_only_df.empty and 'ai_similarity' in ai_only_df.columns:
     
     with col_s1:
         st.caption("Complexity")
-        st.markdown(calculate_ttest(ai_only_df, 'strategy', 'complexity', 'Copier (High Sim)', 'Improver (Low Sim)'))
-        chart_s1 = alt.Chart(ai_only_df).mark_boxplot().encode(x='strategy:N', y='complexity:Q', color='strategy:N')
+        st.markdown(format_ttest(strategy_results['tests']['complexity']))
+        chart_s1 = boxplot(*charts['strategy_box']['complexity'], 'strategy', 'complexity')
         st.altair_chart(chart_s1, use_container_width=True)
         
     with col_s2:
         st.caption("Time (Seconds)")
-        st.markdown(calculate_ttest(ai_only_df, 'strategy', 'round_duration_seconds', 'Copier (High Sim)', 'Improver (Low Sim)'))
-        chart_s2 = alt.Chart(ai_only_df).mark_boxplot().encode(x='strategy:N', y='round_duration_seconds:Q', color='strategy:N')
+        st.markdown(format_ttest(strategy_results['tests']['round_duration_seconds']))
+        chart_s2 = boxplot(*charts['strategy_box']['round_duration_seconds'], 'strategy', 'round_duration_seconds')
         st.altair_chart(chart_s2, use_container_width=True)
 
     with col_s3:
         st.caption("Perceived Difficulty")
-        st.markdown(calculate_ttest(ai_only_df, 'strategy', 'seq_score', 'Copier (High Sim)', 'Improver (Low Sim)'))
-        chart_s3 = alt.Chart(ai_only_df).mark_boxplot().encode(x='strategy:N', y='seq_score:Q', color='strategy:N')
+        st.markdown(format_ttest(strategy_results['tests']['seq_score']))
+        chart_s3 = boxplot(*charts['strategy_box']['seq_score'], 'strategy', 'seq_score')
         st.altair_chart(chart_s3, use_container_width=True)
 
     # 3. New Scatter Plot: Avg Similarity vs Avg Difficulty
     st.markdown("#### Avg Similarity vs Avg Difficulty (AI Users)")
-    # Group by participant for this specific plot
-    deep_dive_agg = ai_only_df.groupby('prolific_id').agg({
-        'ai_similarity': 'mean',
-        'seq_score': 'mean'
-    }).reset_index()
+    # Grouped by participant for this specific plot
+    deep_dive_agg = charts['deep_dive_points']
     
     chart_dd_scatter = alt.Chart(deep_dive_agg).mark_circle(size=60).encode(
         x=alt.X('ai_similarity:Q', title='Avg Similarity'),
@@ -407,7 +614,7 @@ if not ai_only_df.empty and 'ai_similarity' in ai_only_df.columns:
         tooltip=['prolific_id', 'ai_similarity', 'seq_score']
     ).properties(title="Avg Similarity vs Avg Difficulty")
     
-    st.altair_chart(chart_dd_scatter + chart_dd_scatter.transform_regression('ai_similarity', 'seq_score').mark_line(), use_container_width=True)
+    st.altair_chart(chart_dd_scatter + trend_line(charts['deep_dive_line'], 'ai_similarity', 'seq_score'), use_container_width=True)
 
 else:
     st.info("No AI usage data to analyze similarity.")
@@ -416,77 +623,50 @@ else:
 st.header("Participant Level Analysis")
 st.markdown("Aggregating metrics by Participant to handle 'AI Score' (% of rounds AI was used).")
 
-# Aggregate
-user_agg = df.groupby('prolific_id').agg({
-    'ai_used': 'mean', # % of rounds used
-    'round_duration_seconds': 'mean',
-    'complexity': 'mean',
-    'seq_score': 'mean',
-    'text_len': 'mean'
-}).reset_index()
-
-user_agg.rename(columns={'ai_used': 'ai_score', 'round_duration_seconds': 'avg_time', 'seq_score': 'avg_difficulty'}, inplace=True)
+# Aggregated per participant (see analytics.analysis.participant_aggregates)
+user_agg = analysis['user_agg']
+# Scatter plots get at most chart_data.MAX_POINTS participants
+user_points = charts['user_points']
+if len(user_points) < len(user_agg):
+    st.caption(f"Scatter plots show a random sample of {len(user_points)} of {len(user_agg)} participants.")
 
 col_p1, col_p2, col_p3 = st.columns(3)
 
 with col_p1:
     st.subheader("AI Score vs Avg Complexity")
-    chart_p1 = alt.Chart(user_agg).mark_circle(size=60).encode(
+    chart_p1 = alt.Chart(user_points).mark_circle(size=60).encode(
         x='ai_score:Q', y='complexity:Q', tooltip=['prolific_id', 'ai_score', 'complexity']
     ).properties(title="AI Score vs Complexity")
-    st.altair_chart(chart_p1 + chart_p1.transform_regression('ai_score', 'complexity').mark_line(), use_container_width=True)
+    st.altair_chart(chart_p1 + trend_line(charts['trend_lines']['complexity'], 'ai_score', 'complexity'), use_container_width=True)
 
 with col_p2:
     st.subheader("AI Score vs Avg Time")
-    chart_p2 = alt.Chart(user_agg).mark_circle(size=60).encode(
+    chart_p2 = alt.Chart(user_points).mark_circle(size=60).encode(
         x='ai_score:Q', y='avg_time:Q', tooltip=['prolific_id', 'ai_score', 'avg_time']
     ).properties(title="AI Score vs Avg Time")
-    st.altair_chart(chart_p2 + chart_p2.transform_regression('ai_score', 'avg_time').mark_line(), use_container_width=True)
+    st.altair_chart(chart_p2 + trend_line(charts['trend_lines']['avg_time'], 'ai_score', 'avg_time'), use_container_width=True)
     
 with col_p3:
     st.subheader("AI Score vs Avg Difficulty")
-    chart_p3 = alt.Chart(user_agg).mark_circle(size=60).encode(
+    chart_p3 = alt.Chart(user_points).mark_circle(size=60).encode(
         x='ai_score:Q', y='avg_difficulty:Q', tooltip=['prolific_id', 'ai_score', 'avg_difficulty']
     ).properties(title="AI Score vs Avg Difficulty")
-    st.altair_chart(chart_p3 + chart_p3.transform_regression('ai_score', 'avg_difficulty').mark_line(), use_container_width=True)
+    st.altair_chart(chart_p3 + trend_line(charts['trend_lines']['avg_difficulty'], 'ai_score', 'avg_difficulty'), use_container_width=True)
 
 # --- PARTICIPANT CLUSTERS (BUBBLE GRAPH) ---
 st.subheader("Participant Clusters: Copiers vs Improvers vs No-AI")
 
-# Calculate 'avg_similarity' for each user
-user_sim = df[df['ai_used']==True].groupby('prolific_id')['ai_similarity'].mean().reset_index()
-
-# Robust Merge: Ensure 'avg_similarity' exists even if user_sim is empty or merge acts up
-if not user_sim.empty:
-    user_agg = pd.merge(user_agg, user_sim, on='prolific_id', how='left')
-else:
-    user_agg['avg_similarity'] = 0.0
-    
-if 'avg_similarity' not in user_agg.columns:
-    user_agg['avg_similarity'] = 0.0
-
-user_agg['avg_similarity'] = user_agg['avg_similarity'].fillna(0)
-
-# Define Classification (Round 26 Logic)
-# Copier: AI Score > 0 AND Complexity < 40
-# Improver: AI Score > 0 AND Complexity > 80
+# 'avg_similarity' per user is part of user_agg; the cluster comes from get_clusters()
+# Classification (Round 26 Logic, thresholds from the sidebar):
+# Copier: AI Score > 0 AND Complexity < copier_max (default 40)
+# Improver: AI Score > 0 AND Complexity > improver_min (default 80)
 # Users: Everyone else (renamed from Needer)
 
-def classify_user(row):
-    if row['ai_score'] > 0 and row['complexity'] < 40:
-        return 'Copier'
-    elif row['ai_score'] > 0 and row['complexity'] > 80:
-        return 'Improver'
-    else:
-        return 'Users'
-
-user_agg['cluster'] = user_agg.apply(classify_user, axis=1)
-
 # Unified Color Scheme: Blue Gradients by Time
 # We use Altair's built-in scale for this.
 
 # 1. Base Chart (Common Encodings)
-base = alt.Chart(user_agg).encode(
+base = alt.Chart(clusters['points']).encode(
     x=alt.X('ai_score:Q', title='AI Score (% usage)'),
     y=alt.Y('complexity:Q', title='Avg Complexity')
 )
@@ -504,73 +684,87 @@ points = base.mark_point(filled=True, opacity=0.8, size=200).encode(
 
 # 3. Trend Lines & Labels
 layers = [points]
-clusters = ['Copier', 'Users', 'Improver']
 colors = {'Copier': 'red', 'Users': 'blue', 'Improver': 'green'}
 
-# Placeholders for debug stats
-reg_stats = []
+# Regression stats per cluster (fitted server-side, see analytics.analysis.cluster_analysis)
+reg_stats = clusters['reg_stats']
 
-for cluster in clusters:
-    cluster_data = user_agg[user_agg['cluster'] == cluster]
-    if len(cluster_data) > 1:
-        # Calculate Regression
-        slope, intercept, r_value, p_value, std_err = stats.linregress(cluster_data['ai_score'], cluster_data['complexity'])
-        r_squared = r_value**2
-        
-        reg_stats.append({
-            'cluster': cluster, 'n': len(cluster_data), 
-            'slope': slope, 'intercept': intercept, 'r2': r_squared, 'p_value': p_value
-        })
-        
-        # Trend Line (Base -> Filter -> Regression -> Line)
-        # Explicitly set color to black/dashed to verify visibility
-        line = base.transform_filter(
-            alt.datum.cluster == cluster
-        ).transform_regression(
-            'ai_score', 'complexity', method='linear'
-        ).mark_line(color='black', strokeDash=[5, 5]) 
-        
-        layers.append(line)
-        
-        # Text Label
-        max_ai = cluster_data['ai_score'].max()
-        pred_comp = slope * max_ai + intercept
-        label = f"{cluster}: y={slope:.2f}x+{intercept:.2f}, R²={r_squared:.4f}"
-        
-        text = alt.Chart(pd.DataFrame({'x': [max_ai], 'y': [pred_comp], 'label': [label], 'cluster': [cluster]})).mark_text(
-            align='left', baseline='middle', dx=5, color=colors.get(cluster, 'black'), fontSize=14, fontWeight='bold'
-        ).encode(
-            x='x:Q', y='y:Q', text='label:N'
-        )
-        layers.append(text)
+# Trend Lines: two fitted endpoints per cluster
+# Explicitly set color to black/dashed to verify visibility
+if reg_stats:
+    layers.append(trend_line(clusters['lines'], 'ai_score', 'complexity', detail='cluster', color='black', strokeDash=[5, 5]))
+
+for reg in reg_stats:
+    cluster = reg['cluster']
+    slope, intercept, r_squared = reg['slope'], reg['intercept'], reg['r2']
+
+    # Text Label
+    max_ai = reg['max_ai']
+    pred_comp = slope * max_ai + intercept
+    label = f"{cluster}: y={slope:.2f}x+{intercept:.2f}, R²={r_squared:.4f}"
+    
+    text = alt.Chart(pd.DataFrame({'x': [max_ai], 'y': [pred_comp], 'label': [label], 'cluster': [cluster]})).mark_text(
+        align='left', baseline='middle', dx=5, color=colors.get(cluster, 'black'), fontSize=14, fontWeight='bold'
+    ).encode(
+        x='x:Q', y='y:Q', text='label:N'
+    )
+    layers.append(text)
 
 st.altair_chart(alt.layer(*layers), use_container_width=True)
 
 # Debug Data Table
 with st.expander("Debug: Check Cluster Classification & Data"):
-    st.markdown(f"**Global Median Similarity:** {df[df['ai_used']==True]['ai_similarity'].median():.4f}")
-    st.markdown("Filter Logic: **Copier** (AI>0 & Comp<40), **Improver** (AI>0 & Comp>80), **Users** (Everyone else)")
+    st.markdown(f"**Global Median Similarity:** {analysis['median_similarity']:.4f}")
+    st.markdown(f"Filter Logic: **Copier** (AI>0 & Comp<{copier_max:g}), **Improver** (AI>0 & Comp>{improver_min:g}), **Users** (Everyone else)")
     
     st.write("**Regression Stats:**")
     if reg_stats:
-        st.dataframe(pd.DataFrame(reg_stats))
+        st.dataframe(pd.DataFrame(reg_stats).drop(columns=['max_ai']))
     else:
         st.write("No clusters had enough data (>1 point) for regression.")
         
     st.write("**Copier/Improver Raw Data (for R2 Check):**")
-    st.dataframe(user_agg[user_agg['cluster'].isin(['Copier', 'Improver'])][['prolific_id', 'cluster', 'ai_score', 'complexity']])
+    cluster_debug = clusters['cluster_debug']
+    show_paginated(cluster_debug['copier_improver'], "copier_improver")
     
     st.write("**Regression Input Vectors (Check for Constant Values):**")
-    for cluster in clusters:
-        cd = user_agg[user_agg['cluster'] == cluster]
-        if len(cd) > 1:
-            st.write(f"Cluster: {cluster}, X (AI Score): {cd['ai_score'].tolist()}, Y (Complexity): {cd['complexity'].tolist()}")
+    for cluster, (x_vals, y_vals) in cluster_debug['vectors'].items():
+        st.write(f"Cluster: {cluster}, X (AI Score): {x_vals}, Y (Complexity): {y_vals}")
 
-    debug_cols = ['prolific_id', 'ai_score', 'avg_similarity', 'complexity', 'cluster', 'avg_time']
-    st.dataframe(user_agg[debug_cols].sort_values('avg_similarity', ascending=False))
+    show_paginated(cluster_debug['by_similarity'], "by_similarity")
 
 
 
+# --- PARTICIPANT PATHS (STATE MACHINE) ---
+st.header("Participant Paths")
+st.markdown("Each game session's scenario sequence replayed through the game's state machine (see `analytics/sessions.py`); "
+            "a participant who restarts with the same ID has one session per game. "
+            "**Wasted** actions fix a cause the scenario did not have; **ineffective** ones fix a present cause without changing the scenario.")
+paths = analysis['paths']
+col_w1, col_w2 = st.columns(2)
+col_w1.metric("Completion Rate", f"{paths['completion_rate']:.0%}")
+if pd.notna(paths['avg_rounds_over_optimal']):
+    col_w2.metric("Avg Rounds over Optimal (finished)", f"{paths['avg_rounds_over_optimal']:.2f}")
+
+st.markdown("#### Wasted Actions vs AI Usage (per round)")
+st.dataframe(paths['by_ai_used'])
+
+st.markdown("#### Rounds over Optimal (sessions)")
+st.bar_chart(paths['sessions']['rounds_over_optimal'].value_counts().sort_index())
+
+with st.expander("Show Participant Paths"):
+    show_paginated(paths['sessions'], "sessions")
+
 # Raw Data
 with st.expander("View Raw Data"):
-    st.dataframe(df)
+    show_paginated(df, "raw_data")
+
+with st.expander("Memory Layout"):
+    st.markdown("Typed schema (categoricals, small ints, Arrow strings; see `analytics/schema.py`) vs the previous all-object layout.")
+    if st.checkbox("Compute memory report (deep scan of every column)"):
+        report = memory_report(df)
+        total = report.loc['TOTAL']
+        st.metric("In-memory size", f"{total['bytes'] / 1e6:.1f} MB", f"-{total['saved_pct']:.0f}% vs {total['legacy_bytes'] / 1e6:.1f} MB", delta_color="inverse")
+        st.dataframe(report)
+
+startup_profile.mark_rendered('dashboard')
@@ -0,0 +1,58 @@
+import datetime
+
+import pandas as pd
+import streamlit as st
+
+from analytics.live import (
+    JOURNAL_FILE, LiveMonitor,
+    ACTIVE_WINDOW_SECONDS, FAILURE_WINDOW_SECONDS, RATE_WINDOW_SECONDS,
+)
+
+REFRESH_SECONDS = 3
+
+st.set_page_config(page_title="Fermentation Game - Live Monitor", layout="wide")
+
+st.title("Live Study Monitor")
+st.markdown(
+    f"Tails the write journal (`{JOURNAL_FILE}`) every {REFRESH_SECONDS}s: only lines appended since "
+    "the last tick are read. Full analyses stay in `dashboard.py`."
+)
+
+@st.cache_resource
+def get_monitor():
+    """One tail + counters per server process, shared by every open monitor tab."""
+    return LiveMonitor()
+
+@st.fragment(run_every=REFRESH_SECONDS)
+def render_live():
+    snapshot = get_monitor().poll()
+    totals = snapshot['totals']
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric(f"Active Participants (last {ACTIVE_WINDOW_SECONDS // 60} min)", snapshot['active_participants'])
+    col2.metric(f"Rounds / Minute (last {RATE_WINDOW_SECONDS}s)", f"{snapshot['rounds_per_minute']:.1f}")
+    failure_rate = snapshot['sheets_failure_rate']
+    col3.metric(
+        f"Sheets Failure Rate (last {FAILURE_WINDOW_SECONDS // 60} min)",
+        "n/a" if failure_rate is None else f"{failure_rate:.0%}",
+    )
+    col4.metric("Completed Games", totals.get('completions', 0))
+
+    if failure_rate:
+        st.warning(f"⚠️ Sheets writes are failing ({failure_rate:.0%}). Rows are still written to the local fallback CSVs.")
+
+    st.subheader("Recent Completions")
+    if snapshot['recent_completions']:
+        st.dataframe(pd.DataFrame(snapshot['recent_completions']), hide_index=True)
+    else:
+        st.caption("No completed games yet.")
+
+    last = snapshot['last_entry_ts']
+    st.caption(
+        f"Journal: {totals.get('entries', 0)} entries ({totals.get('rounds', 0)} rounds, {totals.get('feedback', 0)} feedback, "
+        f"{totals.get('sheets_failures', 0)} Sheets failures), +{snapshot['new_entries']} this tick"
+        + (f", last write {datetime.datetime.fromtimestamp(last):%H:%M:%S}" if last else "")
+        + (f", {snapshot['bad_lines']} unreadable lines" if snapshot['bad_lines'] else "")
+    )
+
+render_live()
@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+# Defaults (override via st.secrets["admission"] or FERMENT_* environment variables)
+DEFAULT_MAX_ACTIVE_GAMES = 150
+DEFAULT_START_RATE_PER_SECOND = 2.0
+DEFAULT_START_BURST = 10
+DEFAULT_SESSION_IDLE_TIMEOUT = 30 * 60  # Abandoned games give their slot back after 30 min
+DEFAULT_QUEUE_IDLE_TIMEOUT = 60  # Waiting sessions that stop polling leave the queue
+WAITING_POLL_SECONDS = 3
+
+ADMISSION_SETTINGS = {
+    # key: (environment variable, default, cast)
+    'max_active_games': ('FERMENT_MAX_ACTIVE_GAMES', DEFAULT_MAX_ACTIVE_GAMES, int),
+    'start_rate_per_second': ('FERMENT_START_RATE_PER_SECOND', DEFAULT_START_RATE_PER_SECOND, float),
+    'start_burst': ('FERMENT_START_BURST', DEFAULT_START_BURST, int),
+    'session_idle_timeout': ('FERMENT_SESSION_IDLE_TIMEOUT', DEFAULT_SESSION_IDLE_TIMEOUT, float),
+    'queue_idle_timeout': ('FERMENT_QUEUE_IDLE_TIMEOUT', DEFAULT_QUEUE_IDLE_TIMEOUT, float),
+}
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def try_take(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def available(self, now=None):
+        self._refill(time.monotonic() if now is None else now)
+        return self.tokens
+
+
+class AdmissionController:
+    """
+    Process-wide gate in front of `start_tutorial`.
+    Caps concurrently active games, queues everyone else in arrival order
+    and rate limits new game starts so a study launch does not hit
+    Sheets with hundreds of sessions at once.
+    """
+
+    def __init__(self, max_active_games=DEFAULT_MAX_ACTIVE_GAMES,
+                 start_rate_per_second=DEFAULT_START_RATE_PER_SECOND,
+                 start_burst=DEFAULT_START_BURST,
+                 session_idle_timeout=DEFAULT_SESSION_IDLE_TIMEOUT,
+                 queue_idle_timeout=DEFAULT_QUEUE_IDLE_TIMEOUT):
+        self.max_active_games = max_active_games
+        self.session_idle_timeout = session_idle_timeout
+        self.queue_idle_timeout = queue_idle_timeout
+        self.bucket = TokenBucket(start_rate_per_second, start_burst)
+        self._lock = threading.Lock()
+        self._active = {}  # session_id -> last seen (monotonic)
+        self._queue = OrderedDict()  # session_id -> (enqueued_at, last seen)
+        self._counters = {'admitted_total': 0, 'released_total': 0, 'expired_total': 0, 'rate_limited_total': 0}
+
+    def _expire(self, now):
+        stale = [sid for sid, seen in self._active.items() if now - seen > self.session_idle_timeout]
+        for sid in stale:
+            del self._active[sid]
+        self._counters['expired_total'] += len(stale)
+
+        gone = [sid for sid, (_, seen) in self._queue.items() if now - seen > self.queue_idle_timeout]
+        for sid in gone:
+            del self._queue[sid]
+
+    def request_admission(self, session_id):
+        """
+        Try to admit a session. Returns (admitted, queue_position).
+        Sessions that are not admitted keep their place in the queue as long as they keep polling.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+
+            if session_id in self._active:
+                self._active[session_id] = now
+                return True, 0
+
+            enqueued_at = self._queue[session_id][0] if session_id in self._queue else now
+            self._queue[session_id] = (enqueued_at, now)  # Existing keys keep their position
+            position = list(self._queue).index(session_id) + 1
+
+            free_slots = self.max_active_games - len(self._active)
+            if position <= free_slots:
+                if self.bucket.try_take(now):
+                    del self._queue[session_id]
+                    self._active[session_id] = now
+                    self._counters['admitted_total'] += 1
+                    return True, 0
+                self._counters['rate_limited_total'] += 1
+
+            return False, position
+
+    def heartbeat(self, session_id):
+        """Mark an admitted session as alive. A session that idled out is let back in rather than kicked mid-game."""
+        with self._lock:
+            self._active[session_id] = time.monotonic()
+
+    def release(self, session_id):
+        """Free the slot of a finished (or abandoned) game."""
+        with self._lock:
+            if self._active.pop(session_id, None) is not None:
+                self._counters['released_total'] += 1
+            self._queue.pop(session_id, None)
+
+    def metrics(self):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            oldest_wait = max((now - enqueued for enqueued, _ in self._queue.values()), default=0.0)
+            return {
+                'active_sessions': len(self._active),
+                'queued_sessions': len(self._queue),
+                'max_active_games': self.max_active_games,
+                'start_tokens_available': round(self.bucket.available(now), 2),
+                'oldest_wait_seconds': round(oldest_wait, 1),
+                **self._counters,
+            }
+
+
+def load_admission_config():
+    """Read admission settings from st.secrets["admission"], then environment variables, then defaults."""
+    secrets = {}
+    try:
+        if "admission" in st.secrets:
+            secrets = dict(st.secrets["admission"])
+    except Exception:
+        # st.secrets access failed (e.g. no secrets.toml found locally)
+        pass
+
+    config = {}
+    for key, (env_var, default, cast) in ADMISSION_SETTINGS.items():
+        raw = secrets.get(key, os.environ.get(env_var, default))
+        try:
+            config[key] = cast(raw)
+        except (TypeError, ValueError):
+            print(f"Admission Config Error: invalid {key}={raw!r}, using {default}")
+            config[key] = default
+    return config
+
+
+@st.cache_resource
+def get_admission_controller():
+    """One controller per server process, shared by every session."""
+    return AdmissionController(**load_admission_config())
@@ -0,0 +1,225 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import streamlit as st
+
+from game_logic import SCENARIO_DATA, ACTIONS, AI_ASSESSMENTS
+
+# Defaults (override via st.secrets["ai"] or FERMENT_AI_* environment variables)
+DEFAULT_PROVIDER = 'static'
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_CACHE_TTL = 60 * 60  # Seconds; a generated assessment is reused for this long
+DEFAULT_PREFETCH_WORKERS = 4
+DEFAULT_WAIT_SECONDS = 15.0  # How long "See AI Analysis" waits for an in-flight request
+DEFAULT_STUB_LATENCY = 0.0  # Simulated model latency of the static provider (rehearsing prefetch)
+NO_ANALYSIS = "No analysis available."
+NO_ACTION = "No action needed."
+
+AI_SETTINGS = {
+    # key: (environment variable, default, cast)
+    'provider': ('FERMENT_AI_PROVIDER', DEFAULT_PROVIDER, str),
+    'cache_size': ('FERMENT_AI_CACHE_SIZE', DEFAULT_CACHE_SIZE, int),
+    'cache_ttl': ('FERMENT_AI_CACHE_TTL', DEFAULT_CACHE_TTL, float),
+    'prefetch_workers': ('FERMENT_AI_PREFETCH_WORKERS', DEFAULT_PREFETCH_WORKERS, int),
+    'wait_seconds': ('FERMENT_AI_WAIT_SECONDS', DEFAULT_WAIT_SECONDS, float),
+    'stub_latency': ('FERMENT_AI_STUB_LATENCY', DEFAULT_STUB_LATENCY, float),
+}
+
+
+class AssessmentProvider(ABC):
+    """
+    Backend interface: assess() returns {'analysis': str, 'recommendation': str}
+    for a scenario and the sensor history the participant is looking at.
+    It runs on prefetch worker threads, so it must not call st.* functions.
+    Abstract: a backend without assess() fails when it is constructed, not on a worker thread.
+    """
+    name = 'base'
+
+    @abstractmethod
+    def assess(self, scenario_id, sensor_history):
+        """{'analysis': str, 'recommendation': str} for this scenario and sensor history."""
+
+
+class StaticAssessmentProvider(AssessmentProvider):
+    """Deterministic stub: the scripted AI_ASSESSMENTS text plus the actions that fix the scenario's causes."""
+    name = 'static'
+
+    def __init__(self, latency=DEFAULT_STUB_LATENCY):
+        self.latency = latency
+
+    def assess(self, scenario_id, sensor_history):
+        if self.latency:
+            time.sleep(self.latency)
+        causes = SCENARIO_DATA.get(scenario_id, {}).get('causes', [])
+        rec_actions = [a['text'] for a in ACTIONS.values() if a['fixes'] in causes]
+        return {
+            'analysis': AI_ASSESSMENTS.get(scenario_id, NO_ANALYSIS),
+            'recommendation': "; ".join(rec_actions) if rec_actions else NO_ACTION,
+        }
+
+
+# Generated backends register here under the name used in the 'provider' setting
+PROVIDERS = {'static': StaticAssessmentProvider}
+
+
+def assessment_key(scenario_id, sensor_history):
+    """(scenario_id, sensor values): hashable, and equal for the same round in any session."""
+    return scenario_id, tuple((k, tuple(v)) for k, v in sorted(sensor_history.items()))
+
+
+class AssessmentCache:
+    """Thread-safe LRU of assessments, each entry valid for `ttl` seconds."""
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (stored at (monotonic), assessment), most recent last
+
+    def get(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, assessment, now=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() if now is None else now, assessment)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class AssessmentService:
+    """
+    Process-wide front of the provider. prefetch() is called when a round starts and
+    runs the provider on a worker thread; get() (the "See AI Analysis" click) then
+    returns from the cache, or waits for the request already in flight; peek() only
+    reads the cache.
+    Concurrent requests for the same key share one provider call.
+    """
+
+    def __init__(self, provider, cache_size=DEFAULT_CACHE_SIZE, cache_ttl=DEFAULT_CACHE_TTL,
+                 prefetch_workers=DEFAULT_PREFETCH_WORKERS, wait_seconds=DEFAULT_WAIT_SECONDS):
+        self.provider = provider
+        self.cache = AssessmentCache(cache_size, cache_ttl)
+        self.wait_seconds = wait_seconds
+        self._pool = ThreadPoolExecutor(max_workers=prefetch_workers, thread_name_prefix="ai-prefetch")
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> Future
+        self._counters = {'hits': 0, 'waits': 0, 'misses': 0, 'prefetched': 0, 'errors': 0}
+
+    def _run(self, key, scenario_id, sensor_history):
+        try:
+            assessment = self.provider.assess(scenario_id, sensor_history)
+            self.cache.put(key, assessment)
+            return assessment
+        except Exception as e:
+            print(f"AI Provider Error ({self.provider.name}): {e}")
+            with self._lock:
+                self._counters['errors'] += 1
+            return None
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _submit(self, key, scenario_id, sensor_history):
+        """In-flight future for `key`, started if needed (callers hold _lock)."""
+        future = self._inflight.get(key)
+        if future is None:
+            # Copy: the session keeps appending to its history while the worker reads it
+            history = {k: list(v) for k, v in sensor_history.items()}
+            future = self._pool.submit(self._run, key, scenario_id, history)
+            self._inflight[key] = future
+        return future
+
+    def prefetch(self, scenario_id, sensor_history):
+        """Start generating the assessment for this round in the background (no-op if cached or in flight)."""
+        key = assessment_key(scenario_id, sensor_history)
+        with self._lock:
+            if self.cache.get(key) is not None:
+                return
+            if key not in self._inflight:
+                self._counters['prefetched'] += 1
+            self._submit(key, scenario_id, sensor_history)
+
+    def get(self, scenario_id, sensor_history):
+        """The assessment for this round, or None if the provider failed or timed out."""
+        key = assessment_key(scenario_id, sensor_history)
+        with self._lock:
+            # Checked under the lock: a finishing request stores its result before leaving _inflight
+            assessment = self.cache.get(key)
+            if assessment is not None:
+                self._counters['hits'] += 1
+                return assessment
+            self._counters['waits' if key in self._inflight else 'misses'] += 1
+            future = self._submit(key, scenario_id, sensor_history)
+        try:
+            return future.result(timeout=self.wait_seconds)
+        except FutureTimeout:
+            print(f"AI Provider Timeout ({self.provider.name}): no assessment after {self.wait_seconds}s")
+            return None
+
+    def peek(self, scenario_id, sensor_history):
+        """The cached assessment for this round, None if it is not ready (never waits or starts a request)."""
+        return self.cache.get(assessment_key(scenario_id, sensor_history))
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'provider': self.provider.name,
+                'cached_assessments': len(self.cache),
+                'in_flight': len(self._inflight),
+                **self._counters,
+            }
+
+
+def load_ai_config():
+    """Read AI settings from st.secrets["ai"], then environment variables, then defaults."""
+    secrets = {}
+    try:
+        if "ai" in st.secrets:
+            secrets = dict(st.secrets["ai"])
+    except Exception:
+        # st.secrets access failed (e.g. no secrets.toml found locally)
+        pass
+
+    config = {}
+    for key, (env_var, default, cast) in AI_SETTINGS.items():
+        raw = secrets.get(key, os.environ.get(env_var, default))
+        try:
+            config[key] = cast(raw)
+        except (TypeError, ValueError):
+            print(f"AI Config Error: invalid {key}={raw!r}, using {default}")
+            config[key] = default
+    return config
+
+
+def make_provider(name, stub_latency=DEFAULT_STUB_LATENCY):
+    if name not in PROVIDERS:
+        print(f"AI Config Error: unknown provider {name!r}, using {DEFAULT_PROVIDER}")
+        name = DEFAULT_PROVIDER
+    if name == 'static':
+        return StaticAssessmentProvider(latency=stub_latency)
+    return PROVIDERS[name]()
+
+
+@st.cache_resource
+def get_assessment_service():
+    """One provider, cache and prefetch pool per server process, shared by every session."""
+    config = load_ai_config()
+    provider = make_provider(config.pop('provider'), config.pop('stub_latency'))
+    return AssessmentService(provider, **config)
@@ -1,9 +1,13 @@
+import startup_profile  # First: times the imports below when FERMENT_PROFILE_STARTUP=1
 import streamlit as st
-import pandas as pd
 from game_logic import GameState, SCENARIO_DATA, ACTIONS, AI_ASSESSMENTS, STARTING_SCENARIO_ID
 from ui_components import render_dashboard
 from data_manager import log_data, log_feedback
+from admission import get_admission_controller, WAITING_POLL_SECONDS
+from ai_provider import get_assessment_service, NO_ANALYSIS
+from text_metrics import text_metrics
 import time
+import uuid
 
 # Page Config
 st.set_page_config(layout="wide", page_title="Fermentation Game")
@@ -36,12 +40,39 @@ if 'end_time' not in st.session_state:
     st.session_state.end_time = None
 if 'round_start_time' not in st.session_state:
     st.session_state.round_start_time = None
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex  # Admission control identity
+if 'queue_position' not in st.session_state:
+    st.session_state.queue_position = 0
+
+# --- AI ASSESSMENT ---
+def current_ai_assessment(gs):
+    """The AI panel's content for this round (served from the prefetch cache, see ai_provider.py)."""
+    assessment = get_assessment_service().get(gs.current_scenario_id, gs.sensor_history)
+    return assessment or {'analysis': "", 'recommendation': ""}
+
+def logged_ai_text(gs):
+    """
+    ai_assessment_text of this round's log row: the analysis if it is already cached, else "".
+    Never waits on the provider, so submitting is not held up when the panel was never opened.
+    """
+    assessment = get_assessment_service().peek(gs.current_scenario_id, gs.sensor_history)
+    if not assessment or assessment['analysis'] == NO_ANALYSIS:
+        return ""
+    return assessment['analysis']
 
 # --- NAV FUNCTIONS ---
 def start_tutorial():
     if not st.session_state.prolific_id:
         st.error("Please enter your Prolific ID.")
         return
+    # Admission Control: cap active games & rate limit new starts, queue everyone else
+    admitted, position = get_admission_controller().request_admission(st.session_state.session_id)
+    if not admitted:
+        st.session_state.queue_position = position
+        st.session_state.page = 'WAITING'
+        return
+    st.session_state.queue_position = 0
     st.session_state.game_state = GameState('TUTORIAL')
     st.session_state.game_state.current_scenario_id = 1 # Start good for tutorial
     st.session_state.game_state.seed_sensor_history(1)
@@ -88,7 +119,9 @@ def next_round():
         if assessment != st.session_state.last_assessment_before_ai:
             text_changed = True
 
-    # 3. Log Data
+    # 3. Log Data (text metrics computed here, once, instead of on every dashboard load)
+    ai_text = logged_ai_text(gs)
+    pre_ai_text = st.session_state.last_assessment_before_ai if st.session_state.ai_visible else None
     log_entry = {
         'prolific_id': st.session_state.prolific_id,
         'round': gs.round_number,
@@ -100,12 +133,13 @@ def next_round():
         'seq_score': seq_score,
         'ai_used': st.session_state.ai_visible,
         'text_changed': text_changed,
-        'ai_assessment_text': AI_ASSESSMENTS.get(gs.current_scenario_id, ""),
+        'ai_assessment_text': ai_text,
         'user_assessment_final': assessment,
         'tutorial_duration_seconds': st.session_state.get('tutorial_duration_seconds', 0),
-        'round_duration_seconds': round_duration
+        'round_duration_seconds': round_duration,
+        **text_metrics(assessment, pre_ai_text, ai_text),
     }
-    log_data(log_entry)
+    log_data(log_entry, page='GAME', session_id=st.session_state.session_id)
 
     # 4. Update Game State
     next_id = gs.determine_next_state(gs.current_scenario_id, action_key)
@@ -129,10 +163,12 @@ def next_round():
             'user_assessment_final': "COMPLETED",
             'user_assessment_final': "COMPLETED",
             'tutorial_duration_seconds': st.session_state.get('tutorial_duration_seconds', 0),
-            'round_duration_seconds': round_duration
+            'round_duration_seconds': round_duration,
+            **text_metrics("Simulation Complete"),
         }
-        log_data(log_entry_final)
+        log_data(log_entry_final, page='GAME', session_id=st.session_state.session_id)
         
+        get_admission_controller().release(st.session_state.session_id) # Free the slot for the waiting room
         st.session_state.page = 'END'
     else:
         gs.current_scenario_id = next_id
@@ -173,6 +209,18 @@ def render_login():
             start_tutorial()
             st.rerun()
 
+@st.fragment(run_every=WAITING_POLL_SECONDS)
+def render_waiting():
+    # Lightweight page: only this fragment reruns while polling for a free slot
+    start_tutorial()
+    if st.session_state.page != 'WAITING':
+        st.rerun() # Admitted -> full rerun into the tutorial
+        
+    st.title("Fermentation Troubleshooting Game")
+    st.info("Many participants are starting right now. You are in the waiting room.")
+    st.metric("Your position in the queue", st.session_state.queue_position)
+    st.caption("Please keep this tab open. The game will start automatically once a place is free.")
+
 def render_tutorial():
     gs = st.session_state.game_state
     st.header("Tutorial")
@@ -310,6 +358,8 @@ def render_tutorial():
 
 def render_game():
     gs = st.session_state.game_state
+    # Start generating this round's AI analysis now, so the button answers from cache
+    get_assessment_service().prefetch(gs.current_scenario_id, gs.sensor_history)
     
     st.subheader(f"Round {gs.round_number}")
     
@@ -364,10 +414,12 @@ def render_game():
         
         if st.session_state.ai_visible:
             st.markdown("### AI Analysis")
-            ai_text = AI_ASSESSMENTS.get(gs.current_scenario_id, "No analysis available.")
-            current_causes = SCENARIO_DATA[gs.current_scenario_id]['causes']
-            rec_actions = [ACTIONS[k]['text'] for k, v in ACTIONS.items() if v['fixes'] in current_causes]
-            rec_text = "; ".join(rec_actions) if rec_actions else "No action needed."
+            assessment = current_ai_assessment(gs)
+            if not assessment['analysis']:
+                st.warning("The AI analysis is not available right now.")
+                return
+            ai_text = assessment['analysis']
+            rec_text = assessment['recommendation']
             
             st.info(f"**Analysis:** {ai_text}")
             st.success(f"**Recommendation:** {rec_text}")
@@ -411,7 +463,7 @@ def render_end():
                     'total_time_seconds': round(total_time, 2),
                     'tutorial_duration_seconds': st.session_state.get('tutorial_duration_seconds', 0),
                     'feedback_text': feedback_text
-                })
+                }, session_id=st.session_state.session_id)
                 
                 # Always hide form after submission attempt
                 st.session_state.feedback_submitted = True
@@ -426,11 +478,27 @@ def render_end():
 
 
 # --- MAIN ---
+if "admission_metrics" in st.query_params:
+    # Ops view: ?admission_metrics=1 returns active/queued session counts
+    st.json(get_admission_controller().metrics())
+    st.stop()
+if "ai_metrics" in st.query_params:
+    # Ops view: ?ai_metrics=1 returns assessment cache hits / prefetches / provider errors
+    st.json(get_assessment_service().metrics())
+    st.stop()
+
+if st.session_state.page in ('TUTORIAL', 'GAME'):
+    get_admission_controller().heartbeat(st.session_state.session_id)
+
 if st.session_state.page == 'LOGIN':
     render_login()
+elif st.session_state.page == 'WAITING':
+    render_waiting()
 elif st.session_state.page == 'TUTORIAL':
     render_tutorial()
 elif st.session_state.page == 'GAME':
     render_game()
 elif st.session_state.page == 'END':
     render_end()
+
+startup_profile.mark_rendered('app')
@@ -1,24 +1,58 @@
 import streamlit as st
-import gspread
-from google.oauth2.service_account import Credentials
-import pandas as pd
 import datetime
 import os
 import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from sharding import SHEET_NAME, shard_for
 
 # Constants
 SCOPE = [
     "https://www.googleapis.com/auth/spreadsheets",
     "https://www.googleapis.com/auth/drive"
 ]
-SHEET_NAME = "Beacon_v02"
 CREDENTIALS_FILE = "credentials.json"
 LOCAL_LOG_FILE = "game_logs_fallback.csv"
+FEEDBACK_LOG_FILE = "feedback_logs_fallback.csv"
+# Append-only record of every write attempt and its Sheets outcome, tailed by live_monitor.py
+JOURNAL_FILE = os.environ.get("FERMENT_LOG_JOURNAL", "log_journal.jsonl")
+# Idempotency keys of every record already written, per sink (unique constraint), checked before each write
+DEDUP_DB = os.environ.get("FERMENT_DEDUP_DB", "log_keys.sqlite")
+DEDUP_LRU_SIZE = 10_000  # (key, sink) pairs remembered in memory per server process
+SINKS = ('sheets', 'csv')  # Where every record is written; a replay only retries the ones missing it
+
+GAME_SHEET_HEADERS = [
+    'timestamp', 'prolific_id', 'round', 'batch_num',
+    'scenario_id', 'scenario_name',
+    'assessment', 'action', 'seq_score',
+    'ai_used', 'text_changed',
+    'ai_assessment_text', 'user_assessment_final',
+    'tutorial_duration_seconds',
+    'round_duration_seconds',
+    'idempotency_key',
+    # Logged text metrics (text_metrics.py), appended last so older sheets' headers are a prefix
+    'pre_ai_assessment', 'edit_distance', 'ai_insertion_ratio',
+    'word_count', 'sentence_count', 'char_count', 'ari'
+]
+FEEDBACK_SHEET_HEADERS = ['timestamp', 'prolific_id', 'total_time_seconds', 'tutorial_duration_seconds', 'feedback_text', 'idempotency_key']
+
+_recent_keys = OrderedDict()  # LRU of (key, sink) pairs claimed by this process, most recent last
+_recent_lock = threading.Lock()
+_dedup_conn = None
+_checked_headers = set()  # (spreadsheet, worksheet) titles whose header row is current
 
-def connect_to_gsheet():
+def connect_to_gsheet(sheet_name=SHEET_NAME):
     """
     Connect to Google Sheets using st.secrets (Cloud) or credentials.json (Local).
+    Returns the first worksheet of spreadsheet `sheet_name` (one of the SHEET_SHARDS).
+    gspread and the google-auth stack are imported here, on the first write, not at app start.
     """
+    import gspread
+    from google.oauth2.service_account import Credentials
+
     # 1. Try Streamlit Secrets (Cloud / production)
     try:
         if "gcp_service_account" in st.secrets:
@@ -27,7 +61,7 @@ def connect_to_gsheet():
                 creds_dict = dict(st.secrets["gcp_service_account"])
                 creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPE)
                 client = gspread.authorize(creds)
-                spreadsheet = client.open(SHEET_NAME)
+                spreadsheet = client.open(sheet_name)
                 return spreadsheet.sheet1
             except Exception as e:
                 print(f"GSheet Connection Error (Secrets): {e}")
@@ -41,7 +75,7 @@ def connect_to_gsheet():
         try:
             creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPE)
             client = gspread.authorize(creds)
-            spreadsheet = client.open(SHEET_NAME)
+            spreadsheet = client.open(sheet_name)
             return spreadsheet.sheet1
         except Exception as e:
             print(f"GSheet Connection Error (File): {e}")
@@ -50,100 +84,295 @@ def connect_to_gsheet():
     print("No valid credentials found.")
     return None
 
-def log_data(data_dict):
+def get_worksheet(sheet, title, headers):
+    """
+    Worksheet `title` of the spreadsheet holding `sheet` (None: `sheet` itself),
+    created with a header row the first time a record is written to it.
+    """
+    if title is None:
+        return sheet
+    import gspread  # Already loaded by connect_to_gsheet
+
+    spreadsheet = sheet.spreadsheet
+    try:
+        return spreadsheet.worksheet(title)
+    except gspread.WorksheetNotFound:
+        worksheet = spreadsheet.add_worksheet(title=title, rows=100, cols=len(headers))
+        worksheet.append_row(headers)
+        return worksheet
+
+def ensure_header(worksheet, headers):
+    """
+    Write `headers` to an empty worksheet, or extend an older header that is a prefix of it
+    (columns are only ever appended), so readers see the new columns. Checked once per
+    process and worksheet; unknown headers are left alone.
+    """
+    key = (worksheet.spreadsheet.title, worksheet.title)
+    if key in _checked_headers:
+        return
+    current = worksheet.row_values(1)
+    if not current:
+        worksheet.append_row(headers)
+    elif current != headers and current == headers[:len(current)]:
+        if worksheet.col_count < len(headers):
+            worksheet.add_cols(len(headers) - worksheet.col_count)
+        worksheet.update([headers], "A1")
+    _checked_headers.add(key)
+
+def append_journal(kind, record, sheets_ok, error=None, retry=False):
+    """
+    Append one JSON line per write attempt: the record plus whether the Sheets write succeeded.
+    retry: the record was already written to another sink (readers must not count it twice).
+    Single small appends, so a reader tailing the file by byte offset only ever sees whole lines
+    (or a trailing partial line it keeps for the next read).
+    """
+    entry = {'ts': time.time(), 'kind': kind, 'sheets_ok': sheets_ok, 'error': error}
+    if retry:
+        entry['retry'] = True
+    entry.update(record)
+    try:
+        with open(JOURNAL_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+    except OSError as e:
+        print(f"Journal Write Error: {e}")
+
+def idempotency_key(record, page, session_id=""):
+    """
+    prolific_id|round|scenario_id|page|session: the same record written twice gets the same key.
+    The session id keeps a participant who restarts the game (same Prolific ID, round 1 again)
+    from having their new rounds taken for repeats.
+    """
+    parts = [record.get('prolific_id', ''), record.get('round', ''), record.get('scenario_id', ''), page, session_id]
+    return "|".join(str(p) for p in parts)
+
+def _dedup_index():
+    """Shared connection to the key index (opened once per process; callers hold _recent_lock)."""
+    global _dedup_conn
+    if _dedup_conn is None:
+        conn = sqlite3.connect(DEDUP_DB, timeout=5, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")  # Several app processes may log at once
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS written_sinks (key TEXT, sink TEXT, kind TEXT, ts REAL, PRIMARY KEY (key, sink))")
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'written_keys'").fetchone():
+            # Index from before sinks were tracked: those keys were never written again, keep it that way
+            with conn:
+                for sink in SINKS:
+                    conn.execute("INSERT OR IGNORE INTO written_sinks SELECT key, ?, kind, ts FROM written_keys", (sink,))
+                conn.execute("DROP TABLE written_keys")
+        _dedup_conn = conn
+    return _dedup_conn
+
+def claim_key(key, kind, sinks=SINKS):
+    """
+    Reserve `key` for a single write to each of `sinks`: returns the sinks that do not
+    have the record yet (empty: a duplicate). Give a sink back with release_key when
+    its write fails, so a replay of the record retries that sink only.
+    The in-memory LRU answers repeats within this process without I/O; the SQLite
+    primary key (key, sink) catches the rest (older keys, other processes, restarts).
+    """
+    with _recent_lock:
+        wanted = []
+        for sink in sinks:
+            if (key, sink) in _recent_keys:
+                _recent_keys.move_to_end((key, sink))
+            else:
+                wanted.append(sink)
+        if not wanted:
+            return []
+        try:
+            conn = _dedup_index()
+            now = time.time()
+            with conn:
+                claimed = [sink for sink in wanted if conn.execute(
+                    "INSERT OR IGNORE INTO written_sinks VALUES (?, ?, ?, ?)", (key, sink, kind, now)).rowcount == 1]
+        except sqlite3.Error as e:
+            # Index unavailable: the LRU alone still stops repeats within this process
+            print(f"Dedup Index Error: {e}")
+            claimed = wanted
+        for sink in claimed:
+            _recent_keys[(key, sink)] = True
+        while len(_recent_keys) > DEDUP_LRU_SIZE:
+            _recent_keys.popitem(last=False)
+        return claimed
+
+def release_key(keys, sink):
+    """Undo claim_key for `sink` after its write failed (`keys`: one key or a list)."""
+    keys = [keys] if isinstance(keys, str) else keys
+    with _recent_lock:
+        for key in keys:
+            _recent_keys.pop((key, sink), None)
+        try:
+            conn = _dedup_index()
+            with conn:
+                conn.executemany("DELETE FROM written_sinks WHERE key = ? AND sink = ?", [(key, sink) for key in keys])
+        except sqlite3.Error as e:
+            print(f"Dedup Index Error: {e}")
+
+def append_fallback(path, record):
+    """Append one record (or a list of records) to a local fallback CSV (header written with the first row)."""
+    import pandas as pd  # Deferred: only this writer needs pandas
+
+    df = pd.DataFrame(record if isinstance(record, list) else [record])
+    if not os.path.exists(path):
+        df.to_csv(path, index=False)
+    else:
+        df.to_csv(path, mode='a', header=False, index=False)
+
+def write_fallback(path, record, keys):
+    """append_fallback, giving the 'csv' claims of `keys` back if the write fails (True if written)."""
+    try:
+        append_fallback(path, record)
+        return True
+    except OSError as e:
+        print(f"Local Log Error: {e}")
+        release_key(keys, 'csv')
+        return False
+
+def log_data(data_dict, page='GAME', session_id=""):
     """
     Log data to Google Sheet, fallback to local CSV.
     data_dict: dict of Record
+    Each sink (Sheets, fallback CSV) is written once per idempotency key: a replay
+    only retries the sinks whose earlier write failed, and a full duplicate is dropped.
+    The row goes to the participant's shard (see sharding.py), one of SHEET_SHARDS.
+    Returns whether the record is in Sheets (written now or before).
     """
-    # 1. Add Timestamp
+    # 1. Add Idempotency Key (kept if the record already has one, e.g. a replay) & Timestamp
+    key = data_dict.setdefault('idempotency_key', idempotency_key(data_dict, page, session_id))
+    sinks = claim_key(key, 'round')
+    if not sinks:
+        print(f"Duplicate round dropped: {key}")
+        return True  # Already logged to every sink
     data_dict['timestamp'] = datetime.datetime.now().isoformat()
     
-    # 2. Try Google Sheet
-    sheet = connect_to_gsheet()
-    success = False
-    if sheet:
-        try:
-            # Check if sheet is empty (no headers)
-            if not sheet.get_all_values():
-                headers = [
-                    'timestamp', 'prolific_id', 'round', 'batch_num', 
-                    'scenario_id', 'scenario_name', 
-                    'assessment', 'action', 'seq_score',
-                    'ai_used', 'text_changed', 
-                    'ai_assessment_text', 'user_assessment_final',
-                    'tutorial_duration_seconds',
-                    'round_duration_seconds'
-                ]
-                sheet.append_row(headers)
-
-            # Order values based on headers
-            headers = [
-                'timestamp', 'prolific_id', 'round', 'batch_num', 
-                'scenario_id', 'scenario_name', 
-                'assessment', 'action', 'seq_score',
-                'ai_used', 'text_changed', 
-                'ai_assessment_text', 'user_assessment_final',
-                'tutorial_duration_seconds',
-                'round_duration_seconds'
-            ]
-            
-            row = [str(data_dict.get(h, '')) for h in headers]
-            sheet.append_row(row)
-            success = True
-        except Exception as e:
-            print(f"GSheet Log Error: {e}")
+    # 2. Try Google Sheet (the participant's shard), unless an earlier attempt got it there
+    success = 'sheets' not in sinks
+    if not success:
+        shard = shard_for(data_dict.get('prolific_id', ''))
+        sheet = connect_to_gsheet(shard.spreadsheet)
+        error = None if sheet else "no Sheets connection"
+        if sheet:
+            try:
+                sheet = get_worksheet(sheet, shard.worksheet, GAME_SHEET_HEADERS)
+                # Header row present and current (written to an empty sheet)
+                ensure_header(sheet, GAME_SHEET_HEADERS)
+
+                # Order values based on headers
+                row = [str(data_dict.get(h, '')) for h in GAME_SHEET_HEADERS]
+                sheet.append_row(row)
+                success = True
+            except Exception as e:
+                error = str(e)
+                print(f"GSheet Log Error: {e}")
+        if not success:
+            release_key(key, 'sheets')
+        append_journal('round', data_dict, success, error, retry=len(sinks) < len(SINKS))
     
     # 3. Local Fallback (Always log locally as backup)
-    df = pd.DataFrame([data_dict])
-    if not os.path.exists(LOCAL_LOG_FILE):
-        df.to_csv(LOCAL_LOG_FILE, index=False)
-    else:
-        df.to_csv(LOCAL_LOG_FILE, mode='a', header=False, index=False)
-        
+    if 'csv' in sinks:
+        write_fallback(LOCAL_LOG_FILE, data_dict, key)
+
     return success
 
-def log_feedback(feedback_dict):
+def log_feedback(feedback_dict, session_id=""):
     """
     Log feedback and total time to Google Sheet (Sheet 2) or fallback CSV.
     feedback_dict: {timestamp, prolific_id, total_time_seconds, tutorial_duration_seconds, feedback_text}
+    Each sink is written once per idempotency key, as in log_data.
     """
+    key = feedback_dict.setdefault('idempotency_key', idempotency_key(feedback_dict, 'END', session_id))
+    sinks = claim_key(key, 'feedback')
+    if not sinks:
+        print(f"Duplicate feedback dropped: {key}")
+        return True  # Already logged to every sink
+
     # 1. Add Timestamp if not present
     if 'timestamp' not in feedback_dict:
         feedback_dict['timestamp'] = datetime.datetime.now().isoformat()
         
-    # 2. Try Google Sheet
-    sheet = connect_to_gsheet()
-    success = False
-    
-    if sheet:
-        try:
-            # Try to get or create a second worksheet "Feedback"
-            spreadsheet = sheet.spreadsheet
+    # 2. Try Google Sheet (the participant's shard, next to their rounds), unless already there
+    success = 'sheets' not in sinks
+    if not success:
+        shard = shard_for(feedback_dict.get('prolific_id', ''))
+        sheet = connect_to_gsheet(shard.spreadsheet)
+        error = None if sheet else "no Sheets connection"
+        if sheet:
             try:
-                worksheet = spreadsheet.worksheet("Feedback")
-            except gspread.WorksheetNotFound:
-                worksheet = spreadsheet.add_worksheet(title="Feedback", rows=100, cols=10)
-                # Add headers
-                worksheet.append_row(['timestamp', 'prolific_id', 'total_time_seconds', 'tutorial_duration_seconds', 'feedback_text'])
-                
-            row = [
-                str(feedback_dict.get('timestamp', '')),
-                str(feedback_dict.get('prolific_id', '')),
-                str(feedback_dict.get('total_time_seconds', '')),
-                str(feedback_dict.get('tutorial_duration_seconds', '')),
-                str(feedback_dict.get('feedback_text', ''))
-            ]
-            worksheet.append_row(row)
-            success = True
-        except Exception as e:
-            print(f"GSheet Feedback Log Error: {e}")
+                # Get or create the shard's feedback worksheet ("Feedback" for the default shard)
+                worksheet = get_worksheet(sheet, shard.feedback_worksheet, FEEDBACK_SHEET_HEADERS)
+                ensure_header(worksheet, FEEDBACK_SHEET_HEADERS)
+                row = [str(feedback_dict.get(h, '')) for h in FEEDBACK_SHEET_HEADERS]
+                worksheet.append_row(row)
+                success = True
+            except Exception as e:
+                error = str(e)
+                print(f"GSheet Feedback Log Error: {e}")
+        if not success:
+            release_key(key, 'sheets')
+        append_journal('feedback', feedback_dict, success, error, retry=len(sinks) < len(SINKS))
 
     # 3. Local Fallback
-    fallback_file = "feedback_logs_fallback.csv"
-    df = pd.DataFrame([feedback_dict])
-    if not os.path.exists(fallback_file):
-        df.to_csv(fallback_file, index=False)
-    else:
-        df.to_csv(fallback_file, mode='a', header=False, index=False)
-        
+    if 'csv' in sinks:
+        write_fallback(FEEDBACK_LOG_FILE, feedback_dict, key)
+
     return success
+
+def log_data_bulk(records, page='GAME', session_id=""):
+    """
+    log_data for many rounds at once (e.g. imported v01 logs, see v01_import.py).
+    Each sink gets the records it does not have yet (by idempotency key, as in log_data);
+    a record's own timestamp is kept (now if it has none). Sheets rows go to their
+    participants' shards with one append_rows call per shard, CSV rows in one write.
+    Returns {'written', 'duplicates', 'sheets_ok'}: records written to at least one sink,
+    records already in every sink, and whether every record is now in Sheets.
+    """
+    now = datetime.datetime.now().isoformat()
+    to_sheets, to_csv, retried = [], [], set()
+    duplicates = 0
+    for record in records:
+        key = record.setdefault('idempotency_key', idempotency_key(record, page, session_id))
+        sinks = claim_key(key, 'round')
+        if not sinks:
+            duplicates += 1
+            continue
+        # Re-inserted so the timestamp stays the last column, as in log_data
+        record['timestamp'] = record.pop('timestamp', None) or now
+        if len(sinks) < len(SINKS):
+            retried.add(key)
+        if 'sheets' in sinks:
+            to_sheets.append(record)
+        if 'csv' in sinks:
+            to_csv.append(record)
+
+    written = set()  # Keys that reached at least one sink
+    sheets_ok = True
+    by_shard = {}
+    for record in to_sheets:
+        by_shard.setdefault(shard_for(record.get('prolific_id', '')), []).append(record)
+
+    for shard, shard_records in by_shard.items():
+        sheet = connect_to_gsheet(shard.spreadsheet)
+        success = False
+        error = None if sheet else "no Sheets connection"
+        if sheet:
+            try:
+                sheet = get_worksheet(sheet, shard.worksheet, GAME_SHEET_HEADERS)
+                ensure_header(sheet, GAME_SHEET_HEADERS)
+                rows = [[str(record.get(h, '')) for h in GAME_SHEET_HEADERS] for record in shard_records]
+                sheet.append_rows(rows)
+                success = True
+            except Exception as e:
+                error = str(e)
+                print(f"GSheet Bulk Log Error ({shard.label}): {e}")
+        if success:
+            written.update(record['idempotency_key'] for record in shard_records)
+        else:
+            release_key([record['idempotency_key'] for record in shard_records], 'sheets')
+        sheets_ok &= success
+        for record in shard_records:
+            append_journal('round', record, success, error, retry=record['idempotency_key'] in retried)
+
+    csv_keys = [record['idempotency_key'] for record in to_csv]
+    if to_csv and write_fallback(LOCAL_LOG_FILE, to_csv, csv_keys):
+        written.update(csv_keys)
+    return {'written': len(written), 'duplicates': duplicates, 'sheets_ok': sheets_ok}
@@ -0,0 +1,81 @@
+"""
+Write targets for the study logs, sharded by participant.
+
+Google Sheets limits writes per spreadsheet, so a busy study can spread its
+log rows over several shards. FERMENT_SHEET_SHARDS is a comma-separated list
+of targets:
+
+    Beacon_v02                      first worksheet + 'Feedback' (the default, one shard)
+    Beacon_v02,Beacon_v02_b         two spreadsheets
+    Beacon_v02:logs_2               worksheet 'logs_2' (+ 'Feedback logs_2') of Beacon_v02
+
+Every record of a participant goes to shard crc32(prolific_id) % shard count,
+so a participant's rounds and feedback stay together. Spreadsheet shards each
+get their own write quota; worksheet shards share their spreadsheet's quota
+and only spread the appends over more sheets. Adding or removing shards moves
+participants: change the list between studies, not during one.
+"""
+import os
+import zlib
+from collections import namedtuple
+
+SHEET_NAME = "Beacon_v02"
+GAME_WORKSHEET = None  # None: the spreadsheet's first worksheet (sheet1)
+FEEDBACK_WORKSHEET = "Feedback"
+
+
+class Shard(namedtuple('Shard', ['spreadsheet', 'worksheet'])):
+    """spreadsheet: title; worksheet: game log worksheet title (None: sheet1)."""
+    __slots__ = ()
+
+    @property
+    def feedback_worksheet(self):
+        return FEEDBACK_WORKSHEET if self.worksheet is None else f"{FEEDBACK_WORKSHEET} {self.worksheet}"
+
+    @property
+    def label(self):
+        return self.spreadsheet if self.worksheet is None else f"{self.spreadsheet}:{self.worksheet}"
+
+    def cache_name(self, table):
+        """Local cache name of one of this shard's tables (the default shard keeps the plain name)."""
+        if self == DEFAULT_SHARD:
+            return table
+        slug = "".join(c if c.isalnum() or c in "-_" else "_" for c in self.label)
+        return f"{table}--{slug}"
+
+
+DEFAULT_SHARD = Shard(SHEET_NAME, GAME_WORKSHEET)
+
+
+def parse_shards(spec):
+    """'Sheet_a,Sheet_b:ws' -> [Shard('Sheet_a', None), Shard('Sheet_b', 'ws')] (duplicates ignored)."""
+    shards = []
+    for target in spec.split(","):
+        spreadsheet, _, worksheet = target.strip().partition(":")
+        shard = Shard(spreadsheet.strip(), worksheet.strip() or None)
+        if shard.spreadsheet and shard not in shards:
+            shards.append(shard)
+    return shards or [DEFAULT_SHARD]
+
+
+SHEET_SHARDS = parse_shards(os.environ.get("FERMENT_SHEET_SHARDS", SHEET_NAME))
+
+
+def shard_index(prolific_id, n_shards=None):
+    """Stable across processes and restarts (unlike hash(), which is salted per process)."""
+    n_shards = n_shards or len(SHEET_SHARDS)
+    return zlib.crc32(str(prolific_id).encode('utf-8')) % n_shards
+
+
+def shard_for(prolific_id, shards=None):
+    shards = shards or SHEET_SHARDS
+    return shards[shard_index(prolific_id, len(shards))]
+
+
+def game_worksheets(shards=None):
+    """Titles of the game log worksheets other than sheet1 (e.g. for exports)."""
+    return {shard.worksheet for shard in shards or SHEET_SHARDS if shard.worksheet is not None}
+
+
+def feedback_worksheets(shards=None):
+    return {shard.feedback_worksheet for shard in shards or SHEET_SHARDS}
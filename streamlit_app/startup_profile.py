@@ -0,0 +1,68 @@
+"""
+Cold-start profiling, enabled with FERMENT_PROFILE_STARTUP=1.
+
+Import this module before anything else in a Streamlit script and call
+mark_rendered() at the end of it. The first script run of each server process
+(the one after a deploy or an autoscale event) then prints one line:
+
+    Startup Profile: {"script": "app", "first_render_seconds": 0.41, "imports": {"streamlit": 0.002, ...}}
+
+imports: seconds spent importing each top-level package for the first time,
+exclusive of the packages it imported in turn (a package the Streamlit server
+had already loaded costs ~0 here). Later runs are warm and not reported.
+Disabled, this module only reads the environment variable.
+"""
+import builtins
+import json
+import os
+import sys
+import threading
+import time
+
+ENABLED = os.environ.get("FERMENT_PROFILE_STARTUP", "").lower() not in ("", "0", "false", "no")
+TOP_IMPORTS = 15  # Slowest packages kept in the report
+
+_started = time.perf_counter()
+_builtin_import = builtins.__import__
+_thread = threading.get_ident()
+_imports = {}     # top-level package -> exclusive seconds
+_stack = []       # seconds spent in nested first-time imports, per open import
+_reported = False
+
+
+def _profiled_import(name, globals=None, locals=None, fromlist=(), level=0):
+    top = name.partition('.')[0]
+    if level or top in sys.modules or threading.get_ident() != _thread:
+        return _builtin_import(name, globals, locals, fromlist, level)
+    _stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        return _builtin_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = _stack.pop()
+        _imports[top] = _imports.get(top, 0.0) + elapsed - nested
+        if _stack:
+            _stack[-1] += elapsed
+
+
+if ENABLED:
+    builtins.__import__ = _profiled_import
+
+
+def mark_rendered(script):
+    """End of a script run: report the first one of this process, then stop profiling imports."""
+    global _reported
+    if not ENABLED or _reported:
+        return
+    _reported = True
+    builtins.__import__ = _builtin_import
+    slowest = sorted(_imports.items(), key=lambda item: item[1], reverse=True)[:TOP_IMPORTS]
+    report = {
+        'script': script,
+        'first_render_seconds': round(time.perf_counter() - _started, 3),
+        'import_seconds': round(sum(_imports.values()), 3),
+        'imports': {name: round(seconds, 3) for name, seconds in slowest},
+        'modules_loaded': len(sys.modules),
+    }
+    print(f"Startup Profile: {json.dumps(report)}")
@@ -0,0 +1,102 @@
+"""
+Text metrics of an assessment, computed once when the round is logged.
+
+The dashboard used to re-derive these from the full texts on every load; now
+each game log row carries them as numbers (TEXT_METRIC_COLS):
+
+* pre_ai_assessment: the assessment as it was when the AI analysis was revealed
+  ("" if the participant never opened it),
+* edit_distance: word-level Levenshtein distance from pre_ai_assessment to the
+  final assessment (0 without AI),
+* ai_insertion_ratio: share of the final words that were inserted after the AI
+  reveal and copied, in order, from the AI text (0..1),
+* word_count, sentence_count, char_count (non-whitespace characters, what the
+  dashboard calls 'complexity'),
+* ari: Automated Readability Index of the final assessment,
+  4.71 * letters/words + 0.5 * words/sentences - 21.43 (0 for empty text).
+
+Texts are a few sentences long, so the word-level work stays well under a
+millisecond per round.
+"""
+import re
+from difflib import SequenceMatcher
+
+TEXT_METRIC_COLS = [
+    'pre_ai_assessment', 'edit_distance', 'ai_insertion_ratio',
+    'word_count', 'sentence_count', 'char_count', 'ari',
+]
+
+_SENTENCE_END = re.compile(r'[.!?]+(?=\s|$)')
+
+
+def words(text):
+    return text.split()
+
+
+def sentence_count(text):
+    """Sentence-ending punctuation runs; a non-empty text without any is one sentence."""
+    if not text.strip():
+        return 0
+    return max(1, len(_SENTENCE_END.findall(text)))
+
+
+def edit_distance(a, b):
+    """Levenshtein distance between two token lists (insert / delete / substitute cost 1)."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, token in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (token != other)))
+        previous = current
+    return previous[-1]
+
+
+def _matched_positions(source, target):
+    """Positions of `target` covered by SequenceMatcher matching blocks against `source`."""
+    matcher = SequenceMatcher(None, source, target, autojunk=False)
+    return {j for _, start, size in matcher.get_matching_blocks() for j in range(start, start + size)}
+
+
+def ai_insertion_ratio(pre_words, final_words, ai_words):
+    if not final_words or not ai_words:
+        return 0.0
+    inserted = set(range(len(final_words))) - _matched_positions(pre_words, final_words)
+    from_ai = inserted & _matched_positions(ai_words, final_words)
+    return len(from_ai) / len(final_words)
+
+
+def ari(letters, n_words, n_sentences):
+    if not n_words or not n_sentences:
+        return 0.0
+    return 4.71 * letters / n_words + 0.5 * n_words / n_sentences - 21.43
+
+
+def text_metrics(final_text, pre_ai_text=None, ai_text=""):
+    """
+    All TEXT_METRIC_COLS for one round. pre_ai_text: None if the AI analysis was not
+    revealed (the final text is then the participant's own, nothing was edited).
+    """
+    final_text = final_text or ""
+    final_words = words(final_text)
+    n_words = len(final_words)
+    n_sentences = sentence_count(final_text)
+    letters = sum(c.isalnum() for c in final_text)
+
+    if pre_ai_text is None:
+        distance, ratio = 0, 0.0
+    else:
+        pre_words = words(pre_ai_text)
+        distance = edit_distance(pre_words, final_words)
+        ratio = ai_insertion_ratio(pre_words, final_words, words(ai_text or ""))
+
+    return {
+        'pre_ai_assessment': pre_ai_text or "",
+        'edit_distance': distance,
+        'ai_insertion_ratio': round(ratio, 4),
+        'word_count': n_words,
+        'sentence_count': n_sentences,
+        'char_count': len(final_text) - sum(c.isspace() for c in final_text),
+        'ari': round(ari(letters, n_words, n_sentences), 2),
+    }
@@ -1,5 +1,4 @@
 import streamlit as st
-import plotly.graph_objects as go
 from game_logic import SENSOR_DEFS, SENSOR_RANGES, LINE_COLORS
 
 def render_sensor_chart(sensor_id, history):
@@ -7,6 +6,8 @@ def render_sensor_chart(sensor_id, history):
     Render a single sensor chart using Plotly.
     Includes 'Normal' range background.
     """
+    import plotly.graph_objects as go  # Deferred: only the game page draws charts, not the login page
+
     def_data = SENSOR_DEFS[sensor_id]
     ranges = SENSOR_RANGES.get(sensor_id, {})
     
@@ -0,0 +1,257 @@
+"""
+Import of v01 prototype logs (v01/sketch.js "Download Log" files) into the study's log sinks.
+
+v01 runs offline in the browser and only keeps its log client-side, so pilot
+sessions never reached the dashboard. This maps the v01 fields onto the game
+log columns and writes each file with data_manager.log_data_bulk: one append
+per Sheets shard and one fallback CSV write per file. Rows are keyed like the
+app's (idempotency_key), so importing a file twice writes nothing new.
+
+    python streamlit_app/v01_import.py pilot/*.csv pilot/*.json
+    python streamlit_app/v01_import.py --serve --port 8765
+    curl --data-binary @fermentation_log_User_1700000000000.csv http://127.0.0.1:8765/upload
+
+    v01 field            game log column
+    userID               prolific_id (also the session part of the idempotency key)
+    round, batch         round, batch_num
+    currentScenarioID    scenario_id, scenario_name
+    userAssessmentText   assessment, user_assessment_final
+    aiText               ai_assessment_text
+    aiChecked            ai_used
+    userAction           action (ACTIONS text)
+    seqScore             seq_score
+    timestamp            timestamp (submit time, UTC ISO; converted to local time like the app's)
+    roundDurationSeconds round_duration_seconds
+    nextScenarioID       1 on the last round: the 'Simulation Complete' row the app logs
+
+v01 never recorded the text before the AI reveal: text metrics use the final
+text only. Exports from before timestamp / roundDurationSeconds were logged
+have no per-round times: their rows all get the session start encoded in
+userID (User_<epoch ms>, else the import time) and a 0 duration, so the
+dashboard treats their durations as missing (per-round durations cannot be
+recovered for them). Files exported before the Blob-based download have the
+commas of free text replaced by ';'; that text is imported as it is.
+"""
+import argparse
+import csv
+import datetime
+import io
+import json
+import re
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from data_manager import idempotency_key, log_data_bulk
+from game_logic import SCENARIO_DATA, ACTIONS, AI_ASSESSMENTS
+from text_metrics import text_metrics
+
+PAGE = 'V01'  # Page part of the idempotency key
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+DEFAULT_PORT = 8765
+_USER_ID = re.compile(r'User_(\d{12,})$')
+
+# =========================================================================
+# === PARSING =============================================================
+# =========================================================================
+
+def parse_export(text):
+    """
+    v01 log entries (dicts) from a CSV or JSON export, and the number of CSV lines
+    skipped because their field count does not match the header.
+    JSON: the gameLog array, or an object with a 'gameLog' array.
+    """
+    text = text.lstrip('\ufeff')  # Byte order mark of Excel-saved files
+    if text.lstrip()[:1] in ('[', '{'):
+        entries = json.loads(text)
+        if isinstance(entries, dict):
+            entries = entries.get('gameLog', [entries])
+        return [entry for entry in entries if isinstance(entry, dict)], 0
+
+    entries, skipped = [], 0
+    for row in csv.DictReader(io.StringIO(text)):
+        # Old exports did not quote fields: a stray comma or newline shifts the row
+        if None in row or None in row.values():
+            skipped += 1
+            continue
+        entries.append(row)
+    return entries, skipped
+
+
+def _bool(value):
+    return str(value).strip().lower() in ('true', '1', 'yes')
+
+
+def _int(value, default=0):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def _float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def local_time(value):
+    """A v01 timestamp (JavaScript toISOString(), UTC) as a local ISO time like the app logs, None if unreadable."""
+    try:
+        moment = datetime.datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment.isoformat(timespec='microseconds')
+
+
+def session_start(user_id):
+    """ISO time encoded in a v01 userID ('User_' + Date.now()), None if it has none."""
+    match = _USER_ID.match(str(user_id))
+    if not match:
+        return None
+    # Same format as the app's timestamps (readers infer one format per column)
+    return datetime.datetime.fromtimestamp(int(match.group(1)) / 1000).isoformat(timespec='microseconds')
+
+# =========================================================================
+# === MAPPING =============================================================
+# =========================================================================
+
+def to_record(entry):
+    """One v01 entry as a game log record (same columns and order as app.py logs)."""
+    scenario_id = _int(entry.get('currentScenarioID'))
+    assessment = str(entry.get('userAssessmentText') or '')
+    ai_text = str(entry.get('aiText') or '')
+    action = entry.get('userAction') or ''
+    return {
+        'prolific_id': str(entry.get('userID') or ''),
+        'round': _int(entry.get('round')),
+        'batch_num': _int(entry.get('batch')),
+        'scenario_id': scenario_id,
+        'scenario_name': SCENARIO_DATA.get(scenario_id, {}).get('name', entry.get('currentScenarioName', '')),
+        'assessment': assessment,
+        'action': ACTIONS.get(action, {}).get('text', action),
+        'seq_score': _int(entry.get('seqScore')),
+        'ai_used': _bool(entry.get('aiChecked')),
+        'text_changed': False,  # v01 did not keep the text from before the AI reveal
+        'ai_assessment_text': ai_text,
+        'user_assessment_final': assessment,
+        'tutorial_duration_seconds': 0,
+        'round_duration_seconds': _float(entry.get('roundDurationSeconds')),
+        **text_metrics(assessment, None, ai_text),
+        **({'timestamp': local_time(entry['timestamp'])} if entry.get('timestamp') else {}),
+    }
+
+
+def completion_record(last):
+    """The 'Simulation Complete' row app.py logs after the winning round."""
+    return {
+        **last,
+        'round': last['round'] + 1,
+        'batch_num': last['batch_num'],
+        'scenario_id': 1,
+        'scenario_name': SCENARIO_DATA[1]['name'],
+        'assessment': "Simulation Complete",
+        'action': "None",
+        'seq_score': 0,
+        'ai_used': False,
+        'text_changed': False,
+        'ai_assessment_text': AI_ASSESSMENTS.get(1, ""),
+        'user_assessment_final': "COMPLETED",
+        **text_metrics("Simulation Complete"),
+    }
+
+
+def to_records(entries):
+    """Game log records of v01 entries (any number of sessions), keyed and timestamped for log_data_bulk."""
+    sessions = {}
+    for entry in entries:
+        sessions.setdefault(str(entry.get('userID') or ''), []).append(entry)
+
+    records = []
+    for user_id, session in sessions.items():
+        session.sort(key=lambda entry: _int(entry.get('round')))
+        rounds = [to_record(entry) for entry in session]
+        if _int(session[-1].get('nextScenarioID'), None) == 1:
+            rounds.append(completion_record(rounds[-1]))
+        started = session_start(user_id)
+        for record in rounds:
+            record['idempotency_key'] = idempotency_key(record, PAGE, user_id)
+            if not record.get('timestamp') and started:
+                record['timestamp'] = started
+        records.extend(rounds)
+    return records
+
+
+def import_export(text):
+    """Parse one export and write it in bulk; returns the log_data_bulk summary plus parse counts."""
+    entries, skipped = parse_export(text)
+    records = to_records(entries)
+    summary = log_data_bulk(records, page=PAGE) if records else {'written': 0, 'duplicates': 0, 'sheets_ok': False}
+    return dict(summary, entries=len(entries), rows=len(records), skipped_lines=skipped)
+
+# =========================================================================
+# === UPLOAD ENDPOINT =====================================================
+# =========================================================================
+
+class UploadHandler(BaseHTTPRequestHandler):
+    """POST /upload with a v01 export as the body; answers with import_export()'s summary as JSON."""
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/upload':
+            self._reply(404, {'error': "POST the export to /upload"})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_UPLOAD_BYTES:
+            self._reply(413, {'error': f"export larger than {MAX_UPLOAD_BYTES} bytes"})
+            return
+        try:
+            summary = import_export(self.rfile.read(length).decode('utf-8'))
+        except (UnicodeDecodeError, ValueError) as e:
+            self._reply(400, {'error': f"not a v01 CSV/JSON export: {e}"})
+            return
+        self._reply(200, summary)
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT):
+    """One request at a time: each upload is a single bulk write to the sinks."""
+    server = HTTPServer((host, port), UploadHandler)
+    print(f"v01 import: POST exports to http://{host}:{port}/upload")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', help="v01 CSV/JSON exports, one bulk write each")
+    parser.add_argument('--serve', action='store_true', help="run the upload endpoint")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    for path in args.files:
+        with open(path, encoding='utf-8-sig') as f:
+            summary = import_export(f.read())
+        sinks = ("Sheets + fallback CSV" if summary['sheets_ok'] else "fallback CSV only") if summary['written'] else "nothing new"
+        print(f"{path}: {summary['written']} rows written, {summary['duplicates']} duplicates, "
+              f"{summary['skipped_lines']} unreadable lines ({sinks})")
+    if args.serve:
+        serve(args.host, args.port)
+    elif not args.files:
+        parser.print_usage()
+
+
+if __name__ == '__main__':
+    main()
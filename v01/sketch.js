@@ -22,6 +22,7 @@ let gameState = { mode: 'TUTORIAL', step: 1 };
 const STARTING_SCENARIO_ID = 6;
 let currentScenarioID = null;
 let roundNumber = 1; let gameLog = []; let userID = `User_${Date.now()}`; let selectedAction = null;
+let roundStartTime = null; // Date.now() when the current round was shown
 let sensorHistory = { sg: [], wortTemp: [], co2Activity: [], ph: [] };
 
 // === MODIFIED ===: Layout variables changed for 3-column layout
@@ -40,12 +41,22 @@ const currentAINoiseText = 'Noise'; // This is constant
 
 let actionContainer, actionButtons = {}, seqContainer, seqRadio, logPanel, logPreviewEl, progressButton, tutorialTextContainer;
 
+// Offscreen graph buffers: the 4 graphs are rendered into these only when the sensor
+// history or the window size changes (graphsDirty); draw() just copies them to the canvas.
+// The sketch runs with noLoop(): draw() only happens on redraw(), i.e. after an event.
+const GRAPH_MARGIN = 40; // Room around each graph for the axis and value labels
+let graphBuffers = {};
+let graphsDirty = true;
+let logPreviewRows = []; // One <pre> per logged round, appended as rounds are played
+
 function setup() {
     // === MODIFIED ===: Adjusted canvas height for new layout
     createCanvas(windowWidth, 900).style('box-shadow', '0 4px 8px rgba(0,0,0,0.1)');
     angleMode(DEGREES);
+    noLoop(); // Nothing animates: redraw() after events instead of 60 frames per second
     
     calculateLayout();
+    createGraphBuffers();
 
     // Create ALL UI elements once...
     // === MODIFIED ===: Titles positioned in left column
@@ -199,6 +210,7 @@ function windowResized() {
     // === MODIFIED ===: Adjusted canvas height
     resizeCanvas(windowWidth, 900);
     calculateLayout();
+    createGraphBuffers(); // Graph width follows the panel width
 
     // Reposition all elements
     mainTitle.position(PADDING, 10);
@@ -227,6 +239,7 @@ function windowResized() {
     // Log Panel
     logPanel.position(PADDING, LOG_Y);
     logPreviewEl.size(windowWidth - PADDING * 2, 100);
+    redraw(); // resizeCanvas() clears the canvas
 }
 
 function draw() {
@@ -237,6 +250,21 @@ function draw() {
     }
 }
 
+function createGraphBuffers() {
+    for (const buffer of Object.values(graphBuffers)) buffer.remove();
+    graphBuffers = {};
+    for (const sensorID of Object.keys(SENSOR_DEFS)) {
+        graphBuffers[sensorID] = createGraphics(GRAPH_W + GRAPH_MARGIN * 2, GRAPH_H + GRAPH_MARGIN * 2);
+    }
+    graphsDirty = true;
+}
+
+// Call after every change to sensorHistory
+function markGraphsDirty() {
+    graphsDirty = true;
+    redraw();
+}
+
 // --- STATE MANAGEMENT & UI CONTROL ---
 function updateUIForState() {
     [mainTitle, roundTitle, rightPanel, tutorialTextContainer, aiPanel, logPanel, progressButton].forEach(el => el.hide());
@@ -301,6 +329,7 @@ function updateUIForState() {
         progressButton.html('Start Next Round').mousePressed(startNextBatch);
     }
     if (currentScenarioID) updateAIBoxContent();
+    redraw(); // Graphs appear or disappear with the state
 }
 
 // --- TUTORIAL PROGRESSION ---
@@ -336,6 +365,7 @@ function seedSensorHistory(startScenarioID) {
     sensorHistory.wortTemp.push(startData.wortTemp);
     sensorHistory.co2Activity.push(startData.co2Activity);
     sensorHistory.ph.push(startData.ph);
+    markGraphsDirty();
 }
 
 function goToTutorialStep2() { 
@@ -378,6 +408,7 @@ function startGame() {
     gameState.mode = 'GAME'; 
     currentScenarioID = STARTING_SCENARIO_ID; 
     roundNumber = 1;
+    roundStartTime = Date.now();
     seedSensorHistory(currentScenarioID); 
     alert("Tutorial complete! The real challenge begins now."); 
     updateUIForState(); 
@@ -390,11 +421,11 @@ function startNextBatch() {
     if (!selectedAction || userAssessment.trim() === '' || !seqScore) { alert('Please write an assessment, select an action, and rate the difficulty.'); return; }
     
     const currentBatchNum = sensorHistory.sg.length;
-    const logEntry = { userID, round: roundNumber, batch: currentBatchNum, currentScenarioID, currentScenarioName: SCENARIO_DATA[currentScenarioID].name, userAssessmentText: userAssessment.replace(/,/g, ';'), aiText: (AI_ASSESSMENTS[currentScenarioID] || '').replace(/,/g, ';'), aiChecked: aiStrategyBox.style('display') !== 'none', userAction: selectedAction, seqScore };
+    const logEntry = { userID, round: roundNumber, batch: currentBatchNum, currentScenarioID, currentScenarioName: SCENARIO_DATA[currentScenarioID].name, userAssessmentText: userAssessment, aiText: AI_ASSESSMENTS[currentScenarioID] || '', aiChecked: aiStrategyBox.style('display') !== 'none', userAction: selectedAction, seqScore, timestamp: new Date().toISOString(), roundDurationSeconds: roundStartTime ? Math.round((Date.now() - roundStartTime) / 10) / 100 : '' };
     
     const nextScenarioID = determineNextState(currentScenarioID, selectedAction);
     logEntry.nextScenarioID = nextScenarioID;
-    gameLog.push(logEntry); logPreviewEl.html(`<pre>${JSON.stringify(gameLog, null, 2)}</pre>`);
+    gameLog.push(logEntry); appendLogPreview(logEntry);
     
     if (nextScenarioID === 1) { 
         currentScenarioID = nextScenarioID;
@@ -404,6 +435,7 @@ function startNextBatch() {
     }
     
     roundNumber++;
+    roundStartTime = Date.now();
     currentScenarioID = nextScenarioID;
     updateSensorHistory();
     updateUIForState();
@@ -419,6 +451,16 @@ function updateSensorHistory() {
     sensorHistory.wortTemp.push(scenario.wortTemp);
     sensorHistory.co2Activity.push(scenario.co2Activity);
     sensorHistory.ph.push(scenario.ph);
+    markGraphsDirty();
+}
+
+// Log preview grows by one entry per round instead of re-serializing the whole log
+function appendLogPreview(entry) {
+    if (logPreviewRows.length === 0) logPreviewEl.html('');
+    const row = createElement('pre').parent(logPreviewEl).style('margin', '0 0 8px 0');
+    row.elt.textContent = JSON.stringify(entry, null, 2);
+    logPreviewRows.push(row);
+    logPreviewEl.elt.scrollTop = logPreviewEl.elt.scrollHeight;
 }
 
 function checkInputsForAIButton() {
@@ -439,33 +481,37 @@ function checkInputsForAIButton() {
 
 // === MODIFIED ===: Main function to draw the 1x4 stack of graphs
 function drawAllDashboardGraphs() {
+    if (graphsDirty) {
+        // Re-render the buffers only after a history or size change
+        for (const [sensorID, buffer] of Object.entries(graphBuffers)) {
+            buffer.clear();
+            drawSingleGraph(buffer, sensorID, GRAPH_MARGIN, GRAPH_MARGIN, GRAPH_W, GRAPH_H);
+        }
+        graphsDirty = false;
+    }
+
     // 1x4 grid layout in the left panel
     const x = LEFT_PANEL_X;
-    const y1 = PANEL_Y;
-    const y2 = PANEL_Y + GRAPH_H + PADDING;
-    const y3 = PANEL_Y + (GRAPH_H + PADDING) * 2;
-    const y4 = PANEL_Y + (GRAPH_H + PADDING) * 3;
-    
-    drawSingleGraph('sg', x, y1, GRAPH_W, GRAPH_H);
-    drawSingleGraph('wortTemp', x, y2, GRAPH_W, GRAPH_H);
-    drawSingleGraph('co2Activity', x, y3, GRAPH_W, GRAPH_H);
-    drawSingleGraph('ph', x, y4, GRAPH_W, GRAPH_H);
+    ['sg', 'wortTemp', 'co2Activity', 'ph'].forEach((sensorID, i) => {
+        const y = PANEL_Y + (GRAPH_H + PADDING) * i;
+        image(graphBuffers[sensorID], x - GRAPH_MARGIN, y - GRAPH_MARGIN);
+    });
 }
 
 
-// === NEW ===: Reusable function to draw one graph
-function drawSingleGraph(sensorID, x, y, w, h) {
+// === NEW ===: Reusable function to draw one graph (into the offscreen buffer g)
+function drawSingleGraph(g, sensorID, x, y, w, h) {
     const def = SENSOR_DEFS[sensorID];
     const history = sensorHistory[sensorID];
     const color = LINE_COLORS[sensorID];
     const numPoints = history.length;
     
-    push();
+    g.push();
     
     // Draw graph boundary
-    stroke(150);
-    noFill();
-    rect(x, y, w, h);
+    g.stroke(150);
+    g.noFill();
+    g.rect(x, y, w, h);
     
     // === NEW: Draw safety zone ===
     const ranges = SENSOR_RANGES[sensorID];
@@ -475,50 +521,50 @@ function drawSingleGraph(sensorID, x, y, w, h) {
         const yNormalMax = map(ranges.normal[0], def.min, def.max, y + h, y); // Map low value to high Y
         const normalRangeHeight = yNormalMax - yNormalMin;
         
-        push();
-        fill(220, 245, 220); // Light green background
-        noStroke();
-        rect(x, yNormalMin, w, normalRangeHeight);
-        pop();
+        g.push();
+        g.fill(220, 245, 220); // Light green background
+        g.noStroke();
+        g.rect(x, yNormalMin, w, normalRangeHeight);
+        g.pop();
     }
     // === END NEW ===
 
     // Draw Graph Title
-    fill(color);
-    noStroke();
-    textSize(14);
-    textStyle(BOLD);
-    textAlign(LEFT, TOP);
-    text(`${def.label} (${def.unit})`, x + 10, y + 10);
+    g.fill(color);
+    g.noStroke();
+    g.textSize(14);
+    g.textStyle(BOLD);
+    g.textAlign(LEFT, TOP);
+    g.text(`${def.label} (${def.unit})`, x + 10, y + 10);
     
     // Draw Y-axis min/max labels
-    textSize(10);
-    textStyle(NORMAL);
-    fill(100);
-    textAlign(RIGHT, TOP);
-    text(def.max.toFixed(def.label === 'SG' ? 3 : (def.label === 'pH' ? 2 : 1)), x - 5, y + 5);
-    textAlign(RIGHT, BOTTOM);
-    text(def.min.toFixed(def.label === 'SG' ? 3 : (def.label === 'pH' ? 2 : 1)), x - 5, y + h - 5);
+    g.textSize(10);
+    g.textStyle(NORMAL);
+    g.fill(100);
+    g.textAlign(RIGHT, TOP);
+    g.text(def.max.toFixed(def.label === 'SG' ? 3 : (def.label === 'pH' ? 2 : 1)), x - 5, y + 5);
+    g.textAlign(RIGHT, BOTTOM);
+    g.text(def.min.toFixed(def.label === 'SG' ? 3 : (def.label === 'pH' ? 2 : 1)), x - 5, y + h - 5);
 
 
     // Draw X-axis labels for all 8 batches
-    textAlign(CENTER, TOP);
-    fill(100);
-    noStroke();
-    textSize(10);
+    g.textAlign(CENTER, TOP);
+    g.fill(100);
+    g.noStroke();
+    g.textSize(10);
     const xPad = w / 16; // Padding inside the graph
     for (let b = 1; b <= 8; b++) {
         const xPos = map(b, 1, 8, x + xPad, x + w - xPad);
         // === MODIFIED: Changed label from B to T ===
-        text(`T${b}`, xPos, y + h + 5);
+        g.text(`T${b}`, xPos, y + h + 5);
         // === END MODIFICATION ===
     }
     
     // Draw the line
-    stroke(color);
-    strokeWeight(2);
-    noFill();
-    beginShape();
+    g.stroke(color);
+    g.strokeWeight(2);
+    g.noFill();
+    g.beginShape();
     
     let lastX = 0, lastY = 0;
 
@@ -528,34 +574,34 @@ function drawSingleGraph(sensorID, x, y, w, h) {
         const xPos = map(b, 1, 8, x + xPad, x + w - xPad);
         const yPos = map(val, def.min, def.max, y + h, y); // Inverted Y-axis
         
-        vertex(xPos, yPos);
+        g.vertex(xPos, yPos);
         
         // Draw a small circle at each data point
-        push();
-        fill(color);
-        noStroke();
-        circle(xPos, yPos, 6);
-        pop();
+        g.push();
+        g.fill(color);
+        g.noStroke();
+        g.circle(xPos, yPos, 6);
+        g.pop();
         
         if (i === numPoints - 1) {
             lastX = xPos;
             lastY = yPos;
         }
     }
-    endShape();
+    g.endShape();
     
     // Draw current value label at the end of the line
     if (numPoints > 0) {
-        fill(color);
-        noStroke();
-        textSize(12);
-        textAlign(LEFT, CENTER);
-        textStyle(BOLD);
+        g.fill(color);
+        g.noStroke();
+        g.textSize(12);
+        g.textAlign(LEFT, CENTER);
+        g.textStyle(BOLD);
         const lastVal = history[numPoints - 1];
-        text(lastVal.toFixed(def.label === 'SG' ? 3 : (def.label === 'pH' ? 2 : 1)), lastX + 8, lastY);
+        g.text(lastVal.toFixed(def.label === 'SG' ? 3 : (def.label === 'pH' ? 2 : 1)), lastX + 8, lastY);
     }
     
-    pop();
+    g.pop();
 }
 
 
@@ -591,7 +637,7 @@ function determineNextState(currentID, actionID) { const currentCauses = SCENARI
 function endGame() { 
     const userRounds = roundNumber;
     gameLog.forEach(entry => entry.performanceScore = userRounds); 
-    logPreviewEl.html(`<pre>${JSON.stringify(gameLog, null, 2)}</pre>`); 
+    gameLog.forEach((entry, i) => { logPreviewRows[i].elt.textContent = JSON.stringify(entry, null, 2); });
     
     // Use a custom modal/div instead of alert
     const endMessage = createDiv(`
@@ -609,4 +655,17 @@ function endGame() {
 function selectUserAction(actionKey, button) { selectedAction = actionKey; resetActionButtonsStyle(); button.style('background-color', '#007bff').style('color', 'white'); }
 function resetActionButtonsStyle() { for (const btn of Object.values(actionButtons)) { btn.style('background-color', '#f0f0f0').style('color', 'black'); } }
 function toggleAIStrategy() { if (aiStrategyBox.style('display') === 'none') { aiStrategyBox.show(); } else { aiStrategyBox.hide(); } }
-function downloadLog() { let csvContent = "data:text/csv;charset=utf-8,"; if (gameLog.length === 0) return; csvContent += Object.keys(gameLog[0]).join(",") + "\r\n"; gameLog.forEach(row => { csvContent += Object.values(row).join(",") + "\r\n"; }); const encodedUri = encodeURI(csvContent); const link = createA(encodedUri, ''); link.attribute("download", `fermentation_log_${userID}.csv`); link.elt.click(); link.remove(); }
\ No newline at end of file
+// CSV built as a Blob (no data-URI length limit); fields quoted, so free text keeps its commas
+function csvField(value) { const text = String(value ?? ''); return /[",\r\n]/.test(text) ? `"${text.replace(/"/g, '""')}"` : text; }
+function downloadLog() {
+    if (gameLog.length === 0) return;
+    const columns = Object.keys(gameLog[gameLog.length - 1]); // The last entry has every field
+    const lines = [columns.map(csvField).join(',')];
+    gameLog.forEach(row => lines.push(columns.map(c => csvField(row[c])).join(',')));
+    const url = URL.createObjectURL(new Blob([lines.join('\r\n') + '\r\n'], { type: 'text/csv;charset=utf-8' }));
+    const link = createA(url, '');
+    link.attribute('download', `fermentation_log_${userID}.csv`);
+    link.elt.click();
+    link.remove();
+    setTimeout(() => URL.revokeObjectURL(url), 0);
+}